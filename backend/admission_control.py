@@ -0,0 +1,277 @@
+"""
+Admission Control
+Separate concurrency pools for interactive and heavy endpoints, with bounded
+queues and fast 429/503 responses when saturated
+
+Each pool has a number of execution slots shared by every worker process.
+A slot is an flock() on a lock file, so the kernel releases it when a
+worker dies mid-request (e.g. killed by gunicorn's timeout). Requests that
+find no free slot, or arrive while others are already waiting, join the
+pool's queue for up to `queue_timeout` seconds. The queue is `queue_size`
+ticket files locked the same way: a waiting request holds one ticket, so a
+worker killed while waiting frees its place too, and no process-shared lock
+is held by a request that can die. Waiters also hold a shared lock on a
+gate file that newcomers probe, so they queue behind existing waiters
+instead of taking the next free slot, and waiters retry more often the
+longer they wait. A request is rejected with 429 when no ticket is free,
+and with 503 when its wait times out. Both responses carry a Retry-After
+estimated from the queue depth (a counter file) and the pool's recent
+service time, an average kept in shared memory created when the app is
+imported (shared by all workers with gunicorn's preload_app).
+
+Queued requests hold a worker thread while they wait, so use threaded
+workers (--threads) and give the heavy pool fewer slots than there are
+CPUs. Interactive requests then keep free capacity while heavy work queues.
+"""
+
+import fcntl
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+from flask import Flask, g, jsonify, request
+
+import metrics
+from request_budget import request_chars
+
+
+INTERACTIVE = 'interactive'
+HEAVY = 'heavy'
+
+# Endpoints admitted through the heavy pool; other POST endpoints are interactive
+DEFAULT_HEAVY_ENDPOINTS = ('/analyze/full-audit', '/generate-report')
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'writing_defense_admission')
+
+# Polling interval bounds while waiting for a slot (seconds); the interval halves
+# after _POLL_HALVING seconds of waiting, thirds after twice that, and so on
+_MIN_POLL = 0.005
+_MAX_POLL = 0.025
+_POLL_HALVING = 0.1
+
+# Weight of the newest request in the service-time average
+_EWMA_WEIGHT = 0.2
+
+# Bytes of the queue depth in its count file (space-padded decimal)
+_COUNT_WIDTH = 16
+
+
+class Slot:
+    """A held execution slot: an open, flock()ed lock file"""
+
+    __slots__ = ('fd', 'acquired')
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.acquired = time.monotonic()
+
+
+class AdmissionPool:
+    """Execution slots and a bounded wait queue shared across worker processes"""
+
+    def __init__(self, name: str, slots: int, queue_size: int, queue_timeout: float,
+                 lock_dir: str = DEFAULT_LOCK_DIR):
+        self.name = name
+        self.slots = slots
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        os.makedirs(lock_dir, exist_ok=True)
+        self.paths = [os.path.join(lock_dir, f'{name}.{i}.lock') for i in range(slots)]
+        self.ticket_paths = [os.path.join(lock_dir, f'{name}.queue.{i}.lock') for i in range(queue_size)]
+        # Held shared by every waiter, so "is anyone queued" is one non-blocking exclusive probe
+        self.gate_path = os.path.join(lock_dir, f'{name}.queue.lock')
+        # Queue depth for Retry-After, updated under flock
+        self.count_path = os.path.join(lock_dir, f'{name}.queue.count')
+        # Shared memory inherited by workers forked after the app is imported. Unlocked:
+        # a racing update only skews the estimate, and a lock could die with its holder
+        self._service_time = multiprocessing.RawValue('d', 0.0)
+
+    def _try_acquire(self) -> Optional[Slot]:
+        """Lock the first free slot file without blocking"""
+        fd = _lock_first_free(self.paths)
+        return Slot(fd) if fd is not None else None
+
+    def acquire(self) -> Slot:
+        """
+        Take a slot, waiting in the queue when none is free or others already wait
+
+        Raises: Saturated when the queue is full or the wait times out
+        """
+        if not self._has_waiters():
+            slot = self._try_acquire()
+            if slot is not None:
+                return slot
+
+        ticket = _lock_first_free(self.ticket_paths)
+        if ticket is None:
+            raise Saturated(self, 'queue_full', 429)
+        gate = os.open(self.gate_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Blocks only for the instant a newcomer's probe holds the gate
+            fcntl.flock(gate, fcntl.LOCK_SH)
+            self._add_waiting(1)
+            metrics.change_admission_queue(self.name, 1)
+            try:
+                return self._wait(time.monotonic())
+            finally:
+                self._add_waiting(-1)
+                metrics.change_admission_queue(self.name, -1)
+        finally:
+            os.close(gate)
+            os.close(ticket)
+
+    def _wait(self, started: float) -> Slot:
+        """
+        Poll for a slot until the queue timeout
+
+        The interval shrinks from _MAX_POLL to _MIN_POLL as the wait grows,
+        so the longest waiters retry most often and a newcomer, which
+        sleeps a full interval first, rarely overtakes them.
+        """
+        deadline = started + self.queue_timeout
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                raise Saturated(self, 'queue_timeout', 503)
+            poll = max(_MIN_POLL, _MAX_POLL / (1 + (now - started) / _POLL_HALVING))
+            time.sleep(min(poll, remaining))
+            slot = self._try_acquire()
+            if slot is not None:
+                metrics.observe_admission_wait(self.name, time.monotonic() - started)
+                return slot
+
+    def _has_waiters(self) -> bool:
+        """Whether any request (in any worker) is queued: a waiter holds the gate"""
+        gate = os.open(self.gate_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(gate, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(gate)
+        return False
+
+    def _add_waiting(self, delta: int, reset: bool = False) -> int:
+        """Add delta to the shared queue depth (or set it to delta); returns the new depth"""
+        fd = os.open(self.count_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            depth = delta if reset else max(0, int(os.pread(fd, _COUNT_WIDTH, 0) or b'0') + delta)
+            os.pwrite(fd, b'%-*d' % (_COUNT_WIDTH, depth), 0)
+            return depth
+        finally:
+            os.close(fd)
+
+    def release(self, slot: Slot) -> None:
+        """Unlock the slot (closing the file drops the flock) and update the service time"""
+        elapsed = time.monotonic() - slot.acquired
+        os.close(slot.fd)
+        previous = self._service_time.value
+        self._service_time.value = elapsed if previous == 0 else (
+            (1 - _EWMA_WEIGHT) * previous + _EWMA_WEIGHT * elapsed)
+
+    def waiting(self) -> int:
+        """
+        Requests waiting in the queue across workers
+
+        The depth counter can only be left high by a waiter killed between
+        its updates; it is reset whenever the gate shows nobody waiting.
+        """
+        gate = os.open(self.gate_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(gate, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                fd = os.open(self.count_path, os.O_RDONLY | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_SH)
+                    return min(self.queue_size, int(os.pread(fd, _COUNT_WIDTH, 0) or b'0'))
+                finally:
+                    os.close(fd)
+            # Nobody holds the gate, so nobody is counted
+            return self._add_waiting(0, reset=True)
+        finally:
+            os.close(gate)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue would likely drain (at least 1)"""
+        return max(1, math.ceil(self._service_time.value * (self.waiting() + 1) / self.slots))
+
+
+def _lock_first_free(paths) -> Optional[int]:
+    """Open and flock() the first unlocked file without blocking; returns its fd"""
+    for path in paths:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        return fd
+    return None
+
+
+class Saturated(Exception):
+    """A pool could not admit a request"""
+
+    def __init__(self, pool: AdmissionPool, reason: str, status: int):
+        super().__init__(f'{pool.name} pool saturated ({reason})')
+        self.pool = pool
+        self.reason = reason
+        self.status = status
+
+
+class AdmissionController:
+    """Maps requests to pools by endpoint and input size"""
+
+    def __init__(self, pools: Dict[str, AdmissionPool], heavy_endpoints=DEFAULT_HEAVY_ENDPOINTS,
+                 heavy_input_chars: int = 0):
+        self.pools = pools
+        self.heavy_endpoints = frozenset(heavy_endpoints)
+        self.heavy_input_chars = heavy_input_chars
+
+    def classify(self, path: str, chars: int) -> str:
+        """Heavy for heavy endpoints and for inputs above heavy_input_chars, else interactive"""
+        if path in self.heavy_endpoints:
+            return HEAVY
+        if self.heavy_input_chars and chars > self.heavy_input_chars:
+            return HEAVY
+        return INTERACTIVE
+
+
+def init_app(app: Flask, controller: Optional[AdmissionController]) -> None:
+    """Admit every POST request through its pool before the view runs (no-op without a controller)"""
+    if controller is None:
+        return
+
+    @app.before_request
+    def _admit():
+        if request.method != 'POST':
+            return None
+        pool = controller.pools.get(controller.classify(request.path, request_chars()))
+        if pool is None:
+            return None
+        try:
+            g.admission_slot = pool.acquire()
+        except Saturated as e:
+            metrics.record_admission_rejected(pool.name, e.reason)
+            retry_after = pool.retry_after()
+            response = jsonify({'error': f'Server busy: {e}', 'retry_after': retry_after})
+            response.status_code = e.status
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        g.admission_pool = pool
+        metrics.change_admission_in_flight(pool.name, 1)
+        return None
+
+    @app.teardown_request
+    def _release(exc: Optional[BaseException]) -> None:
+        slot = g.pop('admission_slot', None)
+        if slot is not None:
+            pool = g.pop('admission_pool')
+            pool.release(slot)
+            metrics.change_admission_in_flight(pool.name, -1)
@@ -3,96 +3,200 @@ AI-ism Detection System
 Identifies formulaic LLM markers and generic academic language
 """
 
-import json
-import re
-import nltk
-from typing import List, Dict, Tuple
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-import os
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from collections import Counter
+from typing import List, Dict, Optional, Tuple, Iterable
+from tokenization import Tokenizer, get_tokenizer
+from marker_registry import MarkerRegistry, get_registry
+from match_types import SpanMatches, PositionMatches
+from span_index import SpanIndex
+from stage_timing import stage
+import marker_analytics
 
 
 class AIismDetector:
     """Detects AI-generated text markers and generic academic language"""
     
-    def __init__(self, db_path='genericism_database.json'):
-        """Initialize detector with genericism database"""
-        with open(db_path, 'r') as f:
-            self.db = json.load(f)
+    def __init__(self, db_path='genericism_database.json', registry: MarkerRegistry = None,
+                 tokenizer: Tokenizer = None):
+        """Initialize detector with the shared, compiled genericism database"""
+        self.registry = registry or get_registry(db_path)
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.db = self.registry.db
         
         self.ai_markers = self.db['ai_markers']
-        self.english_stop = set(stopwords.words('english'))
+        self._english_stop = None
+    
+    @property
+    def english_stop(self) -> set:
+        """NLTK English stopwords, loaded on first use"""
+        if self._english_stop is None:
+            from nltk.corpus import stopwords
+            self._english_stop = set(stopwords.words('english'))
+        return self._english_stop
         
     def detect_ai_markers(self, text: str) -> Dict:
         """
         Detect AI-ism markers in text
         Returns: dict with detected markers, scores, and locations
         """
-        results = {
-            'high_frequency_phrases': [],
-            'formulaic_structures': [],
-            'hedging_qualifiers': [],
-            'academic_clichés': [],
-            'transition_abuse': [],
-            'generic_openers': [],
+        results = self._empty_marker_results()
+        formulaic_hits = self._formulaic_hit_counts()
+        counts = self._scan_markers(text, results, formulaic_hits=formulaic_hits)
+        self._score_markers(results, counts['words'], counts['transitions'])
+        with stage('aitism.span_index'):
+            results['span_index'] = self._build_span_index(results)
+        self._record_hits(results, formulaic_hits)
+        
+        return results
+    
+    def detect_ai_markers_chunked(self, chunks: Iterable[Tuple[int, str]]) -> Dict:
+        """
+        Detect AI-ism markers chunk by chunk (see chunked_analysis.iter_chunks)
+        
+        Offsets and sentence/word indices are reported relative to the whole
+        document, and the score is computed from the merged counts. The
+        formulaic index is returned as well, from the same pass.
+        """
+        results = self._empty_marker_results()
+        totals = {'sentences': 0, 'formulaic_sentences': 0, 'words': 0, 'transitions': 0}
+        formulaic_hits = self._formulaic_hit_counts()
+        
+        for char_offset, chunk in chunks:
+            counts = self._scan_markers(chunk, results, char_offset, totals['sentences'], totals['words'],
+                                        formulaic_hits)
+            for key in totals:
+                totals[key] += counts[key]
+        
+        self._score_markers(results, totals['words'], totals['transitions'])
+        with stage('aitism.span_index'):
+            results['span_index'] = self._build_span_index(results)
+        self._record_hits(results, formulaic_hits)
+        results['formulaic_index'] = (
+            (totals['formulaic_sentences'] / totals['sentences']) * 100 if totals['sentences'] else 0
+        )
+        
+        return results
+    
+    def _empty_marker_results(self) -> Dict:
+        """
+        Result skeleton shared by the whole-text and chunked paths
+        
+        Matches are kept in compact containers (see match_types) and become
+        lists of (start, end, phrase) / (index, text) tuples when serialized.
+        """
+        return {
+            'high_frequency_phrases': SpanMatches(),
+            'formulaic_structures': PositionMatches(),
+            'hedging_qualifiers': PositionMatches(),
+            'academic_clichés': SpanMatches(),
+            'transition_abuse': SpanMatches(),
+            'generic_openers': SpanMatches(),
             'ai_ism_score': 0.0,
             'risk_level': 'low'
         }
+    
+    def _scan_markers(self, text: str, results: Dict, char_offset: int = 0,
+                      sentence_offset: int = 0, word_offset: int = 0,
+                      formulaic_hits: Optional[List[int]] = None) -> Dict:
+        """
+        Append marker matches found in text to results
         
+        formulaic_hits, when given, accumulates the sentences matched per
+        formulaic pattern (for marker analytics).
+        Returns: counts of sentences, formulaic sentences, words and transitions
+        """
         # Check high-frequency AI markers
-        for phrase in self.ai_markers['high_frequency']:
-            pattern = re.compile(re.escape(phrase), re.IGNORECASE)
-            matches = [(m.start(), m.end(), phrase) for m in pattern.finditer(text)]
-            if matches:
-                results['high_frequency_phrases'].extend(matches)
+        with stage('aitism.high_frequency_phrases'):
+            for phrase, pattern in self.registry.phrase_patterns['high_frequency']:
+                results['high_frequency_phrases'].add_matches(pattern.finditer(text), phrase, char_offset)
         
         # Check formulaic structures using regex
-        sentences = sent_tokenize(text)
-        for i, sent in enumerate(sentences):
-            for pattern in self.ai_markers['formulaic_structures']:
-                if re.match(pattern, sent.strip(), re.IGNORECASE):
-                    results['formulaic_structures'].append((i, sent.strip()))
+        with stage('tokenize'):
+            sentence_spans = self.tokenizer.sentence_spans(text)
+        formulaic_sents = 0
+        with stage('aitism.formulaic_structures'):
+            stripped, starts = [], []
+            for start, end in sentence_spans:
+                sent = text[start:end]
+                stripped.append(sent.strip())
+                starts.append(start + char_offset + len(sent) - len(sent.lstrip()))
+            counts = self.registry.formulaic_matcher.count_matches(stripped, formulaic_hits)
+            for i, (sent_stripped, start, count) in enumerate(zip(stripped, starts, counts)):
+                # One entry per matching pattern
+                for _ in range(count):
+                    results['formulaic_structures'].add(
+                        sentence_offset + i, sent_stripped, start, start + len(sent_stripped)
+                    )
+                formulaic_sents += count > 0
         
         # Check hedging qualifiers
-        words = word_tokenize(text.lower())
-        for i, word in enumerate(words):
-            if word in self.ai_markers['hedging_qualifiers']:
-                results['hedging_qualifiers'].append((i, word))
+        lowered = text.lower()
+        with stage('tokenize'):
+            words = self.tokenizer.words(lowered)
+        with stage('aitism.hedging_qualifiers'):
+            # Character spans are recovered by aligning tokens onto the text,
+            # which is only valid when lowercasing kept every offset
+            aligned = len(lowered) == len(text)
+            pos = 0
+            for i, word in enumerate(words):
+                found = lowered.find(word, pos) if aligned else -1
+                if found >= 0:
+                    pos = found + len(word)
+                if word in self.registry.hedging_qualifiers:
+                    if found >= 0:
+                        results['hedging_qualifiers'].add(word_offset + i, word,
+                                                          char_offset + found, char_offset + pos)
+                    else:
+                        results['hedging_qualifiers'].add(word_offset + i, word)
         
         # Check academic clichés
-        for cliché in self.ai_markers['academic_clichés']:
-            pattern = re.compile(re.escape(cliché), re.IGNORECASE)
-            matches = [(m.start(), m.end(), cliché) for m in pattern.finditer(text)]
-            if matches:
-                results['academic_clichés'].extend(matches)
+        with stage('aitism.academic_cliches'):
+            for cliché, pattern in self.registry.phrase_patterns['academic_clichés']:
+                results['academic_clichés'].add_matches(pattern.finditer(text), cliché, char_offset)
         
         # Check transition word abuse
         transition_count = 0
-        for transition in self.ai_markers['transition_abuse']:
-            pattern = re.compile(r'\b' + re.escape(transition) + r'\b', re.IGNORECASE)
-            matches = list(pattern.finditer(text))
-            transition_count += len(matches)
-            if matches:
-                results['transition_abuse'].extend([(m.start(), m.end(), transition) for m in matches])
+        with stage('aitism.transition_abuse'):
+            for transition, pattern in self.registry.transition_patterns:
+                transition_count += results['transition_abuse'].add_matches(
+                    pattern.finditer(text), transition, char_offset
+                )
         
         # Check generic openers
-        for opener in self.ai_markers['generic_openers']:
-            pattern = re.compile(re.escape(opener), re.IGNORECASE)
-            matches = [(m.start(), m.end(), opener) for m in pattern.finditer(text)]
-            if matches:
-                results['generic_openers'].extend(matches)
+        with stage('aitism.generic_openers'):
+            for opener, pattern in self.registry.phrase_patterns['generic_openers']:
+                results['generic_openers'].add_matches(pattern.finditer(text), opener, char_offset)
         
+        return {
+            'sentences': len(sentence_spans),
+            'formulaic_sentences': formulaic_sents,
+            'words': len(words),
+            'transitions': transition_count
+        }
+    
+    def _formulaic_hit_counts(self) -> Optional[List[int]]:
+        """Per-pattern match counters when marker analytics are enabled"""
+        if not marker_analytics.enabled():
+            return None
+        return [0] * len(self.registry.formulaic_patterns)
+    
+    def _record_hits(self, results: Dict, formulaic_hits: Optional[List[int]]) -> None:
+        """Report one analyzed text's hits per marker to marker analytics"""
+        if formulaic_hits is None:
+            return
+        hits = Counter()
+        for category, key in (('high_frequency', 'high_frequency_phrases'), ('academic_clichés', 'academic_clichés'),
+                              ('transition_abuse', 'transition_abuse'), ('generic_openers', 'generic_openers'),
+                              ('hedging_qualifiers', 'hedging_qualifiers')):
+            matches = results[key]
+            marker_analytics.count_labels(category, matches.labels, matches.label_ids, hits)
+        for pattern, n in zip(self.registry.formulaic_patterns, formulaic_hits):
+            if n:
+                hits[('formulaic_structures', pattern.pattern)] += n
+        marker_analytics.record(marker_analytics.AITISM, hits)
+    
+    def _score_markers(self, results: Dict, word_count: int, transition_count: int) -> None:
+        """Set ai_ism_score and risk_level from the collected markers"""
         # Calculate AI-ism score (0-100)
         total_markers = (
             len(results['high_frequency_phrases']) * 2 +
@@ -103,7 +207,6 @@ class AIismDetector:
             len(results['generic_openers']) * 2
         )
         
-        word_count = len(words)
         if word_count > 0:
             results['ai_ism_score'] = min(100, (total_markers / (word_count / 100)) * 10)
         
@@ -116,24 +219,26 @@ class AIismDetector:
             results['risk_level'] = 'high'
         else:
             results['risk_level'] = 'critical'
-        
-        return results
+    
+    def _build_span_index(self, results: Dict) -> SpanIndex:
+        """Merged, sorted spans of every marker category (see span_index)"""
+        return SpanIndex(
+            (category, results[category].spans())
+            for category in ('high_frequency_phrases', 'formulaic_structures', 'hedging_qualifiers',
+                             'academic_clichés', 'transition_abuse', 'generic_openers')
+        )
     
     def calculate_formulaic_index(self, text: str) -> float:
         """
         Calculate how formulaic/templated the text is
         Range: 0-100 (0 = unique, 100 = highly formulaic)
         """
-        sentences = sent_tokenize(text)
-        formulaic_sents = 0
+        with stage('tokenize'):
+            sentences = self.tokenizer.sentences(text)
         
-        for sent in sentences:
-            sent_stripped = sent.strip()
-            # Check against all patterns
-            for pattern in self.ai_markers['formulaic_structures']:
-                if re.match(pattern, sent_stripped, re.IGNORECASE):
-                    formulaic_sents += 1
-                    break
+        with stage('aitism.formulaic_index'):
+            counts = self.registry.formulaic_matcher.count_matches([sent.strip() for sent in sentences])
+            formulaic_sents = sum(1 for count in counts if count)
         
         if not sentences:
             return 0
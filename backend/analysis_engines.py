@@ -0,0 +1,42 @@
+"""
+Analysis Engines
+The registry-backed engines of one marker database version, built and
+replaced together when the database is reloaded
+"""
+
+import threading
+from typing import Dict
+
+from marker_registry import MarkerRegistry
+from aitism_detector import AIismDetector
+from l2_voice_preserver import L2VoicePreserver
+from linguistic_identity_scorer import LinguisticIdentityScorer
+import tokenization
+
+
+class AnalysisEngines:
+    """Detector, L2 preserver and identity scorer bound to one registry"""
+
+    def __init__(self, registry: MarkerRegistry):
+        self.registry = registry
+        self.version = registry.version
+        self.aitism_detector = AIismDetector(registry=registry)
+        self.l2_voice_preserver = L2VoicePreserver(registry=registry)
+        self.identity_scorer = LinguisticIdentityScorer(registry=registry)
+
+        # Per-backend AI-ism detectors so the live editor can ask for the fast tokenizer
+        self._aitism_detectors: Dict[str, AIismDetector] = {
+            tokenization.default_backend(): self.aitism_detector
+        }
+        self._aitism_detectors_lock = threading.Lock()
+
+    def get_aitism_detector(self, backend: str = None) -> AIismDetector:
+        """Return an AIismDetector using the requested tokenizer backend"""
+        backend = backend or tokenization.default_backend()
+        detector = self._aitism_detectors.get(backend)
+        if detector is None:
+            tokenizer = tokenization.get_tokenizer(backend)
+            with self._aitism_detectors_lock:
+                detector = self._aitism_detectors.setdefault(
+                    backend, AIismDetector(registry=self.registry, tokenizer=tokenizer))
+        return detector
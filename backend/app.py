@@ -3,32 +3,237 @@ Flask API Server
 Main entry point for the linguistic analysis backend
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, g, has_request_context
 from flask_cors import CORS
 import io
 import os
+import sys
 import json
-from aitism_detector import AIismDetector
-from l2_voice_preserver import L2VoicePreserver
-from dual_text_comparator import DualTextComparator
-from linguistic_identity_scorer import LinguisticIdentityScorer
-from audit_report_generator import AuditReportGenerator
+import threading
+import marker_registry
+import marker_analytics
+from analysis_engines import AnalysisEngines
+from dual_text_comparator import DualTextComparator, CHANGE_MODES, DIFF_FORMATS
+from change_estimator import DEFAULT_APPROX_THRESHOLD
+from chunked_analysis import DEFAULT_CHUNK_CHARS, DEFAULT_CHUNKED_THRESHOLD, iter_chunks
+from field_selection import parse_fields, select_fields, subfields, top_level, wants
+from span_index import DEFAULT_CACHE_DOCUMENTS, DEFAULT_SHARED_DIR, DEFAULT_SHARED_TTL, SpanIndexCache, document_id
+import tokenization
+import response_encoding
+import stage_timing
+import metrics
+import request_profiler
+import request_budget
+import admission_control
+import request_coalescing
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize analysis engines
-aitism_detector = AIismDetector('genericism_database.json')
-l2_voice_preserver = L2VoicePreserver('genericism_database.json')
-text_comparator = DualTextComparator()
-identity_scorer = LinguisticIdentityScorer('genericism_database.json')
-report_generator = AuditReportGenerator()
+# orjson serialization (when installed) and gzip/brotli above COMPRESS_MIN_BYTES
+response_encoding.init_app(
+    app,
+    min_size=int(os.environ.get('COMPRESS_MIN_BYTES', response_encoding.DEFAULT_COMPRESS_MIN_BYTES))
+)
+
+# Per-stage timings as Server-Timing headers and JSON log lines (off unless STAGE_TIMING=1);
+# MEMORY_ACCOUNTING=1 adds tracemalloc peaks per stage
+stage_timing.init_app(
+    app,
+    enabled=os.environ.get('STAGE_TIMING') == '1',
+    memory=os.environ.get('MEMORY_ACCOUNTING') == '1'
+)
+
+# Request, input-size and cache metrics at /metrics (aggregated across workers, see metrics.py)
+metrics.init_app(app)
+
+# Input-size and estimated-memory budgets: oversized requests get 413 or run chunked
+request_budget.init_app(app, request_budget.RequestBudget(
+    max_input_chars=int(os.environ.get('MAX_INPUT_CHARS', '0')),
+    memory_bytes=int(float(os.environ.get('REQUEST_MEMORY_BUDGET_MB', '0')) * 1024 * 1024),
+    whole_bytes_per_char=float(os.environ.get('MEMORY_BYTES_PER_CHAR', request_budget.DEFAULT_WHOLE_BYTES_PER_CHAR)),
+    chunked_bytes_per_char=float(os.environ.get('CHUNKED_MEMORY_BYTES_PER_CHAR',
+                                                request_budget.DEFAULT_CHUNKED_BYTES_PER_CHAR))
+))
+
+# Identical concurrent /analyze/* requests compute once (COALESCE_REQUESTS=1); set
+# COALESCE_SHARED_DIR (e.g. /dev/shm/...) to coalesce across workers as well.
+# Registered before admission control so waiting duplicates hold no slot.
+if os.environ.get('COALESCE_REQUESTS') == '1':
+    request_coalescing.init_app(app, request_coalescing.Coalescer(
+        shared_dir=os.environ.get('COALESCE_SHARED_DIR'),
+        wait_timeout=float(os.environ.get('COALESCE_WAIT_TIMEOUT', request_coalescing.DEFAULT_WAIT_TIMEOUT))
+    ), current_version=lambda: current_engines().registry.version)
+
+# Separate interactive and heavy concurrency pools with bounded queues (ADMISSION_CONTROL=1);
+# created here so that, with preload_app, the service-time estimate is shared by all workers
+if os.environ.get('ADMISSION_CONTROL') == '1':
+    admission_control.init_app(app, admission_control.AdmissionController(
+        pools={
+            admission_control.INTERACTIVE: admission_control.AdmissionPool(
+                admission_control.INTERACTIVE,
+                slots=int(os.environ.get('INTERACTIVE_SLOTS', '8')),
+                queue_size=int(os.environ.get('INTERACTIVE_QUEUE', '32')),
+                queue_timeout=float(os.environ.get('INTERACTIVE_QUEUE_TIMEOUT', '2')),
+                lock_dir=os.environ.get('ADMISSION_LOCK_DIR', admission_control.DEFAULT_LOCK_DIR)
+            ),
+            admission_control.HEAVY: admission_control.AdmissionPool(
+                admission_control.HEAVY,
+                slots=int(os.environ.get('HEAVY_SLOTS', '2')),
+                queue_size=int(os.environ.get('HEAVY_QUEUE', '8')),
+                queue_timeout=float(os.environ.get('HEAVY_QUEUE_TIMEOUT', '10')),
+                lock_dir=os.environ.get('ADMISSION_LOCK_DIR', admission_control.DEFAULT_LOCK_DIR)
+            ),
+        },
+        heavy_input_chars=int(os.environ.get('HEAVY_INPUT_CHARS', '0'))
+    ))
+
+# On-demand profiling of analysis requests (X-Profile admin header or every
+# PROFILE_SAMPLE_EVERY-th request); registered last so it wraps only the view
+request_profiler.init_app(
+    app,
+    profile_dir=os.environ.get('PROFILE_DIR'),
+    token=os.environ.get('PROFILE_TOKEN'),
+    sample_every=int(os.environ.get('PROFILE_SAMPLE_EVERY', '0')),
+    retention=int(os.environ.get('PROFILE_RETENTION', request_profiler.DEFAULT_RETENTION)),
+    profiler=os.environ.get('PROFILER', 'cprofile'),
+    interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', request_profiler.DEFAULT_INTERVAL_MS))
+)
+
+# Load and compile the marker database once; shared by every engine
+# (and by all workers when gunicorn preloads the app before forking)
+MARKER_DB_PATH = os.environ.get('MARKER_DB_PATH', 'genericism_database.json')
+
+# Registry-backed engines of the current marker database version; replaced as a whole on reload
+_engines = AnalysisEngines(marker_registry.get_registry(MARKER_DB_PATH))
+
+
+def _swap_engines(registry: marker_registry.MarkerRegistry) -> None:
+    """Build engines for a reloaded registry (in the watcher thread) and swap them in"""
+    global _engines
+    _engines = AnalysisEngines(registry)
+
+
+marker_registry.subscribe(MARKER_DB_PATH, _swap_engines)
+
+# Reload the marker database when the file changes (MARKER_DB_POLL_SECONDS=0 disables);
+# gunicorn.conf.py restarts the watcher in each worker after fork
+if float(os.environ.get('MARKER_DB_POLL_SECONDS', '2')) > 0:
+    marker_registry.watch(MARKER_DB_PATH, float(os.environ.get('MARKER_DB_POLL_SECONDS', '2')))
+
+text_comparator = DualTextComparator(
+    approx_threshold=int(os.environ.get('CHANGE_APPROX_THRESHOLD_CHARS', DEFAULT_APPROX_THRESHOLD))
+)
+
+
+def current_engines() -> AnalysisEngines:
+    """
+    Engines of the current marker database version
+
+    Pinned for the rest of a request on first use, so a reload mid-request
+    never mixes two versions in one response.
+    """
+    if not has_request_context():
+        return _engines
+    engines = g.get('engines')
+    if engines is None:
+        engines = g.engines = _engines
+    return engines
+
+
+@app.after_request
+def _report_marker_db_version(response: Response) -> Response:
+    """Report the marker database version that produced the response"""
+    response.headers['X-Marker-DB-Version'] = current_engines().version
+    return response
+
+
+# Per-marker hit counts merged across workers, served at /api/markers/hits
+if os.environ.get('MARKER_ANALYTICS') == '1':
+    marker_analytics.init_app(app, marker_analytics.HitRecorder(
+        directory=os.environ.get('MARKER_ANALYTICS_DIR', marker_analytics.DEFAULT_DIR),
+        flush_interval=float(os.environ.get('MARKER_ANALYTICS_FLUSH_SECONDS', marker_analytics.DEFAULT_FLUSH_INTERVAL))
+    ), current_registry=lambda: current_engines().registry)
+
+
+# Texts longer than CHUNKED_THRESHOLD_CHARS are analyzed chunk by chunk
+CHUNKED_THRESHOLD_CHARS = int(os.environ.get('CHUNKED_THRESHOLD_CHARS', DEFAULT_CHUNKED_THRESHOLD))
+CHUNK_MAX_CHARS = int(os.environ.get('CHUNK_MAX_CHARS', DEFAULT_CHUNK_CHARS))
+
+# Span indexes of recently analyzed documents, for /api/spans range queries. Each worker
+# keeps an LRU and shares the indexes through SPAN_CACHE_DIR (empty: this worker only)
+span_cache = SpanIndexCache(
+    int(os.environ.get('SPAN_CACHE_DOCUMENTS', DEFAULT_CACHE_DOCUMENTS)),
+    shared_dir=os.environ.get('SPAN_CACHE_DIR', DEFAULT_SHARED_DIR) or None,
+    shared_ttl=float(os.environ.get('SPAN_CACHE_TTL_SECONDS', DEFAULT_SHARED_TTL))
+)
+
+# The PDF stack (ReportLab) is only imported when a report is first requested
+_report_generator = None
+_report_generator_lock = threading.Lock()
+
+
+def get_report_generator():
+    """Return the shared AuditReportGenerator, importing ReportLab on first use"""
+    global _report_generator
+    if _report_generator is None:
+        with _report_generator_lock:
+            if _report_generator is None:
+                from audit_report_generator import AuditReportGenerator
+                _report_generator = AuditReportGenerator()
+    return _report_generator
+
+
+def warm_up(include_reports: bool = True) -> None:
+    """
+    Prime lazily-loaded subsystems ahead of traffic
+    
+    Loads NLTK tokenizer data, runs each engine once on a short sample and,
+    unless disabled, imports the PDF stack. Runs at import time when
+    WARMUP_ON_START=1 (set WARMUP_REPORTS=0 to skip ReportLab).
+    """
+    tokenization.warm_up()
+    
+    sample = "As for the family, we must complete it. Furthermore, it is evident that the river is long."
+    engines = current_engines()
+    engines.aitism_detector.detect_ai_markers(sample)
+    engines.l2_voice_preserver.detect_voice_loss(sample, sample)
+    engines.identity_scorer.calculate_voice_preservation_score(sample, sample)
+    text_comparator.compare_texts(sample, sample)
+    
+    if include_reports:
+        get_report_generator()
+
+
+def cache_spans(text: str, **indexes) -> str:
+    """Cache span indexes (by source name) of a document; returns its document id"""
+    doc_id = document_id(text)
+    for source, index in indexes.items():
+        span_cache.put(doc_id, source, index)
+    return doc_id
+
+
+def use_chunked(data: dict, *texts: str) -> bool:
+    """
+    Decide whether a request is analyzed in chunked mode
+    
+    Requests the memory budget downgraded always run chunked. Otherwise an
+    explicit "chunked" flag in the request wins, and chunked mode is used
+    when any text is longer than CHUNKED_THRESHOLD_CHARS.
+    """
+    if request_budget.force_chunked():
+        return True
+    requested = data.get('chunked')
+    if requested is not None:
+        return bool(requested)
+    return any(len(text) > CHUNKED_THRESHOLD_CHARS for text in texts)
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'service': 'Linguistic Analysis API'})
+    return jsonify({'status': 'ok', 'service': 'Linguistic Analysis API',
+                    'marker_db_version': current_engines().version})
 
 
 @app.route('/analyze/aitism', methods=['POST'])
@@ -39,7 +244,10 @@ def analyze_aitism():
     Expected JSON:
     {
         "text": "The student's writing sample...",
-        "language": "english"
+        "language": "english",
+        "tokenizer": "regex",  (optional: punkt | regex)
+        "chunked": true,       (optional; automatic for very long texts)
+        "fields": ["ai_ism_score", "explanation"]   (optional; default all)
     }
     """
     try:
@@ -49,11 +257,28 @@ def analyze_aitism():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        results = aitism_detector.detect_ai_markers(text)
-        results['explanation'] = aitism_detector.get_ai_explanation(results['ai_ism_score'])
-        results['formulaic_index'] = aitism_detector.calculate_formulaic_index(text)
+        try:
+            fields = parse_fields(data.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(results)
+        try:
+            detector = current_engines().get_aitism_detector(data.get('tokenizer'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if use_chunked(data, text):
+            results = detector.detect_ai_markers_chunked(iter_chunks(text, CHUNK_MAX_CHARS))
+        else:
+            results = detector.detect_ai_markers(text)
+            if wants(fields, 'formulaic_index'):
+                results['formulaic_index'] = detector.calculate_formulaic_index(text)
+        results['explanation'] = detector.get_ai_explanation(results['ai_ism_score'])
+        doc_id = cache_spans(text, aitism=results['span_index'])
+        
+        response = select_fields(results, fields)
+        response['document_id'] = doc_id
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -67,7 +292,9 @@ def analyze_l2_voice():
     Expected JSON:
     {
         "original": "Original student draft...",
-        "edited": "AI-edited version..."
+        "edited": "AI-edited version...",
+        "chunked": true,  (optional; automatic for very long texts)
+        "fields": ["overall_score"]   (optional; default all)
     }
     """
     try:
@@ -78,13 +305,34 @@ def analyze_l2_voice():
         if not original or not edited:
             return jsonify({'error': 'Both original and edited text required'}), 400
         
-        voice_analysis = l2_voice_preserver.detect_l2_grammatical_structures(original)
-        voice_loss = l2_voice_preserver.detect_voice_loss(original, edited)
+        try:
+            fields = parse_fields(data.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        chunked = use_chunked(data, original, edited)
+        l2_voice_preserver = current_engines().l2_voice_preserver
+        results = {}
+        
+        if wants(fields, 'structure_analysis'):
+            if chunked:
+                results['structure_analysis'] = l2_voice_preserver.detect_l2_grammatical_structures_chunked(
+                    iter_chunks(original, CHUNK_MAX_CHARS))
+            else:
+                results['structure_analysis'] = l2_voice_preserver.detect_l2_grammatical_structures(original)
+            doc_id = cache_spans(original, l2_voice=results['structure_analysis']['span_index'])
         
-        return jsonify({
-            'structure_analysis': voice_analysis,
-            'voice_loss_analysis': voice_loss
-        })
+        if wants(fields, 'voice_loss_analysis'):
+            if chunked:
+                results['voice_loss_analysis'] = l2_voice_preserver.detect_voice_loss_chunked(
+                    original, edited, CHUNK_MAX_CHARS)
+            else:
+                results['voice_loss_analysis'] = l2_voice_preserver.detect_voice_loss(original, edited)
+        
+        response = select_fields(results, fields)
+        if 'structure_analysis' in results:
+            response['document_id'] = doc_id
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -98,7 +346,9 @@ def analyze_voice_preservation():
     Expected JSON:
     {
         "original": "Original student draft...",
-        "edited": "AI-edited version..."
+        "edited": "AI-edited version...",
+        "chunked": true,  (optional; automatic for very long texts)
+        "fields": ["overall_score"]   (optional; default all)
     }
     """
     try:
@@ -109,9 +359,19 @@ def analyze_voice_preservation():
         if not original or not edited:
             return jsonify({'error': 'Both original and edited text required'}), 400
         
-        results = identity_scorer.calculate_voice_preservation_score(original, edited)
+        try:
+            fields = parse_fields(data.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        identity_scorer = current_engines().identity_scorer
+        if use_chunked(data, original, edited):
+            results = identity_scorer.calculate_voice_preservation_score_chunked(
+                original, edited, CHUNK_MAX_CHARS)
+        else:
+            results = identity_scorer.calculate_voice_preservation_score(original, edited)
         
-        return jsonify(results)
+        return jsonify(select_fields(results, fields))
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -125,20 +385,40 @@ def compare_texts():
     Expected JSON:
     {
         "original": "Original student draft...",
-        "edited": "AI-edited version..."
+        "edited": "AI-edited version...",
+        "chunked": true,            (optional; automatic for very long texts)
+        "change_mode": "exact",     (optional: auto | exact | approximate)
+        "diff_format": "compact",   (optional: verbose | compact)
+        "fields": ["summary"]       (optional; default all)
     }
     """
     try:
         data = request.get_json()
         original = data.get('original', '')
         edited = data.get('edited', '')
+        change_mode = data.get('change_mode', 'auto')
+        diff_format = data.get('diff_format', 'verbose')
         
         if not original or not edited:
             return jsonify({'error': 'Both original and edited text required'}), 400
+        if change_mode not in CHANGE_MODES:
+            return jsonify({'error': f"change_mode must be one of: {', '.join(CHANGE_MODES)}"}), 400
+        if diff_format not in DIFF_FORMATS:
+            return jsonify({'error': f"diff_format must be one of: {', '.join(DIFF_FORMATS)}"}), 400
+        
+        try:
+            fields = parse_fields(data.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        results = text_comparator.compare_texts(original, edited)
+        sections = top_level(fields)
+        if use_chunked(data, original, edited):
+            results = text_comparator.compare_texts_chunked(original, edited, CHUNK_MAX_CHARS,
+                                                            change_mode, diff_format, sections)
+        else:
+            results = text_comparator.compare_texts(original, edited, change_mode, diff_format, sections)
         
-        return jsonify(results)
+        return jsonify(select_fields(results, fields))
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -152,42 +432,101 @@ def full_audit():
     Expected JSON:
     {
         "original": "Original student draft...",
-        "edited": "AI-edited version..."
+        "edited": "AI-edited version...",
+        "chunked": true,            (optional; automatic for very long texts)
+        "change_mode": "exact",     (optional: auto | exact | approximate)
+        "diff_format": "compact",   (optional: verbose | compact)
+        "fields": ["summary"]       (optional; default all)
     }
     """
     try:
         data = request.get_json()
         original = data.get('original', '')
         edited = data.get('edited', '')
+        change_mode = data.get('change_mode', 'auto')
+        diff_format = data.get('diff_format', 'verbose')
         
         if not original or not edited:
             return jsonify({'error': 'Both original and edited text required'}), 400
+        if change_mode not in CHANGE_MODES:
+            return jsonify({'error': f"change_mode must be one of: {', '.join(CHANGE_MODES)}"}), 400
+        if diff_format not in DIFF_FORMATS:
+            return jsonify({'error': f"diff_format must be one of: {', '.join(DIFF_FORMATS)}"}), 400
+        
+        try:
+            fields = parse_fields(data.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        chunked = use_chunked(data, original, edited)
+        engines = current_engines()
+        aitism_detector = engines.aitism_detector
+        l2_voice_preserver = engines.l2_voice_preserver
+        identity_scorer = engines.identity_scorer
+        results = {}
+        
+        # Run only the analyses behind the selected fields
+        if wants(fields, 'aitism_analysis') or wants(fields, 'summary.aitism_score'):
+            if chunked:
+                aitism_results = aitism_detector.detect_ai_markers_chunked(iter_chunks(original, CHUNK_MAX_CHARS))
+            else:
+                aitism_results = aitism_detector.detect_ai_markers(original)
+            aitism_results['explanation'] = aitism_detector.get_ai_explanation(aitism_results['ai_ism_score'])
+            results['aitism_analysis'] = aitism_results
         
-        # Run all analyses
-        aitism_results = aitism_detector.detect_ai_markers(original)
-        aitism_results['explanation'] = aitism_detector.get_ai_explanation(aitism_results['ai_ism_score'])
-        
-        l2_voice_results = l2_voice_preserver.detect_l2_grammatical_structures(original)
-        l2_voice_loss = l2_voice_preserver.detect_voice_loss(original, edited)
-        
-        voice_preservation = identity_scorer.calculate_voice_preservation_score(original, edited)
-        
-        comparison = text_comparator.compare_texts(original, edited)
-        
-        return jsonify({
-            'aitism_analysis': aitism_results,
-            'l2_voice_analysis': {
-                'structure_analysis': l2_voice_results,
-                'voice_loss_analysis': l2_voice_loss
-            },
-            'voice_preservation': voice_preservation,
-            'text_comparison': comparison,
-            'summary': {
-                'overall_score': voice_preservation['overall_score'],
-                'risk_level': voice_preservation['risk_level'],
-                'aitism_score': aitism_results['ai_ism_score']
-            }
-        })
+        l2_voice = {}
+        if wants(fields, 'l2_voice_analysis.structure_analysis'):
+            if chunked:
+                l2_voice['structure_analysis'] = l2_voice_preserver.detect_l2_grammatical_structures_chunked(
+                    iter_chunks(original, CHUNK_MAX_CHARS))
+            else:
+                l2_voice['structure_analysis'] = l2_voice_preserver.detect_l2_grammatical_structures(original)
+        if wants(fields, 'l2_voice_analysis.voice_loss_analysis'):
+            if chunked:
+                l2_voice['voice_loss_analysis'] = l2_voice_preserver.detect_voice_loss_chunked(
+                    original, edited, CHUNK_MAX_CHARS)
+            else:
+                l2_voice['voice_loss_analysis'] = l2_voice_preserver.detect_voice_loss(original, edited)
+        if l2_voice:
+            results['l2_voice_analysis'] = l2_voice
+        
+        indexes = {}
+        if 'aitism_analysis' in results:
+            indexes['aitism'] = results['aitism_analysis']['span_index']
+        if 'structure_analysis' in l2_voice:
+            indexes['l2_voice'] = l2_voice['structure_analysis']['span_index']
+        doc_id = cache_spans(original, **indexes) if indexes else None
+        
+        if (wants(fields, 'voice_preservation') or wants(fields, 'summary.overall_score')
+                or wants(fields, 'summary.risk_level')):
+            if chunked:
+                results['voice_preservation'] = identity_scorer.calculate_voice_preservation_score_chunked(
+                    original, edited, CHUNK_MAX_CHARS)
+            else:
+                results['voice_preservation'] = identity_scorer.calculate_voice_preservation_score(original, edited)
+        
+        if wants(fields, 'text_comparison'):
+            sections = top_level(subfields(fields, 'text_comparison'))
+            if chunked:
+                results['text_comparison'] = text_comparator.compare_texts_chunked(
+                    original, edited, CHUNK_MAX_CHARS, change_mode, diff_format, sections)
+            else:
+                results['text_comparison'] = text_comparator.compare_texts(
+                    original, edited, change_mode, diff_format, sections)
+        
+        if wants(fields, 'summary'):
+            summary = {'chunked': chunked}
+            if 'voice_preservation' in results:
+                summary['overall_score'] = results['voice_preservation']['overall_score']
+                summary['risk_level'] = results['voice_preservation']['risk_level']
+            if 'aitism_analysis' in results:
+                summary['aitism_score'] = results['aitism_analysis']['ai_ism_score']
+            results['summary'] = summary
+        
+        response = select_fields(results, fields)
+        if doc_id is not None:
+            response['document_id'] = doc_id
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -222,7 +561,7 @@ def generate_report():
         
         # Generate PDF
         pdf_buffer = io.BytesIO()
-        report_generator.generate_full_report(
+        get_report_generator().generate_full_report(
             pdf_buffer,
             original,
             edited,
@@ -247,15 +586,53 @@ def generate_report():
 
 @app.route('/api/markers', methods=['GET'])
 def get_ai_markers():
-    """Return the AI markers database for reference"""
+    """Return the AI markers database for reference (pre-serialized, ETag-validated)"""
+    try:
+        registry = current_engines().registry
+        response = Response(registry.markers_json, mimetype='application/json')
+        response.set_etag(registry.etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/spans/<doc_id>', methods=['GET'])
+def get_spans_in_range(doc_id):
+    """
+    Markers overlapping the character range [start, end) of an analyzed document
+    
+    doc_id is the "document_id" returned by /analyze/aitism, /analyze/l2-voice
+    or /analyze/full-audit. Indexes are shared by the workers of a host
+    (SPAN_CACHE_DIR) for SPAN_CACHE_TTL_SECONDS after their last use, so
+    a 404 means the text must be analyzed again.
+    
+    Query parameters: start (default 0), end (default: end of document)
+    """
     try:
-        with open('genericism_database.json', 'r') as f:
-            db = json.load(f)
-        return jsonify(db)
+        try:
+            start = int(request.args.get('start', 0))
+            end = int(request.args['end']) if 'end' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be integers'}), 400
+        if start < 0 or (end is not None and end < start):
+            return jsonify({'error': 'Expected 0 <= start <= end'}), 400
+        
+        markers = span_cache.query(doc_id, start, end if end is not None else sys.maxsize)
+        metrics.record_cache('span_index', markers is not None)
+        if markers is None:
+            return jsonify({'error': 'Unknown document_id; analyze the text first'}), 404
+        
+        return jsonify({'document_id': doc_id, 'start': start, 'end': end, 'markers': markers})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Optional warm-up; with gunicorn's preload_app this runs once in the master
+if os.environ.get('WARMUP_ON_START') == '1':
+    warm_up(include_reports=os.environ.get('WARMUP_REPORTS', '1') == '1')
+
+
 if __name__ == '__main__':
     # Development server
     app.run(debug=True, host='0.0.0.0', port=5000)
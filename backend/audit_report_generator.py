@@ -13,6 +13,7 @@ from datetime import datetime
 import io
 import json
 from typing import Dict, BinaryIO
+from stage_timing import stage
 
 
 class AuditReportGenerator:
@@ -95,6 +96,17 @@ class AuditReportGenerator:
         
         story = []
         
+        with stage('pdf.story'):
+            self._build_story(story, original_text, edited_text, aitism_results,
+                              voice_preservation, l2_voice_analysis, comparison_data)
+        
+        # Build PDF
+        with stage('pdf.build'):
+            doc.build(story)
+    
+    def _build_story(self, story: list, original_text: str, edited_text: str, aitism_results: Dict,
+                     voice_preservation: Dict, l2_voice_analysis: Dict, comparison_data: Dict) -> None:
+        """Append every report section's flowables to story"""
         # Title Page
         story.extend(self._create_title_page(original_text, edited_text, voice_preservation))
         story.append(PageBreak())
@@ -125,9 +137,6 @@ class AuditReportGenerator:
         
         # Methodology
         story.extend(self._create_methodology_section())
-        
-        # Build PDF
-        doc.build(story)
     
     def _create_title_page(self, original: str, edited: str, voice_results: Dict):
         """Create report title page"""
@@ -0,0 +1,101 @@
+"""
+Marker Artifact Benchmark
+Times building the marker registry from JSON and from its precompiled
+artifact as the database grows
+
+The shipped database is extended with --phrases synthetic high-frequency
+phrases and a tenth as many L1 interference markers per language (the
+sizes the artifact is meant for), written to a temporary directory, and
+loaded with MarkerRegistry.from_file without and then with an artifact.
+Each case keeps the best of --rounds loads; re's compile cache is purged
+before every JSON load so repeats pay full compilation, as a fresh worker
+does.
+
+Usage (from the backend directory):
+    python benchmarks/artifact_benchmark.py [--phrases 0 1000 5000 20000] [--rounds 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import marker_artifact  # noqa: E402
+import regex_cost  # noqa: E402
+import synthetic_corpus  # noqa: E402
+from marker_registry import MarkerRegistry  # noqa: E402
+
+DEFAULT_PHRASES = (0, 1000, 5000, 20000)
+
+
+def grown_database(db: Dict, phrases: int, seed: int = 0) -> Dict:
+    """Copy of db with synthetic phrases and L1 markers appended"""
+    rng = random.Random(seed)
+    vocabulary = sorted({w.strip('.,').lower() for part in (synthetic_corpus.SUBJECTS, synthetic_corpus.VERBS,
+                                                               synthetic_corpus.OBJECTS, synthetic_corpus.TAILS)
+                         for entry in part for w in entry.split()} - {''})
+    grown = json.loads(json.dumps(db))
+    ai_markers = grown['ai_markers']
+    ai_markers['high_frequency'] += [f"{' '.join(rng.sample(vocabulary, 2))} {i}" for i in range(phrases)]
+    for lang, markers in ai_markers['l2_interference_markers'].items():
+        markers += [f"{' '.join(rng.sample(vocabulary, 2))} {lang}{i}" for i in range(phrases // 10)]
+    return grown
+
+
+def best_load_ms(db_path: str, rounds: int, purge: bool) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        if purge:
+            re.purge()
+        started = time.perf_counter()
+        MarkerRegistry.from_file(db_path, cost_policy=regex_cost.FLAG)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def benchmark(sizes: List[int], rounds: int) -> List[Dict]:
+    with open(synthetic_corpus.DEFAULT_DB, 'r', encoding='utf-8') as f:
+        db = json.load(f)
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix='marker_artifact_')
+    try:
+        for phrases in sizes:
+            db_path = os.path.join(tmp_dir, f'db_{phrases}.json')
+            with open(db_path, 'w', encoding='utf-8') as f:
+                json.dump(grown_database(db, phrases), f)
+            json_ms = best_load_ms(db_path, rounds, purge=True)
+            artifact_path = marker_artifact.build(db_path)
+            artifact_ms = best_load_ms(db_path, rounds, purge=False)
+            results.append({'phrases': phrases, 'json_ms': round(json_ms, 1), 'artifact_ms': round(artifact_ms, 1),
+                            'artifact_bytes': os.path.getsize(artifact_path)})
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--phrases', type=int, nargs='+', default=list(DEFAULT_PHRASES),
+                        help='synthetic phrases added to the database')
+    parser.add_argument('--rounds', type=int, default=3, help='loads per case (best is kept)')
+    args = parser.parse_args()
+
+    print(f"{'phrases':>8}{'json ms':>12}{'artifact ms':>14}{'speedup':>10}{'artifact KB':>14}")
+    for r in benchmark(args.phrases, args.rounds):
+        print(f"{r['phrases']:>8}{r['json_ms']:>12.1f}{r['artifact_ms']:>14.1f}"
+              f"{r['json_ms'] / r['artifact_ms']:>9.1f}x{r['artifact_bytes'] / 1024:>14.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Engine Benchmark
+Times every analysis engine on synthetic document pairs and fails on
+regressions against a JSON baseline
+
+Pairs of 100, 1k, 10k and 100k words are generated by synthetic_corpus.py
+with a fixed marker density and edit rate. Each case keeps the best of up
+to --rounds runs (fewer when a case exceeds --case-seconds). Timings are
+normalized by a fixed pure-Python calibration workload, so a baseline
+recorded on one machine can gate runs on another. A case regresses when
+its normalized time exceeds the baseline by more than --threshold and by
+more than --min-delta-ms. Runs offline: the regex tokenizer is used unless
+--tokenizer punkt is given, and no NLTK data is needed.
+
+Usage (from the backend directory):
+    python benchmarks/engine_benchmark.py                    # compare with the baseline
+    python benchmarks/engine_benchmark.py --update-baseline  # record a new baseline
+    python benchmarks/engine_benchmark.py --sizes 100 1000 --engines aitism.detect_ai_markers
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import synthetic_corpus  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'engine_baseline.json')
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# Allowed slowdown relative to the baseline, and the absolute noise floor
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 2.0
+
+ENGINES = (
+    'aitism.detect_ai_markers',
+    'aitism.calculate_formulaic_index',
+    'l2_voice.detect_voice_loss',
+    'identity.calculate_voice_preservation_score',
+    'comparator.compare_texts',
+    'report.generate_full_report',
+)
+
+
+def calibrate(rounds: int = 20) -> float:
+    """Best time (ms) of a fixed workload mixing regex, dict and string work"""
+    text = ' '.join(f'word{i % 97} Furthermore, item{i % 13}.' for i in range(4000))
+    pattern = re.compile(r'\b(furthermore|item\d+)\b', re.IGNORECASE)
+
+    def workload():
+        counts = {}
+        for token in text.split():
+            counts[token] = counts.get(token, 0) + 1
+        return len(pattern.findall(text)), sorted(counts)
+
+    return best_time(workload, rounds, max_seconds=None)[0]
+
+
+def best_time(func: Callable, rounds: int, max_seconds: Optional[float]) -> Tuple[float, int]:
+    """Best wall time (ms) of func() and the number of rounds run"""
+    best = None
+    spent = 0.0
+    runs = 0
+    while runs < rounds:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        runs += 1
+        if max_seconds is not None and spent > max_seconds:
+            break
+    return best * 1000, runs
+
+
+def build_engines(tokenizer_backend: str, selected: List[str] = ENGINES) -> Tuple[Dict[str, Callable], Callable]:
+    """
+    Engines as app.py configures them, keyed like ENGINES, and a function
+    building the (untimed) engine results the PDF report is generated from
+    """
+    import tokenization
+    from marker_registry import get_registry
+    from aitism_detector import AIismDetector
+    from l2_voice_preserver import L2VoicePreserver
+    from linguistic_identity_scorer import LinguisticIdentityScorer
+    from dual_text_comparator import DualTextComparator
+
+    tokenizer = tokenization.get_tokenizer(tokenizer_backend)
+    registry = get_registry('genericism_database.json')
+    detector = AIismDetector(registry=registry, tokenizer=tokenizer)
+    preserver = L2VoicePreserver(registry=registry, tokenizer=tokenizer)
+    scorer = LinguisticIdentityScorer(registry=registry, tokenizer=tokenizer)
+    comparator = DualTextComparator()
+    if 'report.generate_full_report' in selected:
+        # ReportLab is only needed when the report engine is timed
+        from audit_report_generator import AuditReportGenerator
+        report_generator = AuditReportGenerator()
+
+    def full_report(original: str, edited: str, inputs: Dict) -> None:
+        report_generator.generate_full_report(
+            io.BytesIO(), original, edited, inputs['aitism'], inputs['preservation'],
+            inputs['l2_voice'], inputs['comparison']
+        )
+
+    def report_inputs(original: str, edited: str) -> Dict:
+        """Untimed engine results the report is built from (JSON round-tripped, as sent by clients)"""
+        aitism = detector.detect_ai_markers(original)
+        aitism['explanation'] = detector.get_ai_explanation(aitism['ai_ism_score'])
+        results = {
+            'aitism': aitism,
+            'preservation': scorer.calculate_voice_preservation_score(original, edited),
+            'l2_voice': {
+                'structure_analysis': preserver.detect_l2_grammatical_structures(original),
+                'voice_loss_analysis': preserver.detect_voice_loss(original, edited),
+            },
+            'comparison': comparator.compare_texts(original, edited),
+        }
+        return json.loads(json.dumps(results, default=lambda o: o.__json__()))
+
+    engines = {
+        'aitism.detect_ai_markers': lambda o, e, _: detector.detect_ai_markers(o),
+        'aitism.calculate_formulaic_index': lambda o, e, _: detector.calculate_formulaic_index(o),
+        'l2_voice.detect_voice_loss': lambda o, e, _: preserver.detect_voice_loss(o, e),
+        'identity.calculate_voice_preservation_score':
+            lambda o, e, _: scorer.calculate_voice_preservation_score(o, e),
+        'comparator.compare_texts': lambda o, e, _: comparator.compare_texts(o, e),
+        'report.generate_full_report': full_report,
+    }
+    return engines, report_inputs
+
+
+def run(sizes: List[int], engines: List[str], marker_density: float, edit_rate: float,
+        seed: int, rounds: int, case_seconds: float, tokenizer_backend: str) -> Dict:
+    """Time each engine at each size; returns a report in the baseline format"""
+    available, report_inputs = build_engines(tokenizer_backend, engines)
+    markers = synthetic_corpus.load_markers()
+
+    report = {
+        'corpus': {'marker_density': marker_density, 'edit_rate': edit_rate, 'seed': seed},
+        'tokenizer': tokenizer_backend,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'calibration_ms': round(calibrate(), 3),
+        'results': {engine: {} for engine in engines},
+    }
+
+    for words in sizes:
+        original, edited = synthetic_corpus.generate_pair(words, marker_density, edit_rate, seed, markers)
+        inputs = report_inputs(original, edited) if 'report.generate_full_report' in engines else None
+        for engine in engines:
+            func = available[engine]
+            ms, runs = best_time(lambda: func(original, edited, inputs), rounds, case_seconds)
+            report['results'][engine][str(words)] = round(ms, 3)
+            print(f'{engine:<46}{words:>8} words{ms:>12.2f} ms  ({runs} run{"s" if runs != 1 else ""})',
+                  file=sys.stderr)
+
+    return report
+
+
+def compare(report: Dict, baseline: Dict, threshold: float, min_delta_ms: float,
+            normalize: bool = True) -> Tuple[List[str], List[str]]:
+    """Regressions of report against baseline and cases the baseline lacks, as printable lines"""
+    scale = baseline['calibration_ms'] / report['calibration_ms'] if normalize else 1.0
+    regressions = []
+    missing = []
+
+    print(f"calibration: {report['calibration_ms']} ms (baseline {baseline['calibration_ms']} ms); "
+          f"times scaled by {scale:.3f}")
+    print(f"{'engine':<46}{'words':>8}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    for engine, sizes in report['results'].items():
+        for words, ms in sizes.items():
+            base = baseline['results'].get(engine, {}).get(words)
+            if base is None:
+                print(f'{engine:<46}{words:>8}{"n/a":>14}{ms * scale:>14.2f}{"":>10}  MISSING')
+                missing.append(f'{engine} at {words} words')
+                continue
+            current = ms * scale
+            change = (current - base) / base if base else 0.0
+            regressed = change > threshold and current - base > min_delta_ms
+            print(f'{engine:<46}{words:>8}{base:>14.2f}{current:>14.2f}{change:>+10.1%}'
+                  f'{"  REGRESSION" if regressed else ""}')
+            if regressed:
+                regressions.append(f'{engine} at {words} words: {base:.2f} -> {current:.2f} ms ({change:+.1%})')
+
+    return regressions, missing
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='words per text')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=ENGINES, help='engines to time')
+    parser.add_argument('--marker-density', type=float, default=synthetic_corpus.DEFAULT_MARKER_DENSITY,
+                        help='fraction of sentences carrying a marker')
+    parser.add_argument('--edit-rate', type=float, default=synthetic_corpus.DEFAULT_EDIT_RATE,
+                        help='fraction of sentences AI-edited')
+    parser.add_argument('--seed', type=int, default=0, help='corpus seed')
+    parser.add_argument('--rounds', type=int, default=5, help='timing rounds per case (best is kept)')
+    parser.add_argument('--case-seconds', type=float, default=10.0,
+                        help='stop repeating a case after this much time')
+    parser.add_argument('--tokenizer', default='regex', help='tokenizer backend (punkt needs NLTK data)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help='ignore slowdowns smaller than this')
+    parser.add_argument('--no-normalize', action='store_true',
+                        help='compare raw times instead of calibration-scaled times')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.engines, args.marker_density, args.edit_rate, args.seed,
+                 args.rounds, args.case_seconds, args.tokenizer)
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {os.path.relpath(args.baseline, BACKEND_DIR)}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; record one with --update-baseline')
+        return 2
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['corpus'] != report['corpus'] or baseline['tokenizer'] != report['tokenizer']:
+        print('Corpus or tokenizer settings differ from the baseline; results are not comparable')
+        return 2
+
+    regressions, missing = compare(report, baseline, args.threshold, args.min_delta_ms, not args.no_normalize)
+    if missing:
+        # An ungated case would pass silently forever
+        print(f'FAILED: {len(missing)} case(s) missing from the baseline; record them with --update-baseline')
+        for line in missing:
+            print(f'  {line}')
+        return 1
+    if regressions:
+        print(f'FAILED: {len(regressions)} regression(s) beyond {args.threshold:.0%}')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print('OK: no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Load Test
+Replays a mix of analysis and report requests against a local gunicorn
+instance of app:app at increasing concurrency levels
+
+For each worker count and worker class, gunicorn is started on a free local
+port (with gunicorn.conf.py), and closed-loop clients send requests drawn
+from the mix in load_mix.json. The mix gives endpoint weights and lognormal
+input-size distributions; payloads are synthetic pairs from
+synthetic_corpus.py, and /generate-report bodies are built from a full audit
+of the same pair. Each level reports throughput, p50/p95/p99 latency and
+error rate per endpoint, giving a saturation curve per worker setup.
+Only the standard library is needed on the client side.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py [--workers 1 2 4] [--worker-classes sync gthread]
+        [--concurrency 1 2 4 8 16 32] [--duration 20] [--json]
+    python benchmarks/load_test.py --url http://127.0.0.1:5000   # an already running server
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import synthetic_corpus  # noqa: E402
+
+DEFAULT_MIX = os.path.join(BACKEND_DIR, 'benchmarks', 'load_mix.json')
+DEFAULT_CONCURRENCY = (1, 2, 4, 8, 16, 32)
+
+REPORT_ENDPOINT = '/generate-report'
+
+# Slow requests (long reports) must not be cut off by the client
+REQUEST_TIMEOUT = 300
+
+
+class Connection(http.client.HTTPConnection):
+    """HTTP connection with Nagle's algorithm off, so delayed ACKs don't add ~40 ms per request"""
+
+    def connect(self) -> None:
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """A gunicorn app:app process on a local port, stopped on exit"""
+
+    def __init__(self, workers: int, worker_class: str, threads: int, timeout: int = REQUEST_TIMEOUT):
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.command = [
+            sys.executable, '-m', 'gunicorn', 'app:app',
+            '--bind', f'127.0.0.1:{self.port}',
+            '--workers', str(workers), '--worker-class', worker_class, '--threads', str(threads),
+            '--timeout', str(timeout), '--log-level', 'warning',
+        ]
+        self.process = None
+
+    def __enter__(self) -> 'Server':
+        self.process = subprocess.Popen(self.command, cwd=BACKEND_DIR)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                status, _ = request_json(self.url, 'GET', '/health')
+                if status == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError('gunicorn did not become healthy within 60 s')
+
+    def __exit__(self, *exc) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def request_json(base_url: str, method: str, path: str, body: Optional[bytes] = None,
+                 connection: Optional[http.client.HTTPConnection] = None) -> Tuple[int, bytes]:
+    """One request; returns (status, body). Opens a connection unless one is given"""
+    parts = urlsplit(base_url)
+    conn = connection or Connection(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.will_close:
+            conn.close()
+        return response.status, data
+    finally:
+        if connection is None:
+            conn.close()
+
+
+def load_mix(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sample_words(rng: random.Random, spec: Dict) -> int:
+    """Words per text drawn from the endpoint's lognormal size distribution"""
+    words = int(rng.lognormvariate(math.log(spec['median_words']), spec['sigma']))
+    return max(20, min(words, spec.get('max_words', words)))
+
+
+def build_payloads(mix: Dict, base_url: str, seed: int = 0) -> Dict[str, List[bytes]]:
+    """
+    Request bodies per endpoint, generated once before the run
+
+    Report bodies embed a full audit of their pair, fetched from the server.
+    """
+    rng = random.Random(seed)
+    markers = synthetic_corpus.load_markers()
+    payloads = {}
+
+    for endpoint, spec in mix['endpoints'].items():
+        bodies = []
+        for i in range(mix.get('payloads_per_endpoint', 16)):
+            original, edited = synthetic_corpus.generate_pair(
+                sample_words(rng, spec), mix.get('marker_density', synthetic_corpus.DEFAULT_MARKER_DENSITY),
+                mix.get('edit_rate', synthetic_corpus.DEFAULT_EDIT_RATE), seed=seed * 1000 + i, markers=markers
+            )
+            if endpoint == '/analyze/aitism':
+                body = {'text': original}
+            elif endpoint == REPORT_ENDPOINT:
+                status, data = request_json(base_url, 'POST', '/analyze/full-audit',
+                                            json.dumps({'original': original, 'edited': edited}).encode('utf-8'))
+                if status != 200:
+                    raise RuntimeError(f'Full audit for a report payload failed with status {status}')
+                body = dict(json.loads(data), original=original, edited=edited)
+            else:
+                body = {'original': original, 'edited': edited}
+            bodies.append(json.dumps(body).encode('utf-8'))
+        payloads[endpoint] = bodies
+
+    return payloads
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_level(base_url: str, mix: Dict, payloads: Dict[str, List[bytes]], concurrency: int,
+              duration: float, warmup: float, seed: int = 0) -> Dict:
+    """
+    Run `concurrency` closed-loop clients for warmup + duration seconds
+
+    Only requests completing after the warm-up are counted.
+    """
+    endpoints = list(mix['endpoints'])
+    weights = [mix['endpoints'][e]['weight'] for e in endpoints]
+    parts = urlsplit(base_url)
+
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def client(client_id: int) -> None:
+        rng = random.Random(f'{seed}:{concurrency}:{client_id}')
+        conn = None
+        local = defaultdict(list)
+        while time.monotonic() < stop_at:
+            endpoint = rng.choices(endpoints, weights)[0]
+            body = rng.choice(payloads[endpoint])
+            if conn is None or conn.sock is None:
+                conn = Connection(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+            sent = time.monotonic()
+            try:
+                status, _ = request_json(base_url, 'POST', endpoint, body, connection=conn)
+                ok = status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = None
+                ok = False
+            done = time.monotonic()
+            if sent >= measure_from and done <= stop_at:
+                local[endpoint].append((done - sent, ok))
+        if conn is not None:
+            conn.close()
+        with lock:
+            for endpoint, values in local.items():
+                samples[endpoint].extend(values)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for endpoint in endpoints + ['all']:
+        values = samples[endpoint] if endpoint != 'all' else [v for vs in samples.values() for v in vs]
+        latencies = sorted(latency for latency, _ in values)
+        errors = sum(1 for _, ok in values if not ok)
+        results[endpoint] = {
+            'requests': len(values),
+            'throughput_rps': round(len(values) / duration, 3),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'error_rate': round(errors / len(values), 4) if values else 0.0,
+        }
+    return results
+
+
+def run_sweep(base_url: str, mix: Dict, concurrency_levels: List[int], duration: float,
+              warmup: float, seed: int) -> List[Dict]:
+    """Build payloads against a running server and run every concurrency level"""
+    payloads = build_payloads(mix, base_url, seed)
+    levels = []
+    for concurrency in concurrency_levels:
+        endpoints = run_level(base_url, mix, payloads, concurrency, duration, warmup, seed)
+        levels.append({'concurrency': concurrency, 'endpoints': endpoints})
+        total = endpoints['all']
+        print(f"  concurrency {concurrency:>4}: {total['throughput_rps']:>8.2f} req/s  "
+              f"p50 {total['p50_ms']:>8.1f} ms  p99 {total['p99_ms']:>8.1f} ms  "
+              f"errors {total['error_rate']:.2%}", file=sys.stderr)
+    return levels
+
+
+def print_report(runs: List[Dict]) -> None:
+    """Per-endpoint table for every worker setup and concurrency level"""
+    columns = ('requests', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate')
+    for run in runs:
+        print(f"\n{run['server']}")
+        print(f"{'conc':>5}  {'endpoint':<30}" + ''.join(f'{c:>16}' for c in columns))
+        for level in run['levels']:
+            for endpoint, row in level['endpoints'].items():
+                print(f"{level['concurrency']:>5}  {endpoint:<30}" + ''.join(f'{row[c]:>16}' for c in columns))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='request mix JSON file')
+    parser.add_argument('--url', help='target an already running server instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2], help='gunicorn worker counts to sweep')
+    parser.add_argument('--worker-classes', nargs='+', default=['sync'], help='gunicorn worker classes to sweep')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker (gthread)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=list(DEFAULT_CONCURRENCY),
+                        help='concurrent clients per level')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds before each level')
+    parser.add_argument('--seed', type=int, default=0, help='payload and request-order seed')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    mix = load_mix(args.mix)
+    runs = []
+
+    if args.url:
+        print(f'server {args.url}', file=sys.stderr)
+        runs.append({'server': args.url, 'levels': run_sweep(
+            args.url, mix, args.concurrency, args.duration, args.warmup, args.seed)})
+    else:
+        for worker_class in args.worker_classes:
+            for workers in args.workers:
+                label = f'gunicorn {workers} x {worker_class}'
+                if worker_class == 'gthread':
+                    label += f' ({args.threads} threads)'
+                print(label, file=sys.stderr)
+                with Server(workers, worker_class, args.threads) as server:
+                    levels = run_sweep(server.url, mix, args.concurrency, args.duration, args.warmup, args.seed)
+                runs.append({'server': label, 'workers': workers, 'worker_class': worker_class,
+                             'levels': levels})
+
+    if args.json:
+        print(json.dumps(runs, indent=2))
+    else:
+        print_report(runs)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Serialization Benchmark
+Reports JSON encode time and compressed size of each analysis endpoint's payload
+
+Payloads are built with the same engine calls as the endpoints in app.py,
+from the sentence corpus repeated to the requested length with a
+deterministic "AI edit" applied to every third sentence. Each payload is
+encoded with the stdlib encoder (Flask's default provider), with orjson when
+installed, and compressed with gzip and, when installed, brotli.
+
+Usage (from the backend directory):
+    python benchmarks/serialization_benchmark.py [--words 10000] [--rounds 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+os.environ.setdefault('TOKENIZER_BACKEND', 'regex')
+
+import response_encoding  # noqa: E402
+from app import app, current_engines, text_comparator  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, 'benchmarks', 'data', 'sentence_corpus.txt')
+
+# Substitutions applied to every third sentence to simulate AI polishing
+AI_EDITS = [
+    ('very very', 'extremely'), ('big', 'significant'), ('use', 'utilize'),
+    ('show', 'demonstrate'), ('help', 'facilitate'), ('In my country', 'Culturally'),
+]
+
+
+def build_texts(corpus_path: str, words: int) -> Tuple[str, str]:
+    """Repeat the corpus to about `words` words and derive an edited version"""
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        sentences = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    original, edited, count = [], [], 0
+    i = 0
+    while count < words:
+        sentence = sentences[i % len(sentences)]
+        polished = sentence
+        if i % 3 == 0:
+            for old, new in AI_EDITS:
+                polished = polished.replace(old, new)
+            polished = 'Furthermore, ' + polished[0].lower() + polished[1:]
+        original.append(sentence)
+        edited.append(polished)
+        count += len(sentence.split())
+        i += 1
+        if i % 5 == 0:
+            original.append('\n\n')
+            edited.append('\n\n')
+
+    return ' '.join(original), ' '.join(edited)
+
+
+def build_payloads(original: str, edited: str) -> Dict[str, Dict]:
+    """Endpoint response bodies, as app.py builds them"""
+    engines = current_engines()
+    aitism_detector = engines.aitism_detector
+    l2_voice_preserver = engines.l2_voice_preserver
+    identity_scorer = engines.identity_scorer
+
+    aitism = aitism_detector.detect_ai_markers(original)
+    aitism['explanation'] = aitism_detector.get_ai_explanation(aitism['ai_ism_score'])
+    aitism['formulaic_index'] = aitism_detector.calculate_formulaic_index(original)
+
+    l2_voice = {
+        'structure_analysis': l2_voice_preserver.detect_l2_grammatical_structures(original),
+        'voice_loss_analysis': l2_voice_preserver.detect_voice_loss(original, edited),
+    }
+    preservation = identity_scorer.calculate_voice_preservation_score(original, edited)
+    comparison = text_comparator.compare_texts(original, edited)
+
+    return {
+        '/analyze/aitism': aitism,
+        '/analyze/l2-voice': l2_voice,
+        '/analyze/voice-preservation': preservation,
+        '/analyze/compare': comparison,
+        '/analyze/full-audit': {
+            'aitism_analysis': aitism,
+            'l2_voice_analysis': l2_voice,
+            'voice_preservation': preservation,
+            'text_comparison': comparison,
+            'summary': {
+                'overall_score': preservation['overall_score'],
+                'risk_level': preservation['risk_level'],
+                'aitism_score': aitism['ai_ism_score'],
+                'chunked': False,
+            },
+        },
+    }
+
+
+def best_time(func: Callable, rounds: int):
+    """Best-of-rounds wall time (ms) and the last result of func()"""
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+
+def benchmark(words: int, rounds: int, corpus_path: str) -> Dict:
+    """Time encoders and compressors on every endpoint payload"""
+    original, edited = build_texts(corpus_path, words)
+    payloads = build_payloads(original, edited)
+
+    provider = response_encoding.FastJSONProvider(app)
+
+    def stdlib(obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=provider.default).encode('utf-8')
+
+    report = {
+        'words': len(original.split()),
+        'orjson': response_encoding.orjson is not None,
+        'encodings': response_encoding.available_encodings(),
+        'endpoints': {},
+    }
+
+    for endpoint, payload in payloads.items():
+        row = {}
+        row['stdlib_ms'], body = best_time(lambda: stdlib(payload), rounds)
+        row['json_bytes'] = len(body)
+        if response_encoding.orjson is not None:
+            row['orjson_ms'], _ = best_time(lambda: provider._dump_bytes(payload, False), rounds)
+        for encoding in response_encoding.available_encodings():
+            ms, compressed = best_time(lambda: response_encoding.compress_body(body, encoding), rounds)
+            row[f'{encoding}_ms'] = ms
+            row[f'{encoding}_bytes'] = len(compressed)
+        report['endpoints'][endpoint] = row
+
+    return report
+
+
+def print_report(report: Dict) -> None:
+    """Print a human-readable summary table"""
+    print(f"payloads for {report['words']} words; orjson: {'yes' if report['orjson'] else 'no'}; "
+          f"encodings: {', '.join(report['encodings'])}")
+    columns = ['json_bytes', 'stdlib_ms', 'orjson_ms'] + [
+        f'{e}_{k}' for e in report['encodings'] for k in ('bytes', 'ms')
+    ]
+    print(f"{'endpoint':<30}" + ''.join(f'{c:>12}' for c in columns))
+    for endpoint, row in report['endpoints'].items():
+        print(f'{endpoint:<30}' + ''.join(f"{row.get(c, 'n/a'):>12}" for c in columns))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--words', type=int, default=10000, help='approximate words per text')
+    parser.add_argument('--rounds', type=int, default=5, help='timing rounds (best is kept)')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='sentence corpus file')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = benchmark(args.words, args.rounds, args.corpus)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
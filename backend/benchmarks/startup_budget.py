@@ -0,0 +1,109 @@
+"""
+Startup Budget Check
+Measures per-module import time of the API process with -X importtime
+and fails when a budget in startup_budget.json is exceeded
+
+Usage (from the backend directory):
+    python benchmarks/startup_budget.py [--runs 3] [--budget benchmarks/startup_budget.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(BACKEND_DIR, 'benchmarks', 'startup_budget.json')
+
+
+def measure_imports(entry_module: str) -> Tuple[Dict[str, float], set]:
+    """
+    Import entry_module in a fresh interpreter
+
+    Returns: (cumulative import time in ms per module, set of top-level packages imported)
+    """
+    code = (
+        f"import sys, {entry_module}; "
+        "print('\\n'.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    )
+    env = dict(os.environ, WARMUP_ON_START='0')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {entry_module} failed:\n{proc.stderr[-2000:]}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative) / 1000
+
+    return timings, set(proc.stdout.split())
+
+
+def check_budget(budget: Dict, runs: int) -> int:
+    """Print a timing table and return the number of budget violations"""
+    entry = budget.get('entry_module', 'app')
+    best = {}
+    loaded = set()
+
+    # Keep the fastest run per module to filter out scheduler noise
+    for _ in range(runs):
+        timings, loaded = measure_imports(entry)
+        for name, ms in timings.items():
+            best[name] = min(ms, best.get(name, ms))
+
+    violations = 0
+    # The entry module's cumulative time is the total, checked once against total_ms below
+    limits = {name: limit for name, limit in budget.get('modules_ms', {}).items() if name != entry}
+
+    print(f"{'module':<32}{'import ms':>12}{'budget ms':>12}")
+    for name, limit in sorted(limits.items(), key=lambda kv: -best.get(kv[0], 0)):
+        ms = best.get(name)
+        if ms is None:
+            print(f"{name:<32}{'not loaded':>12}{limit:>12}")
+            continue
+        over = limit is not None and ms > limit
+        violations += over
+        print(f"{name:<32}{ms:>12.1f}{limit:>12}{'  OVER BUDGET' if over else ''}")
+
+    total = best.get(entry, 0)
+    print(f"{entry + ' (total)':<32}{total:>12.1f}{budget.get('total_ms')!s:>12}")
+    if budget.get('total_ms') is not None and total > budget['total_ms']:
+        print(f"Total startup {total:.1f} ms exceeds {budget['total_ms']} ms")
+        violations += 1
+
+    for package in budget.get('forbidden_eager_imports', []):
+        if package in loaded:
+            print(f"{package} is imported eagerly by {entry}; it must load lazily")
+            violations += 1
+
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help='budget JSON file')
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters to measure')
+    args = parser.parse_args()
+
+    with open(args.budget, 'r') as f:
+        budget = json.load(f)
+
+    violations = check_budget(budget, args.runs)
+    if violations:
+        print(f"FAILED: {violations} startup budget violation(s)")
+        return 1
+    print("OK: startup within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
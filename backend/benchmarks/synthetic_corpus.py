@@ -0,0 +1,152 @@
+"""
+Synthetic Corpus
+Deterministic original/edited text pairs for benchmarks and load tests
+
+Sentences are assembled from a neutral vocabulary that matches no marker.
+A `marker_density` fraction of them carry one marker taken from
+genericism_database.json (AI phrases, transitions, formulaic openings, L2
+structures, cultural keywords, L1 markers), and an `edit_rate` fraction is
+"AI-edited" in the edited text: rewritten with AI vocabulary, prefixed with
+a transition, dropped, or followed by an inserted generic sentence. The same
+(words, marker_density, edit_rate, seed) always yields the same pair.
+"""
+
+import json
+import os
+import random
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(BACKEND_DIR, 'genericism_database.json')
+
+DEFAULT_MARKER_DENSITY = 0.2
+DEFAULT_EDIT_RATE = 0.3
+
+SUBJECTS = [
+    'the farmer', 'our teacher', 'the river', 'a small town', 'the new road', 'my neighbour',
+    'the old market', 'this method', 'the survey', 'the committee', 'the harvest', 'the bridge',
+]
+VERBS = [
+    'changed', 'supports', 'moved', 'reached', 'needs', 'opened', 'carried', 'measured',
+    'follows', 'reduced', 'repaired', 'described',
+]
+OBJECTS = [
+    'the water supply', 'many houses', 'the school garden', 'three new rules', 'the morning bus',
+    'our results', 'the price of rice', 'the north field', 'a long report', 'the night shift',
+]
+TAILS = [
+    'last winter', 'after the rain', 'in the second year', 'before noon', 'without much help',
+    'near the station', 'for two weeks', 'at the end of the term',
+]
+
+# Word substitutions applied by the simulated AI edit
+AI_VOCABULARY = [
+    ('changed', 'transformed'), ('supports', 'underpins'), ('needs', 'necessitates'),
+    ('many', 'numerous'), ('described', 'elucidated'), ('reduced', 'mitigated'),
+    ('big', 'significant'), ('help', 'facilitate'), ('show', 'demonstrate'),
+]
+INSERTED_SENTENCES = [
+    'This highlights the multifaceted nature of the issue.',
+    'Such developments underscore the importance of a holistic approach.',
+    'These findings pave the way for further exploration.',
+]
+
+# Sentences that start with a formulaic pattern from the database
+FORMULAIC_OPENINGS = [
+    'This has become a concern as', 'In the context of the harvest,', 'Due to the weather,',
+    'As a result,', 'In light of this,',
+]
+L2_STRUCTURE_OPENINGS = ['As for', 'Regarding']
+
+
+def load_markers(db_path: str = DEFAULT_DB) -> Dict[str, List[str]]:
+    """Marker phrases by injection kind, from the genericism database"""
+    with open(db_path, 'r', encoding='utf-8') as f:
+        db = json.load(f)
+    ai_markers = db['ai_markers']
+    voice_markers = db['voice_preservation_markers']
+    return {
+        'phrase': (list(ai_markers['high_frequency']) + list(ai_markers['academic_clichés'])
+                   + list(ai_markers['generic_openers'])),
+        'transition': list(ai_markers['transition_abuse']),
+        'cultural': [k for group in voice_markers.get('cultural_metaphor_keywords', ())
+                     for k in group['keywords']],
+        # Only literal markers; descriptive entries such as "make + noun form" never occur in text
+        'l1': [m for markers in ai_markers['l2_interference_markers'].values()
+               for m in markers if '+' not in m and '/' not in m and '(' not in m],
+    }
+
+
+def _plain_sentence(rng: random.Random) -> str:
+    sentence = f'{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(TAILS)}.'
+    return sentence[0].upper() + sentence[1:]
+
+
+def _marked_sentence(rng: random.Random, markers: Dict[str, List[str]]) -> str:
+    """A sentence carrying one marker of a randomly chosen kind"""
+    body = _plain_sentence(rng)
+    lowered = body[0].lower() + body[1:]
+    kind = rng.choice(('phrase', 'transition', 'formulaic', 'l2_structure', 'cultural', 'l1'))
+    if kind == 'formulaic':
+        return f'{rng.choice(FORMULAIC_OPENINGS)} {lowered}'
+    if kind == 'l2_structure':
+        return f'{rng.choice(L2_STRUCTURE_OPENINGS)} {rng.choice(OBJECTS)}, {lowered}'
+    if kind == 'cultural':
+        return f'{body[:-1]} with the {rng.choice(markers["cultural"])}.'
+    if kind == 'l1' and markers['l1']:
+        return f'{body[:-1]}, it is {rng.choice(markers["l1"])} clear.'
+    if kind == 'transition':
+        return f'{rng.choice(markers["transition"])}, {lowered}'
+    phrase = rng.choice(markers['phrase'])
+    return f'{phrase[0].upper()}{phrase[1:]}, {lowered}'
+
+
+def _ai_edit(rng: random.Random, sentence: str, markers: Dict[str, List[str]]) -> List[str]:
+    """Edited replacement for one sentence (possibly empty or two sentences)"""
+    action = rng.random()
+    if action < 0.5:
+        for old, new in AI_VOCABULARY:
+            sentence = sentence.replace(old, new)
+        return [sentence]
+    if action < 0.75:
+        return [f'{rng.choice(markers["transition"])}, {sentence[0].lower()}{sentence[1:]}']
+    if action < 0.85:
+        return []
+    return [sentence, rng.choice(INSERTED_SENTENCES)]
+
+
+def generate_pair(words: int, marker_density: float = DEFAULT_MARKER_DENSITY,
+                  edit_rate: float = DEFAULT_EDIT_RATE, seed: int = 0,
+                  markers: Dict[str, List[str]] = None) -> Tuple[str, str]:
+    """
+    Build an (original, edited) pair of about `words` words
+
+    Paragraphs of 4-7 sentences are separated by blank lines in both texts.
+    """
+    markers = markers or load_markers()
+    rng = random.Random(f'{seed}:{words}:{marker_density}:{edit_rate}')
+
+    original, edited = [], []
+    paragraph_original, paragraph_edited = [], []
+    paragraph_size = rng.randint(4, 7)
+    count = 0
+    while count < words:
+        if rng.random() < marker_density:
+            sentence = _marked_sentence(rng, markers)
+        else:
+            sentence = _plain_sentence(rng)
+        paragraph_original.append(sentence)
+        paragraph_edited.extend(_ai_edit(rng, sentence, markers) if rng.random() < edit_rate else [sentence])
+        count += len(sentence.split())
+
+        if len(paragraph_original) == paragraph_size:
+            original.append(' '.join(paragraph_original))
+            edited.append(' '.join(paragraph_edited) or INSERTED_SENTENCES[0])
+            paragraph_original, paragraph_edited = [], []
+            paragraph_size = rng.randint(4, 7)
+
+    if paragraph_original:
+        original.append(' '.join(paragraph_original))
+        edited.append(' '.join(paragraph_edited) or INSERTED_SENTENCES[0])
+
+    return '\n\n'.join(original), '\n\n'.join(edited)
@@ -0,0 +1,151 @@
+"""
+Tokenizer Benchmark
+Reports throughput and sentence-boundary accuracy for each tokenizer backend
+
+Accuracy is measured against the labeled corpus in data/sentence_corpus.txt
+(gold boundaries) and, when NLTK punkt data is installed, as agreement with
+the punkt backend.
+
+Usage (from the backend directory):
+    python benchmarks/tokenizer_benchmark.py [--backends punkt regex] [--repeat 200] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import tokenization  # noqa: E402
+
+
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, 'benchmarks', 'data', 'sentence_corpus.txt')
+
+
+def load_corpus(path: str) -> Tuple[str, Set[int]]:
+    """
+    Build the corpus text and its gold sentence-end offsets
+
+    Sentences in a paragraph are joined with a space, paragraphs with a blank line.
+    """
+    paragraphs = [[]]
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#'):
+                continue
+            if not line:
+                if paragraphs[-1]:
+                    paragraphs.append([])
+                continue
+            paragraphs[-1].append(line)
+
+    text = ''
+    ends = set()
+    for paragraph in (p for p in paragraphs if p):
+        if text:
+            text += '\n\n'
+        for i, sentence in enumerate(paragraph):
+            if i:
+                text += ' '
+            text += sentence
+            ends.add(len(text))
+
+    return text, ends
+
+
+def boundary_scores(predicted: Set[int], reference: Set[int]) -> Dict[str, float]:
+    """Precision, recall and F1 of predicted sentence ends against a reference"""
+    hits = len(predicted & reference)
+    precision = hits / len(predicted) if predicted else 0.0
+    recall = hits / len(reference) if reference else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4)}
+
+
+def time_call(func, text: str, rounds: int) -> Tuple[float, int]:
+    """Best-of-rounds wall time and output length of func(text)"""
+    best = None
+    count = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        count = len(func(text))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def benchmark(backends: List[str], corpus_path: str, repeat: int, rounds: int) -> Dict:
+    """Run the speed and accuracy benchmark for each backend"""
+    text, gold = load_corpus(corpus_path)
+    big_text = '\n\n'.join([text] * repeat)
+
+    predictions = {}
+    report = {'corpus': os.path.basename(corpus_path), 'gold_sentences': len(gold),
+              'benchmark_chars': len(big_text), 'backends': {}}
+
+    for name in backends:
+        tokenizer = tokenization.get_tokenizer(name)
+        try:
+            tokenizer.warm_up()
+        except LookupError:
+            report['backends'][name] = {'skipped': 'NLTK data missing; run python nltk_resources.py'}
+            continue
+
+        predictions[name] = {end for _, end in tokenizer.sentence_spans(text)}
+        word_time, word_count = time_call(tokenizer.words, big_text, rounds)
+        sent_time, sent_count = time_call(tokenizer.sentences, big_text, rounds)
+
+        report['backends'][name] = {
+            'tokens_per_second': round(word_count / word_time) if word_time else None,
+            'sentences_per_second': round(sent_count / sent_time) if sent_time else None,
+            'word_tokenize_ms': round(word_time * 1000, 2),
+            'sent_tokenize_ms': round(sent_time * 1000, 2),
+            'gold_boundaries': boundary_scores(predictions[name], gold),
+        }
+
+    if 'punkt' in predictions:
+        for name, predicted in predictions.items():
+            report['backends'][name]['punkt_agreement'] = boundary_scores(predicted, predictions['punkt'])
+
+    return report
+
+
+def print_report(report: Dict) -> None:
+    """Print a human-readable summary table"""
+    print(f"corpus: {report['corpus']} ({report['gold_sentences']} gold sentences, "
+          f"{report['benchmark_chars']} chars timed)")
+    print(f"{'backend':<10}{'tokens/s':>12}{'sents/s':>12}{'gold F1':>10}{'punkt F1':>10}")
+    for name, row in report['backends'].items():
+        if 'skipped' in row:
+            print(f"{name:<10}  skipped ({row['skipped']})")
+            continue
+        agreement = row.get('punkt_agreement', {}).get('f1')
+        print(f"{name:<10}{row['tokens_per_second']:>12,}{row['sentences_per_second']:>12,}"
+              f"{row['gold_boundaries']['f1']:>10.3f}"
+              f"{agreement if agreement is not None else 'n/a':>10}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=tokenization.available_backends())
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='labeled corpus file')
+    parser.add_argument('--repeat', type=int, default=200, help='corpus copies in the timed text')
+    parser.add_argument('--rounds', type=int, default=3, help='timing rounds (best is kept)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = benchmark(args.backends, args.corpus, args.repeat, args.rounds)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
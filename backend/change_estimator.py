@@ -0,0 +1,246 @@
+"""
+Change Estimator
+Bounded-cost estimate of how much of a text changed between two versions
+
+Exact change percentages run difflib.SequenceMatcher over characters, whose
+cost grows super-linearly with the text and whose autojunk heuristic
+discards common characters on long inputs. The estimate here aligns word
+tokens instead (each token keeps its trailing whitespace, so tokens tile the
+text) in two steps:
+
+    anchor  runs of ANCHOR_TOKENS tokens that occur exactly once in each
+            text are matched, keeping the longest chain that is in order in
+            both (as in patience diff), and grown over equal neighbours;
+            each gap between anchors is anchored again on its own, so bulk
+            insertions, deletions and moves do not shift the alignment
+    align   what remains between anchors is aligned with a weighted LCS,
+            exactly for small gaps and restricted to a band of `band`
+            tokens around the gap's diagonal for large ones
+
+    cost    O(tokens log tokens) per anchoring level (at most 8 levels),
+            plus O(gap tokens * band)
+
+The estimate is the weight of a real common token subsequence, so it never
+exceeds the exact token-level LCS weight. That LCS can in turn never exceed
+the characters of the tokens both texts share, counted with multiplicity,
+which token_overlap_characters() returns. The exact token-level value
+therefore lies in [estimate, overlap], and approximate_matching_bounds()
+returns both ends. Against the character-level value the estimate differs
+only by word granularity: a word with a single edited character counts as
+fully changed.
+"""
+
+import bisect
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+# Half-width of the alignment band in large unanchored gaps, in tokens
+DEFAULT_BAND = 48
+
+# Combined length (original + edited) above which callers should prefer the estimate
+DEFAULT_APPROX_THRESHOLD = 20000
+
+# Tokens per anchor; single words repeat too often in prose to be unique
+ANCHOR_TOKENS = 4
+
+# Gaps whose LCS table has at most this many cells are aligned without a band
+_EXACT_CELLS = 1 << 16
+
+# Anchoring levels; gaps still unanchored below this fall back to the banded alignment
+_MAX_DEPTH = 8
+
+_TOKEN = re.compile(r'\s*\S+\s*|\s+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into tokens that concatenate back to the text"""
+    return _TOKEN.findall(text)
+
+
+def approximate_matching_characters(original: str, edited: str, band: int = DEFAULT_BAND) -> int:
+    """
+    Estimate the characters the two texts share, comparable to the sum of
+    SequenceMatcher matching block sizes (a lower bound on the token-level LCS)
+    """
+    a, b = tokenize(original), tokenize(edited)
+
+    # Intern tokens so alignment compares small ints
+    ids: Dict[str, int] = {}
+    a_ids = [ids.setdefault(t, len(ids)) for t in a]
+    b_ids = [ids.setdefault(t, len(ids)) for t in b]
+    weights = [0] * len(ids)
+    for token, token_id in ids.items():
+        weights[token_id] = len(token)
+
+    matched = 0
+    segments = [(0, len(a_ids), 0, len(b_ids), 0)]
+    while segments:
+        a_lo, a_hi, b_lo, b_hi, depth = segments.pop()
+
+        # Common leading and trailing tokens are matched directly
+        while a_lo < a_hi and b_lo < b_hi and a_ids[a_lo] == b_ids[b_lo]:
+            matched += weights[a_ids[a_lo]]
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a_ids[a_hi - 1] == b_ids[b_hi - 1]:
+            matched += weights[a_ids[a_hi - 1]]
+            a_hi -= 1
+            b_hi -= 1
+        n, m = a_hi - a_lo, b_hi - b_lo
+        if not n or not m:
+            continue
+
+        runs = []
+        if n * m > _EXACT_CELLS and depth < _MAX_DEPTH:
+            runs = _anchor_runs(a_ids, b_ids, a_lo, a_hi, b_lo, b_hi)
+        if not runs:
+            seg_a = a_ids[a_lo:a_hi]
+            seg_b = b_ids[b_lo:b_hi]
+            matched += _banded_lcs_weight(seg_a, seg_b, [weights[t] for t in seg_b],
+                                          band if n * m > _EXACT_CELLS else max(n, m))
+            continue
+
+        # Matched runs, and the gaps before, between and after them
+        i, j = a_lo, b_lo
+        for run_i, run_j, length in runs:
+            segments.append((i, run_i, j, run_j, depth + 1))
+            matched += sum(weights[t] for t in a_ids[run_i:run_i + length])
+            i, j = run_i + length, run_j + length
+        segments.append((i, a_hi, j, b_hi, depth + 1))
+    return matched
+
+
+def approximate_matching_bounds(original: str, edited: str, band: int = DEFAULT_BAND) -> Tuple[int, int]:
+    """(estimate, upper bound) on the token-level LCS weight of the two texts"""
+    return (approximate_matching_characters(original, edited, band),
+            token_overlap_characters(original, edited))
+
+
+def token_overlap_characters(original: str, edited: str) -> int:
+    """Characters of the tokens both texts contain, counted with multiplicity"""
+    common = Counter(tokenize(original)) & Counter(tokenize(edited))
+    return sum(len(token) * n for token, n in common.items())
+
+
+def _anchor_runs(a: List[int], b: List[int], a_lo: int, a_hi: int,
+                 b_lo: int, b_hi: int) -> List[Tuple[int, int, int]]:
+    """
+    Matched (i, j, length) runs of a[a_lo:a_hi] and b[b_lo:b_hi], in order in both
+
+    Runs start at ANCHOR_TOKENS-token shingles unique to each side, keep the
+    longest chain increasing in both texts, and grow over equal tokens up to
+    the neighbouring runs.
+    """
+    k = ANCHOR_TOKENS
+    if a_hi - a_lo < k or b_hi - b_lo < k:
+        return []
+
+    # Shingle -> position, or -1 when it repeats
+    in_a: Dict[tuple, int] = {}
+    for i in range(a_lo, a_hi - k + 1):
+        key = tuple(a[i:i + k])
+        in_a[key] = -1 if key in in_a else i
+    in_b: Dict[tuple, int] = {}
+    for j in range(b_lo, b_hi - k + 1):
+        key = tuple(b[j:j + k])
+        if key in in_a:
+            in_b[key] = -1 if key in in_b else j
+    pairs = sorted((in_a[key], j) for key, j in in_b.items() if j >= 0 and in_a[key] >= 0)
+    if not pairs:
+        return []
+
+    # Longest chain of pairs increasing in j (pairs are sorted by i)
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for p, (_, j) in enumerate(pairs):
+        t = bisect.bisect_left(tails, j)
+        if t:
+            previous[p] = tail_index[t - 1]
+        if t == len(tails):
+            tails.append(j)
+            tail_index.append(p)
+        else:
+            tails[t] = j
+            tail_index[t] = p
+    chain = []
+    p = tail_index[-1]
+    while p >= 0:
+        chain.append(pairs[p])
+        p = previous[p]
+    chain.reverse()
+
+    # Merge overlapping anchors on one diagonal into runs; drop anchors crossing a run
+    runs: List[List[int]] = []
+    for i, j in chain:
+        if runs:
+            run_i, run_j, length = runs[-1]
+            if i < run_i + length or j < run_j + length:
+                if i - run_i == j - run_j:
+                    runs[-1][2] = max(length, i + k - run_i)
+                continue
+        runs.append([i, j, k])
+
+    # Grow runs over equal neighbours, forwards up to the next run and backwards to the previous
+    for r, run in enumerate(runs):
+        i, j, length = run
+        next_i, next_j = (runs[r + 1][0], runs[r + 1][1]) if r + 1 < len(runs) else (a_hi, b_hi)
+        while i + length < next_i and j + length < next_j and a[i + length] == b[j + length]:
+            length += 1
+        prev_i, prev_j = (runs[r - 1][0] + runs[r - 1][2], runs[r - 1][1] + runs[r - 1][2]) if r else (a_lo, b_lo)
+        while i > prev_i and j > prev_j and a[i - 1] == b[j - 1]:
+            i -= 1
+            j -= 1
+            length += 1
+        run[:] = (i, j, length)
+    return [tuple(run) for run in runs]
+
+
+def _banded_lcs_weight(a_ids: List[int], b_ids: List[int], b_len: List[int], band: int) -> int:
+    """
+    Weighted LCS of two interned token lists, b_len holding the weights of
+    b's tokens, restricted to cells within `band` of the proportional
+    diagonal j = i * len(b) / len(a)
+
+    Cells just past the previous row's band reuse that row's last value,
+    which is always achievable, so the result is a lower bound on the
+    unrestricted LCS weight.
+    """
+    n, m = len(a_ids), len(b_ids)
+
+    def row_range(i: int) -> Tuple[int, int]:
+        center = i * m // n
+        return max(0, center - band), min(m, center + band)
+
+    # prev[j - prev_lo] holds L[i-1][j] for j in [prev_lo, prev_hi]
+    prev_lo, prev_hi = row_range(0)
+    prev = [0] * (prev_hi - prev_lo + 1)
+
+    for i in range(1, n + 1):
+        lo, hi = row_range(i)
+        token = a_ids[i - 1]
+        row = [0] * (hi - lo + 1)
+        prev_last = prev[-1]
+
+        # L[i][lo - 1] is at least L[i-1][lo - 1] when that cell was in the band
+        k = lo - 1 - prev_lo
+        left = prev[k] if 0 <= k <= prev_hi - prev_lo else 0
+
+        for j in range(lo, hi + 1):
+            k = j - prev_lo
+            up = prev[k] if k <= prev_hi - prev_lo else prev_last
+            best = up if up > left else left
+            if j > 0 and b_ids[j - 1] == token:
+                k -= 1
+                diag = prev[k] if 0 <= k <= prev_hi - prev_lo else (prev_last if k >= 0 else 0)
+                diag += b_len[j - 1]
+                if diag > best:
+                    best = diag
+            row[j - lo] = best
+            left = best
+
+        prev, prev_lo, prev_hi = row, lo, hi
+
+    return prev[m - prev_lo] if m <= prev_hi else prev[-1]
@@ -0,0 +1,159 @@
+"""
+Chunked Analysis
+Splits very long documents on paragraph/sentence boundaries so engines can
+process them chunk by chunk with memory bounded by the chunk size
+"""
+
+import difflib
+import re
+from typing import Iterator, List, Tuple
+
+
+# Default upper bound on characters per chunk
+DEFAULT_CHUNK_CHARS = 20000
+
+# Documents longer than this are analyzed in chunked mode unless the caller opts out
+DEFAULT_CHUNKED_THRESHOLD = 100000
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def iter_blocks(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) spans that tile the text exactly
+
+    Each block is one paragraph including the blank line after it. Paragraphs
+    longer than max_chars are split after sentence-final punctuation, and as a
+    last resort at whitespace, so blocks never cut through a word.
+    """
+    start = 0
+    for m in _PARAGRAPH_BREAK.finditer(text):
+        yield from _split_long_block(text, start, m.end(), max_chars)
+        start = m.end()
+    if start < len(text):
+        yield from _split_long_block(text, start, len(text), max_chars)
+
+
+def _split_long_block(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Split one paragraph span into pieces of at most max_chars where possible"""
+    while end - start > max_chars:
+        cut = None
+        for breaks in (_SENTENCE_BREAK, _WHITESPACE):
+            for m in breaks.finditer(text, start, start + max_chars):
+                if m.end() > start:
+                    cut = m.end()
+            if cut is not None:
+                break
+        if cut is None:
+            # A single run of non-whitespace longer than max_chars
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+    if start < end:
+        yield start, end
+
+
+def iter_chunks(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (char_offset, chunk_text) pieces that concatenate back to the text
+
+    Consecutive blocks are packed together up to max_chars.
+    """
+    chunk_start = chunk_end = 0
+    for start, end in iter_blocks(text, max_chars):
+        if end - chunk_start > max_chars and chunk_end > chunk_start:
+            yield chunk_start, text[chunk_start:chunk_end]
+            chunk_start = start
+        chunk_end = end
+    if chunk_end > chunk_start:
+        yield chunk_start, text[chunk_start:chunk_end]
+
+
+def iter_aligned_chunks(original: str, edited: str,
+                        max_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[Tuple[int, str, int, str]]:
+    """
+    Yield (orig_offset, orig_chunk, edited_offset, edited_chunk) pairs
+
+    Paragraph blocks of both texts are aligned by content hash, and aligned
+    runs are packed into pairs of at most max_chars per side, so that every
+    pair compares corresponding parts of the two documents. The pieces of
+    each side concatenate back to the full text.
+    """
+    orig_blocks = list(iter_blocks(original, max_chars))
+    edited_blocks = list(iter_blocks(edited, max_chars))
+    orig_keys = [hash(' '.join(original[s:e].split())) for s, e in orig_blocks]
+    edited_keys = [hash(' '.join(edited[s:e].split())) for s, e in edited_blocks]
+
+    matcher = difflib.SequenceMatcher(None, orig_keys, edited_keys, autojunk=False)
+
+    # Current pair, as block index ranges [oi, oj) and [ei, ej)
+    oi = oj = ei = ej = 0
+
+    def span(blocks: List[Tuple[int, int]], i: int, j: int) -> Tuple[int, int]:
+        if i == j:
+            pos = blocks[i][0] if i < len(blocks) else (blocks[-1][1] if blocks else 0)
+            return pos, pos
+        return blocks[i][0], blocks[j - 1][1]
+
+    def size(blocks: List[Tuple[int, int]], i: int, j: int) -> int:
+        s, e = span(blocks, i, j)
+        return e - s
+
+    def emit(i1: int, i2: int, j1: int, j2: int) -> Tuple[int, str, int, str]:
+        os_, oe = span(orig_blocks, i1, i2)
+        es, ee = span(edited_blocks, j1, j2)
+        return os_, original[os_:oe], es, edited[es:ee]
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        # Equal runs may be cut anywhere; changed runs are kept whole when they fit
+        if tag == 'equal':
+            steps = [(i1 + k, i1 + k + 1, j1 + k, j1 + k + 1) for k in range(i2 - i1)]
+        else:
+            steps = list(_split_changed_run(orig_blocks, edited_blocks, i1, i2, j1, j2, max_chars))
+
+        for a1, a2, b1, b2 in steps:
+            grown_o = size(orig_blocks, oi, a2)
+            grown_e = size(edited_blocks, ei, b2)
+            if (grown_o > max_chars or grown_e > max_chars) and (oj > oi or ej > ei):
+                yield emit(oi, oj, ei, ej)
+                oi, ei = a1, b1
+            oj, ej = a2, b2
+
+    if oj > oi or ej > ei:
+        yield emit(oi, oj, ei, ej)
+
+
+def _split_changed_run(orig_blocks, edited_blocks, i1, i2, j1, j2, max_chars):
+    """Split a changed run into proportional sub-runs of roughly max_chars per side"""
+    orig_size = (orig_blocks[i2 - 1][1] - orig_blocks[i1][0]) if i2 > i1 else 0
+    edited_size = (edited_blocks[j2 - 1][1] - edited_blocks[j1][0]) if j2 > j1 else 0
+    pieces = max(1, -(-max(orig_size, edited_size) // max_chars))
+
+    if pieces == 1:
+        yield i1, i2, j1, j2
+        return
+
+    def cut_points(blocks, lo, hi, total):
+        # Block index where each piece ends, by cumulative character fraction
+        cuts = []
+        if hi == lo:
+            return [lo] * pieces
+        base = blocks[lo][0]
+        k = lo
+        for p in range(1, pieces + 1):
+            limit = total * p / pieces
+            while k < hi and blocks[k][1] - base <= limit:
+                k += 1
+            cuts.append(k if p < pieces else hi)
+        return cuts
+
+    orig_cuts = cut_points(orig_blocks, i1, i2, orig_size)
+    edited_cuts = cut_points(edited_blocks, j1, j2, edited_size)
+
+    prev_o, prev_e = i1, j1
+    for co, ce in zip(orig_cuts, edited_cuts):
+        if co > prev_o or ce > prev_e:
+            yield prev_o, co, prev_e, ce
+        prev_o, prev_e = co, ce
@@ -5,55 +5,168 @@ Compares original draft with AI-polished version and tracks changes
 
 import difflib
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Optional
 from html import escape
+from tokenization import Tokenizer, get_tokenizer
+from chunked_analysis import DEFAULT_CHUNK_CHARS, iter_aligned_chunks
+from change_estimator import DEFAULT_APPROX_THRESHOLD, approximate_matching_characters
+from stage_timing import stage
+
+
+# change_percentage modes accepted by compare_texts / compare_texts_chunked
+CHANGE_MODES = ('auto', 'exact', 'approximate')
+
+# detailed_diff formats: one dict per word, or opcode runs with character offsets
+DIFF_FORMATS = ('verbose', 'compact')
+
+_WORD = re.compile(r'\S+')
 
 
 class DualTextComparator:
     """Tracks and visualizes changes between student draft and AI-edited versions"""
     
-    def __init__(self):
-        """Initialize comparator"""
+    def __init__(self, tokenizer: Tokenizer = None, approx_threshold: int = DEFAULT_APPROX_THRESHOLD):
+        """
+        Initialize comparator (sentence alignment uses the regex backend by default)
+        
+        Args:
+            approx_threshold: combined character length above which 'auto'
+                              mode estimates change_percentage instead of
+                              computing it exactly
+        """
         self.differ = difflib.Differ()
+        self.tokenizer = tokenizer or get_tokenizer('regex')
+        self.approx_threshold = approx_threshold
     
-    def compare_texts(self, original: str, edited: str) -> Dict:
+    def compare_texts(self, original: str, edited: str, change_mode: str = 'auto',
+                      diff_format: str = 'verbose', sections: Optional[Iterable[str]] = None) -> Dict:
         """
         Compare two texts and identify additions, removals, and modifications
         
         Args:
             original: Student's raw draft
             edited: AI-polished version
+            change_mode: 'exact' (character-level SequenceMatcher),
+                         'approximate' (see change_estimator) or 'auto'
+            diff_format: 'verbose' (one dict per word) or 'compact'
+                         (opcode runs, see _word_opcodes)
+            sections: result keys the caller needs; 'visualization' and
+                      'detailed_diff' are only computed when listed.
+                      None computes everything.
             
         Returns:
             Comprehensive diff analysis
         """
+        mode = self._resolve_change_mode(change_mode, len(original) + len(edited))
+        self._check_diff_format(diff_format)
+        return self._compare_pairs([(0, original, 0, edited)], mode, diff_format, sections)
+    
+    def compare_texts_chunked(self, original: str, edited: str,
+                              max_chars: int = DEFAULT_CHUNK_CHARS,
+                              change_mode: str = 'auto',
+                              diff_format: str = 'verbose',
+                              sections: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Compare two long texts chunk by chunk
+        
+        Paragraphs are aligned by content first (see
+        chunked_analysis.iter_aligned_chunks), and every diff, including the
+        match count behind change_percentage, runs on one aligned pair at a
+        time. Word positions and character offsets stay document-relative.
+        """
+        mode = self._resolve_change_mode(change_mode, len(original) + len(edited))
+        self._check_diff_format(diff_format)
+        return self._compare_pairs(iter_aligned_chunks(original, edited, max_chars),
+                                   mode, diff_format, sections)
+    
+    def _resolve_change_mode(self, change_mode: str, total_chars: int) -> str:
+        """Map 'auto' to 'exact' or 'approximate' by the combined text length"""
+        if change_mode not in CHANGE_MODES:
+            raise ValueError(f"Unknown change_mode {change_mode!r}; expected one of {', '.join(CHANGE_MODES)}")
+        if change_mode == 'auto':
+            return 'approximate' if total_chars > self.approx_threshold else 'exact'
+        return change_mode
+    
+    def _check_diff_format(self, diff_format: str) -> None:
+        """Reject unknown detailed_diff formats"""
+        if diff_format not in DIFF_FORMATS:
+            raise ValueError(f"Unknown diff_format {diff_format!r}; expected one of {', '.join(DIFF_FORMATS)}")
+    
+    def _compare_pairs(self, pairs: Iterable[Tuple[int, str, int, str]], change_mode: str = 'exact',
+                       diff_format: str = 'verbose', sections: Optional[Iterable[str]] = None) -> Dict:
+        """Diff aligned (orig_offset, orig_text, edited_offset, edited_text) pairs and merge the results"""
         results = {
             'summary': {},
             'changes': [],
-            'statistics': {},
-            'visualization': {},
-            'detailed_diff': []
+            'statistics': {}
         }
         
-        # Tokenize by sentences for detailed analysis
-        orig_sentences = self._smart_tokenize(original)
-        edited_sentences = self._smart_tokenize(edited)
-        
-        # Get line-by-line diff
-        diff = list(self.differ.compare(orig_sentences, edited_sentences))
+        # The two most expensive sections are skipped unless requested
+        sections = None if sections is None else set(sections)
+        want_visualization = sections is None or 'visualization' in sections
+        want_detailed_diff = sections is None or 'detailed_diff' in sections
+        if want_visualization:
+            results['visualization'] = []
+        if want_detailed_diff:
+            results['detailed_diff'] = []
+            results['diff_format'] = diff_format
         
-        # Categorize changes
         additions = []
         deletions = []
         modifications = []
+        totals = {
+            'original_sentences': 0, 'edited_sentences': 0,
+            'original_words': 0, 'edited_words': 0,
+            'original_word_chars': 0, 'edited_word_chars': 0,
+            'original_chars': 0, 'edited_chars': 0,
+            'matching_chars': 0
+        }
         
-        for line in diff:
-            if line.startswith('+ '):
-                additions.append(line[2:].strip())
-            elif line.startswith('- '):
-                deletions.append(line[2:].strip())
-            elif line.startswith('? '):
-                modifications.append(line[2:].strip())
+        for orig_char_offset, original, edited_char_offset, edited in pairs:
+            # Tokenize by sentences for detailed analysis
+            orig_sentences = self._smart_tokenize(original)
+            edited_sentences = self._smart_tokenize(edited)
+            
+            # Get line-by-line diff and categorize changes
+            with stage('compare.sentence_diff'):
+                for line in self.differ.compare(orig_sentences, edited_sentences):
+                    if line.startswith('+ '):
+                        additions.append(line[2:].strip())
+                    elif line.startswith('- '):
+                        deletions.append(line[2:].strip())
+                    elif line.startswith('? '):
+                        modifications.append(line[2:].strip())
+            
+            orig_words = original.split()
+            edited_words = edited.split()
+            
+            # Create HTML visualization data
+            if want_visualization:
+                with stage('compare.visualization'):
+                    results['visualization'].extend(self._create_diff_visualization(original, edited))
+            
+            # Detailed diff at word level (positions relative to the whole document)
+            if want_detailed_diff:
+                with stage('compare.detailed_diff'):
+                    if diff_format == 'compact':
+                        results['detailed_diff'].extend(self._word_opcodes(
+                            original, edited, orig_char_offset, edited_char_offset
+                        ))
+                    else:
+                        results['detailed_diff'].extend(self._word_level_diff(
+                            original, edited, totals['original_words'], totals['edited_words']
+                        ))
+            
+            totals['original_sentences'] += len(orig_sentences)
+            totals['edited_sentences'] += len(edited_sentences)
+            totals['original_words'] += len(orig_words)
+            totals['edited_words'] += len(edited_words)
+            totals['original_word_chars'] += sum(len(w) for w in orig_words)
+            totals['edited_word_chars'] += sum(len(w) for w in edited_words)
+            totals['original_chars'] += len(original)
+            totals['edited_chars'] += len(edited)
+            with stage('compare.change_percentage'):
+                totals['matching_chars'] += self._matching_characters(original, edited, change_mode)
         
         results['changes'] = {
             'additions': additions,
@@ -62,59 +175,51 @@ class DualTextComparator:
         }
         
         # Calculate statistics
-        results['statistics'] = self._calculate_statistics(
-            original, edited, additions, deletions
-        )
+        results['statistics'] = self._calculate_statistics(totals, additions, deletions)
         
         # Generate summary
         results['summary'] = {
             'total_additions': len(additions),
             'total_deletions': len(deletions),
-            'total_sentences_original': len(orig_sentences),
-            'total_sentences_edited': len(edited_sentences),
-            'change_percentage': self._calculate_change_percentage(original, edited)
+            'total_sentences_original': totals['original_sentences'],
+            'total_sentences_edited': totals['edited_sentences'],
+            'change_percentage': self._change_percentage(
+                totals['matching_chars'], totals['original_chars'], totals['edited_chars']
+            ),
+            'change_percentage_mode': change_mode
         }
         
-        # Create HTML visualization data
-        results['visualization'] = self._create_diff_visualization(original, edited)
-        
-        # Detailed diff at word level
-        results['detailed_diff'] = self._word_level_diff(original, edited)
-        
         return results
     
     def _smart_tokenize(self, text: str) -> List[str]:
         """
         Tokenize text by sentences, preserving structure
         """
-        # Split by periods, question marks, exclamation marks
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+        with stage('tokenize'):
+            sentences = self.tokenizer.sentences(text)
         return [s.strip() for s in sentences if s.strip()]
     
-    def _calculate_statistics(self, original: str, edited: str, 
+    def _calculate_statistics(self, totals: Dict,
                              additions: List[str], deletions: List[str]) -> Dict:
         """Calculate detailed statistics about the changes"""
-        orig_words = original.split()
-        edited_words = edited.split()
-        
         stats = {
-            'original_word_count': len(orig_words),
-            'edited_word_count': len(edited_words),
-            'word_count_change': len(edited_words) - len(orig_words),
-            'original_char_count': len(original),
-            'edited_char_count': len(edited),
-            'char_count_change': len(edited) - len(original),
+            'original_word_count': totals['original_words'],
+            'edited_word_count': totals['edited_words'],
+            'word_count_change': totals['edited_words'] - totals['original_words'],
+            'original_char_count': totals['original_chars'],
+            'edited_char_count': totals['edited_chars'],
+            'char_count_change': totals['edited_chars'] - totals['original_chars'],
             'added_words': sum(len(a.split()) for a in additions),
             'removed_words': sum(len(d.split()) for d in deletions),
-            'readability_impact': self._estimate_readability_impact(original, edited)
+            'readability_impact': self._estimate_readability_impact(totals)
         }
         
         return stats
     
-    def _estimate_readability_impact(self, original: str, edited: str) -> Dict:
+    def _estimate_readability_impact(self, totals: Dict) -> Dict:
         """Estimate how readability metrics changed"""
-        orig_avg_word_len = sum(len(w) for w in original.split()) / max(len(original.split()), 1)
-        edited_avg_word_len = sum(len(w) for w in edited.split()) / max(len(edited.split()), 1)
+        orig_avg_word_len = totals['original_word_chars'] / max(totals['original_words'], 1)
+        edited_avg_word_len = totals['edited_word_chars'] / max(totals['edited_words'], 1)
         
         return {
             'original_avg_word_length': round(orig_avg_word_len, 2),
@@ -123,15 +228,26 @@ class DualTextComparator:
             'complexity_magnitude': round(abs(edited_avg_word_len - orig_avg_word_len), 2)
         }
     
-    def _calculate_change_percentage(self, original: str, edited: str) -> float:
+    def _calculate_change_percentage(self, original: str, edited: str, change_mode: str = 'exact') -> float:
         """Calculate percentage of text that changed"""
-        orig_len = len(original)
+        return self._change_percentage(
+            self._matching_characters(original, edited, change_mode), len(original), len(edited)
+        )
+    
+    def _matching_characters(self, original: str, edited: str, change_mode: str = 'exact') -> int:
+        """Characters shared by the two texts according to sequence matching"""
+        if change_mode == 'approximate':
+            return approximate_matching_characters(original, edited)
+        matcher = difflib.SequenceMatcher(None, original, edited)
+        return sum(block.size for block in matcher.get_matching_blocks())
+    
+    def _change_percentage(self, matching_chars: int, orig_len: int, edited_len: int) -> float:
+        """Percentage changed, 1 - SequenceMatcher.ratio(), from merged match counts"""
         if orig_len == 0:
             return 0
         
-        # Use sequence matching
-        matcher = difflib.SequenceMatcher(None, original, edited)
-        return round((1 - matcher.ratio()) * 100, 2)
+        ratio = 2.0 * matching_chars / (orig_len + edited_len)
+        return round((1 - ratio) * 100, 2)
     
     def _create_diff_visualization(self, original: str, edited: str) -> Dict:
         """
@@ -184,9 +300,13 @@ class DualTextComparator:
         
         return visualization_data
     
-    def _word_level_diff(self, original: str, edited: str) -> List[Dict]:
+    def _word_level_diff(self, original: str, edited: str,
+                         orig_offset: int = 0, edited_offset: int = 0) -> List[Dict]:
         """
         Create word-level diff for detailed highlighting
+        
+        Positions are shifted by orig_offset/edited_offset (word counts of
+        the preceding chunks) in chunked mode.
         """
         orig_words = original.split()
         edited_words = edited.split()
@@ -202,7 +322,7 @@ class DualTextComparator:
                     word_diff.append({
                         'type': 'unchanged',
                         'word': word,
-                        'position': i1 + k
+                        'position': orig_offset + i1 + k
                     })
             elif tag == 'replace':
                 for k in range(max(i2-i1, j2-j1)):
@@ -210,31 +330,65 @@ class DualTextComparator:
                         word_diff.append({
                             'type': 'deleted',
                             'word': orig_words[i1+k],
-                            'position': i1+k
+                            'position': orig_offset + i1+k
                         })
                     if j1+k < j2:
                         word_diff.append({
                             'type': 'added',
                             'word': edited_words[j1+k],
-                            'position': j1+k
+                            'position': edited_offset + j1+k
                         })
             elif tag == 'delete':
                 for word in orig_words[i1:i2]:
                     word_diff.append({
                         'type': 'deleted',
                         'word': word,
-                        'position': i1
+                        'position': orig_offset + i1
                     })
             elif tag == 'insert':
                 for word in edited_words[j1:j2]:
                     word_diff.append({
                         'type': 'added',
                         'word': word,
-                        'position': j1
+                        'position': edited_offset + j1
                     })
         
         return word_diff
     
+    def _word_opcodes(self, original: str, edited: str,
+                      orig_offset: int = 0, edited_offset: int = 0) -> List[List]:
+        """
+        Word-level diff as opcode runs with character offsets
+        
+        Each run is [tag, orig_start, orig_end, edit_start, edit_end] with a
+        difflib tag ('equal', 'replace', 'delete', 'insert') and half-open
+        character ranges into the original and edited texts, shifted by
+        orig_offset/edited_offset (character offsets of the chunk). Runs
+        start at the first word of the range; an empty range sits at the
+        start of the next word, so whitespace between words belongs to no
+        run and highlights can be rebuilt by slicing the two texts.
+        """
+        orig_spans = [m.span() for m in _WORD.finditer(original)]
+        edited_spans = [m.span() for m in _WORD.finditer(edited)]
+        orig_words = [original[s:e] for s, e in orig_spans]
+        edited_words = [edited[s:e] for s, e in edited_spans]
+        
+        matcher = difflib.SequenceMatcher(None, orig_words, edited_words)
+        
+        def char_range(spans: List[Tuple[int, int]], i1: int, i2: int, text_len: int) -> Tuple[int, int]:
+            if i2 > i1:
+                return spans[i1][0], spans[i2 - 1][1]
+            pos = spans[i1][0] if i1 < len(spans) else text_len
+            return pos, pos
+        
+        opcodes = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            os_, oe = char_range(orig_spans, i1, i2, len(original))
+            es, ee = char_range(edited_spans, j1, j2, len(edited))
+            opcodes.append([tag, orig_offset + os_, orig_offset + oe, edited_offset + es, edited_offset + ee])
+        
+        return opcodes
+    
     def generate_html_diff(self, original: str, edited: str) -> str:
         """
         Generate HTML representation of diff for PDF/web display
@@ -0,0 +1,93 @@
+"""
+Field Selection
+Parses the "fields" request parameter and prunes responses to the selected paths
+
+Fields are dotted paths into the response, e.g. "summary.overall_score" or
+"text_comparison.summary". Selecting a path selects everything below it;
+endpoints use wants() to skip sub-analyses nobody asked for.
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+def parse_fields(value: Any) -> Optional[List[str]]:
+    """
+    Normalize a "fields" value: a list of paths or a comma-separated string
+
+    Returns None (everything) when the value is missing or empty.
+    Raises ValueError for anything else.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(f, str) for f in value):
+        raise ValueError('fields must be a list of dotted paths or a comma-separated string')
+    fields = [f.strip() for f in value if f.strip()]
+    return fields or None
+
+
+def wants(fields: Optional[List[str]], path: str) -> bool:
+    """True when any part of `path` is selected (the path, an ancestor or a descendant)"""
+    if fields is None:
+        return True
+    for field in fields:
+        if field == path or path.startswith(field + '.') or field.startswith(path + '.'):
+            return True
+    return False
+
+
+def subfields(fields: Optional[List[str]], prefix: str) -> Optional[List[str]]:
+    """
+    Selected paths below `prefix`, relative to it
+
+    Returns None (everything) when `prefix` itself or an ancestor is selected.
+    """
+    if fields is None:
+        return None
+    nested = []
+    for field in fields:
+        if field == prefix or prefix.startswith(field + '.'):
+            return None
+        if field.startswith(prefix + '.'):
+            nested.append(field[len(prefix) + 1:])
+    return nested
+
+
+def select_fields(result: Dict, fields: Optional[List[str]]) -> Dict:
+    """Copy of `result` containing only the selected paths; unknown paths are ignored"""
+    if fields is None:
+        return result
+
+    tree = {}
+    for field in fields:
+        node = tree
+        parts = field.split('.')
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[parts[-1]] = True
+
+    return _prune(result, tree)
+
+
+def _prune(value: Dict, tree: Dict) -> Dict:
+    pruned = {}
+    for key, selection in tree.items():
+        if key not in value:
+            continue
+        if selection is True or not isinstance(value[key], dict):
+            pruned[key] = value[key]
+        else:
+            pruned[key] = _prune(value[key], selection)
+    return pruned
+
+
+def top_level(fields: Optional[List[str]]) -> Optional[set]:
+    """First path components of the selected fields (None means everything)"""
+    if fields is None:
+        return None
+    return {field.split('.', 1)[0] for field in fields}
@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration
+Preloads the app so the compiled marker registry is shared copy-on-write
+"""
+
+import gc
+import glob
+import os
+
+# Import app.py (and compile the marker database) in the master before forking
+preload_app = True
+
+# Prometheus multiprocess mode (see metrics.py): samples left by a previous run
+# are removed here, since the config is read before the app is preloaded
+_multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if _multiproc_dir:
+    os.makedirs(_multiproc_dir, exist_ok=True)
+    for _path in glob.glob(os.path.join(_multiproc_dir, '*.db')):
+        os.remove(_path)
+
+
+def when_ready(server):
+    """
+    Move preloaded objects out of GC tracking so workers don't dirty shared pages,
+    and stop the master's marker database watcher and hit-count flusher so no
+    thread is running at fork (the master's warm-up hits are not traffic)
+    """
+    import marker_analytics
+    import marker_registry
+    marker_registry.stop_watchers()
+    marker_analytics.stop(discard=True)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Watch the marker database and flush hit counts in each worker (threads do not survive fork)"""
+    import marker_analytics
+    import marker_registry
+    marker_registry.start_watchers()
+    marker_analytics.start()
+
+
+def worker_exit(server, worker):
+    """Write the exiting worker's unflushed hit counts (graceful restarts, max_requests, deploys)"""
+    import marker_analytics
+    marker_analytics.stop()
+
+
+def child_exit(server, worker):
+    """Retire an exited worker's live samples from the aggregated /metrics"""
+    if _multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
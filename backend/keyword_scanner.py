@@ -0,0 +1,75 @@
+"""
+Keyword Scanner
+Finds every occurrence of a fixed keyword set in a single pass over the text
+"""
+
+import re
+from typing import Callable, List, Dict, Tuple
+
+
+class KeywordScanner:
+    """Single-pass multi-keyword matcher with offsets and context windows"""
+
+    def __init__(self, entries: List[Tuple[str, Dict]], context_width: int = 50,
+                 compile_pattern: Callable[[str, int], re.Pattern] = re.compile):
+        """
+        Build the scanner
+
+        Args:
+            entries: (keyword, payload) pairs; a keyword may carry several payloads
+            context_width: characters of context kept on each side of a hit
+            compile_pattern: re.compile, or a replacement serving precompiled patterns
+        """
+        self.context_width = context_width
+        self.payloads = {}
+
+        for keyword, payload in entries:
+            key = keyword.lower()
+            if key:
+                self.payloads.setdefault(key, []).append(payload)
+
+        # Longest keywords first so the longest keyword wins at each position.
+        # The zero-width lookahead reports every start position, including
+        # occurrences that overlap a previous hit.
+        alternatives = '|'.join(
+            re.escape(k) for k in sorted(self.payloads, key=len, reverse=True)
+        )
+        self.pattern = (
+            compile_pattern(rf'(?=((?<!\w)(?:{alternatives})(?!\w)))', re.IGNORECASE)
+            if alternatives else None
+        )
+
+    def scan(self, text: str) -> List[Dict]:
+        """
+        Return one hit per keyword occurrence and payload, in text order
+
+        Each hit: {'keyword', 'start', 'end', 'context', 'payload'}
+        """
+        hits = []
+        if self.pattern is None:
+            return hits
+
+        for m in self.pattern.finditer(text):
+            start, end = m.span(1)
+            payloads = self.payloads.get(m.group(1).lower())
+            if not payloads:
+                continue
+
+            context = self._context(text, start, end)
+            for payload in payloads:
+                hits.append({
+                    'keyword': m.group(1),
+                    'start': start,
+                    'end': end,
+                    'context': context,
+                    'payload': payload
+                })
+
+        return hits
+
+    def _context(self, text: str, start: int, end: int) -> str:
+        """Slice a context window around a hit, kept within the current line"""
+        lo = max(start - self.context_width, text.rfind('\n', 0, start) + 1)
+        line_end = text.find('\n', end)
+        hi = min(end + self.context_width, len(text) if line_end == -1 else line_end)
+        return text[lo:hi]
@@ -3,152 +3,155 @@ L2 Voice Preservation Engine
 Protects authentic L2 grammatical structures and cultural identity
 """
 
-import re
-from typing import List, Dict, Tuple
-from nltk.tokenize import sent_tokenize, word_tokenize
-import json
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable
+from tokenization import Tokenizer, get_tokenizer
+from marker_registry import MarkerRegistry, get_registry
+from chunked_analysis import DEFAULT_CHUNK_CHARS, iter_chunks
+from match_types import StructureMatches, CulturalReferences, L1TransferMarkers
+from span_index import SpanIndex
+from stage_timing import stage
+import marker_analytics
 
 
 class L2VoicePreserver:
     """Identifies and protects L2 voice elements from AI oversimplification"""
     
-    def __init__(self, db_path='genericism_database.json'):
-        """Initialize with voice preservation markers"""
-        with open(db_path, 'r') as f:
-            self.db = json.load(f)
-        
-        self.valid_structures = self.db['voice_preservation_markers']['valid_l2_structures']
-        self.cultural_metaphors = self.db['voice_preservation_markers']['cultural_metaphors']
-        self.l2_interference = self.db['ai_markers']['l2_interference_markers']
+    def __init__(self, db_path='genericism_database.json', registry: MarkerRegistry = None,
+                 tokenizer: Tokenizer = None):
+        """Initialize with the shared, compiled voice preservation markers"""
+        self.registry = registry or get_registry(db_path)
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.db = self.registry.db
+        
+        self.structure_engine = self.registry.structure_engine
+        self.voice_marker_scanner = self.registry.voice_marker_scanner
     
     def detect_l2_grammatical_structures(self, text: str) -> Dict:
         """
         Detect L2-authentic grammatical patterns that should be preserved
         """
-        results = {
-            'stylistically_valid_structures': [],
-            'cultural_references': [],
-            'l1_interference_markers': [],
+        results = self._empty_structure_results()
+        sentence_count = self._scan_l2_markers(text, results)
+        self._finalize_structure_results(results, sentence_count)
+        
+        return results
+    
+    def detect_l2_grammatical_structures_chunked(self, chunks: Iterable[Tuple[int, str]]) -> Dict:
+        """
+        Detect L2-authentic patterns chunk by chunk (see chunked_analysis.iter_chunks)
+        
+        Marker offsets are relative to the whole document; the voice strength
+        score is computed from the merged counts.
+        """
+        results = self._empty_structure_results()
+        sentence_count = 0
+        for char_offset, chunk in chunks:
+            sentence_count += self._scan_l2_markers(chunk, results, char_offset)
+        self._finalize_structure_results(results, sentence_count)
+        
+        return results
+    
+    def _empty_structure_results(self) -> Dict:
+        """Result skeleton shared by the whole-text and chunked paths"""
+        return {
+            'stylistically_valid_structures': StructureMatches(self.structure_engine.rules),
+            'cultural_references': CulturalReferences(),
+            'l1_interference_markers': L1TransferMarkers(),
             'voice_strength_score': 0.0,
             'authenticity_indicators': []
         }
-        
-        sentences = sent_tokenize(text)
-        
-        # Detect interlanguage markers
-        for i, sent in enumerate(sentences):
-            # Check for subject-OV patterns (common in Asian L2s)
-            if self._has_object_verb_pattern(sent):
-                results['stylistically_valid_structures'].append({
-                    'type': 'Object-Verb ordering',
-                    'sentence': sent,
-                    'preservation_value': 'HIGH',
-                    'reason': 'Valid L2 structural pattern showing L1 influence'
-                })
+    
+    def _scan_l2_markers(self, text: str, results: Dict, char_offset: int = 0) -> int:
+        """Append structures and markers found in text to results; returns the sentence count"""
+        with stage('tokenize'):
+            spans = self.tokenizer.sentence_spans(text)
+        sentences = [text[start:end] for start, end in spans]
+        
+        # Detect interlanguage markers (all structure rules in one regex call per sentence)
+        with stage('l2.structures'):
+            for (start, end), sent, rule_ids in zip(spans, sentences, self.structure_engine.match_sentences(sentences)):
+                for rule_id in rule_ids:
+                    results['stylistically_valid_structures'].add(rule_id, sent, char_offset + start, char_offset + end)
+        
+        with stage('l2.voice_markers'):
+            # Scan once for every cultural and L1 keyword
+            hits = self.voice_marker_scanner.scan(text)
+            if char_offset:
+                for hit in hits:
+                    hit['start'] += char_offset
+                    hit['end'] += char_offset
             
-            # Check for aspect marking
-            if self._has_aspect_marking(sent):
-                results['stylistically_valid_structures'].append({
-                    'type': 'Aspect marking',
-                    'sentence': sent,
-                    'preservation_value': 'HIGH'
-                })
+            # Detect cultural metaphors
+            self._detect_cultural_metaphors(text, hits, results['cultural_references'])
             
-            # Check for topic-prominent structure
-            if self._has_topic_prominent(sent):
-                results['stylistically_valid_structures'].append({
-                    'type': 'Topic-prominent sentence',
-                    'sentence': sent,
-                    'preservation_value': 'MEDIUM'
-                })
-        
-        # Detect cultural metaphors
-        cultural_phrases = self._detect_cultural_metaphors(text)
-        results['cultural_references'].extend(cultural_phrases)
-        
-        # Detect L1 interference (which is authentic, not error)
-        l1_markers = self._detect_l1_interference(text)
-        results['l1_interference_markers'].extend(l1_markers)
-        
-        # Calculate voice strength
+            # Detect L1 interference (which is authentic, not error)
+            self._detect_l1_interference(text, hits, results['l1_interference_markers'])
+        
+        return len(sentences)
+    
+    def _finalize_structure_results(self, results: Dict, sentence_count: int) -> None:
+        """Compute voice strength and the authenticity summary"""
+        # Calculate voice strength (each distinct cultural marker counts once)
         results['voice_strength_score'] = self._calculate_voice_strength(
             len(results['stylistically_valid_structures']),
-            len(results['cultural_references']),
-            len(sentences)
+            len({(p['type'], p['marker']) for p in results['cultural_references'].hit_payloads()}),
+            sentence_count
         )
         
         results['authenticity_indicators'] = self._generate_authenticity_summary(results)
-        
-        return results
-    
-    def _has_object_verb_pattern(self, sentence: str) -> bool:
-        """Detect OV word order patterns (Asian L1 influence)"""
-        # Look for patterns like "The homework complete needed" or "This problem solve must"
-        pattern = r'\b(must|need|require|can|should|will)\b.*(?:complete|solve|done|finished|correct)'
-        return bool(re.search(pattern, sentence, re.IGNORECASE))
+        with stage('l2.span_index'):
+            results['span_index'] = SpanIndex(
+                (category, results[category].spans())
+                for category in ('stylistically_valid_structures', 'cultural_references', 'l1_interference_markers')
+            )
+        if marker_analytics.enabled():
+            self._record_hits(results)
     
-    def _has_aspect_marking(self, sentence: str) -> bool:
-        """Detect aspect marking variations"""
-        patterns = [
-            r'\b(is|are|be)\s+\w+ing\b',  # Progressive
-            r'\b(has|have)\s+been\b',      # Perfect
-            r'\b(used\s+to|would\s+always)\b'  # Habitual
-        ]
-        return any(re.search(p, sentence, re.IGNORECASE) for p in patterns)
+    def _record_hits(self, results: Dict) -> None:
+        """Report one analyzed text's hits per rule and keyword to marker analytics"""
+        hits = Counter()
+        structures = results['stylistically_valid_structures']
+        for rule_index, n in Counter(structures.rule_indexes).items():
+            hits[('structure_rules', structures.rule_ids[rule_index])] += n
+        for key in ('cultural_references', 'l1_interference_markers'):
+            matches = results[key]
+            for payload_index, n in Counter(matches.payload_indexes).items():
+                payload = matches.payloads[payload_index]
+                if payload['kind'] == 'cultural':
+                    category = 'cultural_metaphor_keywords'
+                else:
+                    category = f"l2_interference_markers.{payload['l1_language']}"
+                hits[(category, payload['marker'])] += n
+        marker_analytics.record(marker_analytics.L2, hits)
     
-    def _has_topic_prominent(self, sentence: str) -> bool:
-        """Detect topic-prominent sentence structures"""
-        # Sentences that start with topicalization
-        pattern = r'^(?:As\s+for|Speaking\s+of|In\s+terms\s+of|Regarding|Concerning)\b'
-        return bool(re.match(pattern, sentence, re.IGNORECASE))
+    def _detect_cultural_metaphors(self, text: str, hits: List[Dict] = None,
+                                   matches: CulturalReferences = None) -> CulturalReferences:
+        """Identify culturally-specific imagery and metaphors (every occurrence)"""
+        if hits is None:
+            hits = self.voice_marker_scanner.scan(text)
+        if matches is None:
+            matches = CulturalReferences()
+        
+        for hit in hits:
+            if hit['payload']['kind'] == 'cultural':
+                matches.add(hit['payload'], hit['start'], hit['end'], hit['context'])
+        
+        return matches
     
-    def _detect_cultural_metaphors(self, text: str) -> List[Dict]:
-        """Identify culturally-specific imagery and metaphors"""
-        results = []
-        
-        # Family-based language
-        family_keywords = ['family', 'parent', 'ancestor', 'elder', 'sibling', 'household']
-        for keyword in family_keywords:
-            if re.search(r'\b' + keyword + r'\b', text, re.IGNORECASE):
-                context_match = re.search(
-                    r'.{0,50}\b' + keyword + r'\b.{0,50}',
-                    text, re.IGNORECASE
-                )
-                if context_match:
-                    results.append({
-                        'type': 'Family-based reference',
-                        'marker': keyword,
-                        'context': context_match.group(),
-                        'cultural_value': 'Potentially authentic L2 voice'
-                    })
-        
-        # Nature-based imagery
-        nature_keywords = ['mountain', 'river', 'moon', 'wind', 'bamboo', 'desert', 'ocean']
-        for keyword in nature_keywords:
-            if re.search(r'\b' + keyword + r'\b', text, re.IGNORECASE):
-                results.append({
-                    'type': 'Nature-based imagery',
-                    'marker': keyword,
-                    'cultural_value': 'May indicate authentic L2 cultural perspective'
-                })
-        
-        return results
-    
-    def _detect_l1_interference(self, text: str) -> List[Dict]:
+    def _detect_l1_interference(self, text: str, hits: List[Dict] = None,
+                                matches: L1TransferMarkers = None) -> L1TransferMarkers:
         """Detect L1 transfer patterns (which indicate authentic voice, not error)"""
-        results = []
-        
-        for lang, markers in self.l2_interference.items():
-            for marker in markers:
-                if marker.lower() in text.lower():
-                    results.append({
-                        'l1_language': lang,
-                        'marker': marker,
-                        'authenticity_indicator': 'Shows genuine L1 influence',
-                        'preservation_recommendation': 'PROTECT - This is authentic voice'
-                    })
+        if hits is None:
+            hits = self.voice_marker_scanner.scan(text)
+        if matches is None:
+            matches = L1TransferMarkers()
         
-        return results
+        for hit in hits:
+            if hit['payload']['kind'] == 'l1_interference':
+                matches.add(hit['payload'], hit['start'], hit['end'], hit['context'])
+        
+        return matches
     
     def _calculate_voice_strength(self, structures_count: int, cultural_count: int, total_sentences: int) -> float:
         """
@@ -186,6 +189,21 @@ class L2VoicePreserver:
         """
         Detect specific instances where AI has stripped L2 voice
         """
+        orig_analysis = self.detect_l2_grammatical_structures(original)
+        edited_analysis = self.detect_l2_grammatical_structures(edited)
+        with stage('l2.voice_loss'):
+            return self._compare_voice(orig_analysis, edited_analysis)
+    
+    def detect_voice_loss_chunked(self, original: str, edited: str,
+                                  max_chars: int = DEFAULT_CHUNK_CHARS) -> Dict:
+        """Detect voice loss, analyzing each text chunk by chunk"""
+        orig_analysis = self.detect_l2_grammatical_structures_chunked(iter_chunks(original, max_chars))
+        edited_analysis = self.detect_l2_grammatical_structures_chunked(iter_chunks(edited, max_chars))
+        with stage('l2.voice_loss'):
+            return self._compare_voice(orig_analysis, edited_analysis)
+    
+    def _compare_voice(self, orig_analysis: Dict, edited_analysis: Dict) -> Dict:
+        """Compare the L2 analyses of the original and edited texts"""
         results = {
             'lost_structures': [],
             'lost_cultural_references': [],
@@ -194,26 +212,23 @@ class L2VoicePreserver:
             'specific_instances': []
         }
         
-        orig_analysis = self.detect_l2_grammatical_structures(original)
-        edited_analysis = self.detect_l2_grammatical_structures(edited)
-        
         # Compare voice strength
         voice_loss = orig_analysis['voice_strength_score'] - edited_analysis['voice_strength_score']
         results['total_voice_loss'] = max(0, voice_loss)
         
         # Identify lost structures
-        orig_structures = {s['sentence'] for s in orig_analysis['stylistically_valid_structures']}
-        edited_structures = {s['sentence'] for s in edited_analysis['stylistically_valid_structures']}
+        orig_structures = set(orig_analysis['stylistically_valid_structures'].sentences())
+        edited_structures = set(edited_analysis['stylistically_valid_structures'].sentences())
         results['lost_structures'] = list(orig_structures - edited_structures)
         
         # Identify lost cultural elements
-        orig_cultural = {c['context'] for c in orig_analysis['cultural_references']}
-        edited_cultural = {c['context'] for c in edited_analysis['cultural_references']}
+        orig_cultural = set(orig_analysis['cultural_references'].contexts())
+        edited_cultural = set(edited_analysis['cultural_references'].contexts())
         results['lost_cultural_references'] = list(orig_cultural - edited_cultural)
         
         # Identify lost L1 markers
-        orig_l1 = {m['marker'] for m in orig_analysis['l1_interference_markers']}
-        edited_l1 = {m['marker'] for m in edited_analysis['l1_interference_markers']}
+        orig_l1 = {p['marker'] for p in orig_analysis['l1_interference_markers'].hit_payloads()}
+        edited_l1 = {p['marker'] for p in edited_analysis['l1_interference_markers'].hit_payloads()}
         results['lost_l1_markers'] = list(orig_l1 - edited_l1)
         
         # Generate specific instances
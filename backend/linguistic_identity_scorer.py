@@ -5,19 +5,38 @@ Quantifies how much original student voice remains after AI editing
 
 import re
 import math
-from typing import Dict, List, Tuple
-from nltk.tokenize import word_tokenize, sent_tokenize
+import difflib
+from typing import Callable, Dict, Iterable, List, Tuple
+from tokenization import Tokenizer, get_tokenizer
 from collections import Counter
 import json
+from marker_registry import MarkerRegistry, get_registry
+from chunked_analysis import DEFAULT_CHUNK_CHARS, iter_chunks
+from stage_timing import stage
+
+
+# Cheap word signature used for paragraph alignment
+_WORD_RE = re.compile(r"\w+")
+
+# Changed paragraphs are paired only above this token-set similarity; rewrites of
+# the same paragraph score about 0.3-0.6, unrelated paragraphs under 0.1
+_PAIR_SIMILARITY = 0.2
+
+# Stylistic contraction set and L2 features checked by the preservation bonus
+_STYLE_CONTRACTIONS = ("don't", "can't", "won't", "it's", "i'm", "that's", "we're", "they're")
+_CULTURAL_KEYWORDS = ('family', 'culture', 'home', 'tradition')
+_L1_TRANSFER_RE = re.compile(r'\b(?:very\s+very|should\s+must)\b', re.IGNORECASE)
 
 
 class LinguisticIdentityScorer:
     """Calculates comprehensive voice preservation metrics"""
     
-    def __init__(self, db_path='genericism_database.json'):
-        """Initialize with voice markers database"""
-        with open(db_path, 'r') as f:
-            self.db = json.load(f)
+    def __init__(self, db_path='genericism_database.json', registry: MarkerRegistry = None,
+                 tokenizer: Tokenizer = None):
+        """Initialize with the shared, compiled voice markers database"""
+        self.registry = registry or get_registry(db_path)
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.db = self.registry.db
     
     def calculate_voice_preservation_score(self, original: str, edited: str) -> Dict:
         """
@@ -28,6 +47,28 @@ class LinguisticIdentityScorer:
         
         Scale: 0-100
         """
+        return self._score_voice_preservation(original, edited, lambda text: [(0, text)])
+    
+    def calculate_voice_preservation_score_chunked(self, original: str, edited: str,
+                                                   max_chars: int = DEFAULT_CHUNK_CHARS) -> Dict:
+        """
+        Calculate the voice preservation score chunk by chunk
+        
+        Components are built from per-chunk counts, so tokenization only
+        ever holds one chunk in memory. The result equals the whole-text
+        score when every chunk ends where the tokenizer also ends a
+        sentence: iter_chunks cuts at blank lines, then after sentence-final
+        punctuation. A paragraph cut mid-sentence, or after an abbreviation
+        punkt does not split at, gains a sentence and shifts the
+        sentence-based scores slightly, and a phrase across a cut is missed.
+        """
+        return self._score_voice_preservation(
+            original, edited, lambda text: iter_chunks(text, max_chars)
+        )
+    
+    def _score_voice_preservation(self, original: str, edited: str,
+                                  chunker: Callable[[str], Iterable[Tuple[int, str]]]) -> Dict:
+        """Score the two texts, profiling each one chunk by chunk"""
         results = {
             'overall_score': 0,
             'component_scores': {},
@@ -36,12 +77,21 @@ class LinguisticIdentityScorer:
             'detailed_metrics': {}
         }
         
+        with stage('scorer.profile'):
+            orig_profile = self._profile_text(chunker(original), collect_patterns=True)
+            edited_profile = self._profile_text(chunker(edited))
+        
         # Calculate component scores
-        lexical_score = self._calculate_lexical_identity(original, edited)
-        structural_score = self._calculate_structural_identity(original, edited)
-        stylistic_score = self._calculate_stylistic_identity(original, edited)
-        voice_consistency = self._calculate_voice_consistency(original, edited)
-        authenticity_markers = self._calculate_authenticity_markers(original, edited)
+        with stage('scorer.lexical_identity'):
+            lexical_score = self._calculate_lexical_identity(orig_profile, edited_profile)
+        with stage('scorer.structural_identity'):
+            structural_score = self._calculate_structural_identity(orig_profile, edited_profile)
+        with stage('scorer.stylistic_identity'):
+            stylistic_score = self._calculate_stylistic_identity(orig_profile, edited_profile)
+        with stage('scorer.voice_consistency'):
+            voice_consistency = self._calculate_voice_consistency(original, edited)
+        with stage('scorer.authenticity_markers'):
+            authenticity_markers = self._calculate_authenticity_markers(orig_profile, edited_profile)
         
         results['component_scores'] = {
             'lexical_identity': lexical_score,
@@ -66,28 +116,78 @@ class LinguisticIdentityScorer:
         results['risk_level'] = self._assess_homogenization_risk(results['overall_score'])
         
         # Detailed metrics
-        results['detailed_metrics'] = {
-            'original_word_count': len(original.split()),
-            'edited_word_count': len(edited.split()),
-            'retained_unique_words': self._count_retained_unique_words(original, edited),
-            'retained_sentence_patterns': self._count_retained_patterns(original, edited),
-            'ai_phrase_infiltration': 100 - self._measure_generic_infiltration(edited)
-        }
+        with stage('scorer.detailed_metrics'):
+            results['detailed_metrics'] = {
+                'original_word_count': orig_profile['word_count'],
+                'edited_word_count': edited_profile['word_count'],
+                'retained_unique_words': self._count_retained_unique_words(orig_profile, edited_profile),
+                'retained_sentence_patterns': self._count_retained_patterns(orig_profile['patterns'], chunker(edited)),
+                'ai_phrase_infiltration': 100 - self._measure_generic_infiltration(edited_profile)
+            }
         
         return results
     
-    def _calculate_lexical_identity(self, original: str, edited: str) -> float:
+    def _profile_text(self, chunks: Iterable[Tuple[int, str]], collect_patterns: bool = False) -> Dict:
+        """
+        Collect the additive counts every component score is derived from
+        
+        Chunks must tile the text on whitespace boundaries (see
+        chunked_analysis.iter_chunks); a single (0, text) chunk profiles the
+        whole text at once.
+        """
+        profile = {
+            'vocabulary': set(),
+            'sentence_count': 0,
+            'sentence_words': 0,
+            'char_count': 0,
+            'word_count': 0,
+            'punctuation': 0,
+            'capitalized_words': 0,
+            'contractions': 0,
+            'generic_phrases': 0,
+            'authentic_markers': 0,
+            'cultural_keywords': set(),
+            'l1_transfer': False,
+            'patterns': []
+        }
+        
+        for _, chunk in chunks:
+            lowered = chunk.lower()
+            with stage('tokenize'):
+                profile['vocabulary'].update(self.tokenizer.words(lowered))
+                sentences = self.tokenizer.sentences(chunk)
+            profile['sentence_count'] += len(sentences)
+            for sent in sentences:
+                profile['sentence_words'] += len(sent.split())
+                if collect_patterns:
+                    # First 3 words as the sentence opening pattern
+                    profile['patterns'].append(' '.join(self.tokenizer.words(sent)[:3]).lower())
+            
+            words = chunk.split()
+            profile['char_count'] += len(chunk)
+            profile['word_count'] += len(words)
+            profile['punctuation'] += sum(chunk.count(p) for p in ('!', '?', ';', ':', '...'))
+            profile['capitalized_words'] += sum(1 for w in words if w[0].isupper() if w)
+            profile['contractions'] += sum(lowered.count(c) for c in _STYLE_CONTRACTIONS)
+            profile['generic_phrases'] += self._count_generic_words(chunk)
+            profile['authentic_markers'] += self._count_authentic_markers(chunk)
+            
+            # L2 features whose persistence earns a bonus
+            profile['cultural_keywords'].update(k for k in _CULTURAL_KEYWORDS if k in lowered)
+            if not profile['l1_transfer'] and _L1_TRANSFER_RE.search(chunk):
+                profile['l1_transfer'] = True
+        
+        return profile
+    
+    def _calculate_lexical_identity(self, orig_profile: Dict, edited_profile: Dict) -> float:
         """
         Measure vocabulary preservation
         High = more original vocabulary retained
         """
-        orig_words = set(word_tokenize(original.lower()))
-        edited_words = set(word_tokenize(edited.lower()))
-        
         # Remove common words
         stopwords = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of'])
-        orig_words -= stopwords
-        edited_words -= stopwords
+        orig_words = orig_profile['vocabulary'] - stopwords
+        edited_words = edited_profile['vocabulary'] - stopwords
         
         # Calculate retention rate
         if not orig_words:
@@ -97,31 +197,25 @@ class LinguisticIdentityScorer:
         retention_rate = (retained / len(orig_words)) * 100
         
         # Penalty for added generic words
-        generic_words = self._count_generic_words(edited)
+        generic_words = edited_profile['generic_phrases']
         generic_penalty = (generic_words / max(len(edited_words), 1)) * 20
         
         return max(0, retention_rate - generic_penalty)
     
-    def _calculate_structural_identity(self, original: str, edited: str) -> float:
+    def _calculate_structural_identity(self, orig_profile: Dict, edited_profile: Dict) -> float:
         """
         Measure sentence structure preservation
         High = original sentence patterns retained
         """
-        orig_sents = sent_tokenize(original)
-        edited_sents = sent_tokenize(edited)
-        
-        if not orig_sents:
+        if not orig_profile['sentence_count']:
             return 100
         
-        # Calculate average sentence length preservation
-        orig_lengths = [len(s.split()) for s in orig_sents]
-        edited_lengths = [len(s.split()) for s in edited_sents]
-        
-        if not edited_lengths:
+        if not edited_profile['sentence_count']:
             return 0
         
-        orig_avg = sum(orig_lengths) / len(orig_lengths)
-        edited_avg = sum(edited_lengths) / len(edited_lengths)
+        # Calculate average sentence length preservation
+        orig_avg = orig_profile['sentence_words'] / orig_profile['sentence_count']
+        edited_avg = edited_profile['sentence_words'] / edited_profile['sentence_count']
         
         # Measure how much the structure changed
         length_change = abs(edited_avg - orig_avg) / max(orig_avg, 1)
@@ -129,22 +223,22 @@ class LinguisticIdentityScorer:
         
         return min(100, structure_preservation)
     
-    def _calculate_stylistic_identity(self, original: str, edited: str) -> float:
+    def _calculate_stylistic_identity(self, orig_profile: Dict, edited_profile: Dict) -> float:
         """
         Measure stylistic consistency
         High = original style/voice retained
         """
         # Measure punctuation patterns
-        orig_punct_score = self._measure_punctuation_style(original)
-        edited_punct_score = self._measure_punctuation_style(edited)
+        orig_punct_score = self._measure_punctuation_style(orig_profile)
+        edited_punct_score = self._measure_punctuation_style(edited_profile)
         
         # Measure capitalization patterns
-        orig_caps_score = self._measure_capitalization_style(original)
-        edited_caps_score = self._measure_capitalization_style(edited)
+        orig_caps_score = self._measure_capitalization_style(orig_profile)
+        edited_caps_score = self._measure_capitalization_style(edited_profile)
         
         # Measure contraction usage
-        orig_contraction_score = self._measure_contraction_usage(original)
-        edited_contraction_score = self._measure_contraction_usage(edited)
+        orig_contraction_score = self._measure_contraction_usage(orig_profile)
+        edited_contraction_score = self._measure_contraction_usage(edited_profile)
         
         # Average the style components
         style_preservation = (
@@ -161,14 +255,16 @@ class LinguisticIdentityScorer:
         High = voice stable across document
         """
         # Split texts into paragraphs/sections
-        orig_sections = original.split('\n\n')
-        edited_sections = edited.split('\n\n')
+        orig_sections = [s for s in original.split('\n\n') if s.strip()]
+        edited_sections = [s for s in edited.split('\n\n') if s.strip()]
         
-        # Calculate voice scores for each section
+        # Calculate voice scores for each aligned section pair
         section_scores = []
         
-        for orig_sec, edited_sec in zip(orig_sections, edited_sections):
-            if not orig_sec or not edited_sec:
+        for orig_sec, edited_sec, identical in self._align_paragraphs(orig_sections, edited_sections):
+            if identical:
+                # Unchanged paragraph: full overlap, no tokenization needed
+                section_scores.append(100.0)
                 continue
             
             sec_score = self._section_voice_consistency(orig_sec, edited_sec)
@@ -184,12 +280,90 @@ class LinguisticIdentityScorer:
         
         return max(0, avg_score - (consistency_penalty / 10))
     
-    def _calculate_authenticity_markers(self, original: str, edited: str) -> float:
+    def _align_paragraphs(self, orig_sections: List[str],
+                          edited_sections: List[str]) -> List[Tuple[str, str, bool]]:
+        """
+        Align original and edited paragraphs so that inserted, deleted or
+        merged paragraphs do not shift every later comparison.
+        
+        Paragraphs with identical content are matched by their normalized
+        text first. The remaining runs are paired by token-set similarity.
+        
+        Returns: list of (original, edited, identical) tuples in document order
+        """
+        orig_keys = [' '.join(s.split()) for s in orig_sections]
+        edited_keys = [' '.join(s.split()) for s in edited_sections]
+        
+        matcher = difflib.SequenceMatcher(None, orig_keys, edited_keys, autojunk=False)
+        
+        pairs = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                pairs.extend(
+                    (orig_sections[i1 + k], edited_sections[j1 + k], True)
+                    for k in range(i2 - i1)
+                )
+            elif tag == 'replace':
+                for i, j in self._align_changed_paragraphs(orig_keys[i1:i2], edited_keys[j1:j2]):
+                    pairs.append((orig_sections[i1 + i], edited_sections[j1 + j], False))
+            # Pure insertions and deletions have no counterpart to compare
+        
+        return pairs
+    
+    def _align_changed_paragraphs(self, orig_block: List[str],
+                                  edited_block: List[str]) -> List[Tuple[int, int]]:
+        """
+        Pair paragraphs inside a changed run by token-set (Jaccard) similarity.
+        
+        Uses an order-preserving alignment that maximizes the total of
+        similarity - _PAIR_SIMILARITY over paired paragraphs, so only
+        paragraphs more similar than the threshold are paired. An inserted,
+        deleted or unrelated paragraph is left unaligned, and of paragraphs
+        merged into one, only the most similar is paired with it.
+        """
+        n, m = len(orig_block), len(edited_block)
+        
+        # Very large changed runs: fall back to positional pairing
+        if n * m > 10000:
+            return [(k, k) for k in range(min(n, m))]
+        
+        orig_sigs = [frozenset(_WORD_RE.findall(p.lower())) for p in orig_block]
+        edited_sigs = [frozenset(_WORD_RE.findall(p.lower())) for p in edited_block]
+        
+        def similarity(a: frozenset, b: frozenset) -> float:
+            if not a or not b:
+                return 0.0
+            return len(a & b) / len(a | b)
+        
+        # best[i][j] = best total gain aligning orig_block[i:] with edited_block[j:]
+        best = [[0.0] * (m + 1) for _ in range(n + 1)]
+        for i in range(n - 1, -1, -1):
+            for j in range(m - 1, -1, -1):
+                best[i][j] = max(best[i + 1][j], best[i][j + 1])
+                gain = similarity(orig_sigs[i], edited_sigs[j]) - _PAIR_SIMILARITY
+                if gain > 0:
+                    best[i][j] = max(best[i][j], gain + best[i + 1][j + 1])
+        
+        pairs = []
+        i = j = 0
+        while i < n and j < m:
+            if best[i][j] == best[i + 1][j]:
+                i += 1
+            elif best[i][j] == best[i][j + 1]:
+                j += 1
+            else:
+                pairs.append((i, j))
+                i += 1
+                j += 1
+        
+        return pairs
+    
+    def _calculate_authenticity_markers(self, orig_profile: Dict, edited_profile: Dict) -> float:
         """
         Measure presence of authentic L2/personal markers
         """
-        orig_authentic = self._count_authentic_markers(original)
-        edited_authentic = self._count_authentic_markers(edited)
+        orig_authentic = orig_profile['authentic_markers']
+        edited_authentic = edited_profile['authentic_markers']
         
         if orig_authentic == 0:
             return 50  # Neutral if no markers to begin with
@@ -197,53 +371,41 @@ class LinguisticIdentityScorer:
         retention_rate = (edited_authentic / orig_authentic) * 100
         
         # Bonus for maintaining unique L2 features
-        l2_bonus = self._detect_l2_preservation_bonus(original, edited)
+        l2_bonus = self._detect_l2_preservation_bonus(orig_profile, edited_profile)
         
         return min(100, retention_rate + l2_bonus)
     
-    def _measure_punctuation_style(self, text: str) -> float:
+    def _measure_punctuation_style(self, profile: Dict) -> float:
         """Measure punctuation usage patterns (0-100)"""
-        total_chars = len(text)
+        total_chars = profile['char_count']
         if total_chars == 0:
             return 50
         
-        punctuation_counts = {
-            '!': text.count('!'),
-            '?': text.count('?'),
-            ';': text.count(';'),
-            ':': text.count(':'),
-            '...': text.count('...')
-        }
-        
-        # Calculate punctuation "richness"
-        richness = sum(count for count in punctuation_counts.values()) / (total_chars / 100)
+        # Calculate punctuation "richness" (! ? ; : ...)
+        richness = profile['punctuation'] / (total_chars / 100)
         return min(100, richness * 10)
     
-    def _measure_capitalization_style(self, text: str) -> float:
+    def _measure_capitalization_style(self, profile: Dict) -> float:
         """Measure capitalization patterns"""
-        words = text.split()
-        if not words:
+        if not profile['word_count']:
             return 50
         
-        caps_words = sum(1 for w in words if w[0].isupper() if w)
-        return (caps_words / len(words)) * 100
+        return (profile['capitalized_words'] / profile['word_count']) * 100
     
-    def _measure_contraction_usage(self, text: str) -> float:
+    def _measure_contraction_usage(self, profile: Dict) -> float:
         """Measure informal contractions (don't, can't, etc.)"""
-        contractions = ["don't", "can't", "won't", "it's", "i'm", "that's", "we're", "they're"]
-        contraction_count = sum(text.lower().count(c) for c in contractions)
-        word_count = len(text.split())
+        word_count = profile['word_count']
         
         if word_count == 0:
             return 50
         
-        return (contraction_count / (word_count / 100)) * 10
+        return (profile['contractions'] / (word_count / 100)) * 10
     
     def _section_voice_consistency(self, orig_section: str, edited_section: str) -> float:
         """Calculate voice consistency for a single section"""
         # Check if major changes occurred
-        orig_words = set(word_tokenize(orig_section.lower()))
-        edited_words = set(word_tokenize(edited_section.lower()))
+        orig_words = set(self.tokenizer.words(orig_section.lower()))
+        edited_words = set(self.tokenizer.words(edited_section.lower()))
         
         if not orig_words:
             return 50
@@ -251,44 +413,41 @@ class LinguisticIdentityScorer:
         overlap = len(orig_words & edited_words) / len(orig_words)
         return overlap * 100
     
-    def _count_retained_unique_words(self, original: str, edited: str) -> int:
+    def _count_retained_unique_words(self, orig_profile: Dict, edited_profile: Dict) -> int:
         """Count unique words from original that appear in edited"""
-        orig_words = set(word_tokenize(original.lower()))
-        edited_words = set(word_tokenize(edited.lower()))
-        return len(orig_words & edited_words)
+        return len(orig_profile['vocabulary'] & edited_profile['vocabulary'])
     
-    def _count_retained_patterns(self, original: str, edited: str) -> int:
+    def _count_retained_patterns(self, patterns: List[str], edited_chunks: Iterable[Tuple[int, str]]) -> int:
         """Count sentence patterns from original that appear in edited"""
         # Simplified: count matching sentence opening patterns
-        orig_sents = sent_tokenize(original)
-        edited_text = edited.lower()
-        
+        pending = Counter(patterns)
         patterns_retained = 0
-        for sent in orig_sents:
-            # Get first 3 words as pattern
-            pattern = ' '.join(word_tokenize(sent)[:3]).lower()
-            if pattern in edited_text:
-                patterns_retained += 1
+        
+        for _, chunk in edited_chunks:
+            edited_text = chunk.lower()
+            found = [pattern for pattern in pending if pattern in edited_text]
+            for pattern in found:
+                patterns_retained += pending.pop(pattern)
+            if not pending:
+                break
         
         return patterns_retained
     
     def _count_generic_words(self, text: str) -> int:
         """Count generic AI words"""
-        generic_words = self.db['ai_markers']['high_frequency']
         count = 0
-        for word in generic_words:
-            count += len(re.findall(re.escape(word), text, re.IGNORECASE))
+        for _, pattern in self.registry.phrase_patterns['high_frequency']:
+            count += len(pattern.findall(text))
         return count
     
-    def _measure_generic_infiltration(self, text: str) -> float:
+    def _measure_generic_infiltration(self, profile: Dict) -> float:
         """Measure how many generic phrases infiltrated the text"""
-        generic_count = self._count_generic_words(text)
-        word_count = len(text.split())
+        word_count = profile['word_count']
         
         if word_count == 0:
             return 0
         
-        return min(100, (generic_count / (word_count / 100)) * 10)
+        return min(100, (profile['generic_phrases'] / (word_count / 100)) * 10)
     
     def _count_authentic_markers(self, text: str) -> int:
         """Count markers of authentic L2/personal voice"""
@@ -310,20 +469,17 @@ class LinguisticIdentityScorer:
         
         return markers
     
-    def _detect_l2_preservation_bonus(self, original: str, edited: str) -> float:
+    def _detect_l2_preservation_bonus(self, orig_profile: Dict, edited_profile: Dict) -> float:
         """Bonus for maintaining L2-specific authentic features"""
         # Check if L2 markers persist in edited version
         bonus = 0
         
         # Cultural references
-        cultural_keywords = ['family', 'culture', 'home', 'tradition']
-        for keyword in cultural_keywords:
-            if keyword in original.lower() and keyword in edited.lower():
-                bonus += 5
+        retained_keywords = orig_profile['cultural_keywords'] & edited_profile['cultural_keywords']
+        bonus += 5 * len(retained_keywords)
         
         # L1 transfer patterns
-        if re.search(r'\b(?:very\s+very|should\s+must)\b', original, re.IGNORECASE) and \
-           re.search(r'\b(?:very\s+very|should\s+must)\b', edited, re.IGNORECASE):
+        if orig_profile['l1_transfer'] and edited_profile['l1_transfer']:
             bonus += 10
         
         return min(20, bonus)  # Cap at 20 points
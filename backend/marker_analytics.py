@@ -0,0 +1,335 @@
+"""
+Marker Analytics
+Hit counts per marker category and phrase, aggregated across requests and
+worker processes, to find markers that never fire
+
+Engines report each analyzed text's hits here (one small counter update per
+category per text; nothing per hit). Each worker keeps its counts in memory
+and rewrites `<worker>.json` in the analytics directory every
+`flush_interval` seconds, from a background thread, holding an flock on
+`<worker>.lock` for its lifetime. GET /api/markers/hits merges the files of
+all workers (and the unflushed counts of the worker serving it). The files of
+exited workers, whose locks the kernel has released, are folded into
+`merged.json`, so totals survive worker restarts and deploys until the
+directory is cleared. Gunicorn's worker_exit hook writes a worker's last
+counts when it exits gracefully; a worker that is killed loses at most its
+last `flush_interval` seconds of hits. Every marker of the current database is listed, with
+zero hits if it never matched; `?format=csv` exports the same rows.
+
+Hits count occurrences, except formulaic_structures (sentences matched per
+pattern) and structure_rules (sentences matched per rule). hit_rate is hits
+per analyzed text of the engine that owns the category.
+"""
+
+import csv
+import fcntl
+import glob
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+
+from marker_registry import MarkerRegistry, PHRASE_CATEGORIES
+
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'writing_defense_marker_hits')
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+# Engines whose analyzed texts are counted, and the categories each owns
+AITISM = 'aitism'
+L2 = 'l2'
+L2_CATEGORIES = ('structure_rules', 'cultural_metaphor_keywords', 'l2_interference_markers')
+
+_MERGED = 'merged.json'
+_MERGE_LOCK = 'merge.lock'
+
+# (category, marker) -> hits
+Hits = Counter
+
+
+def engine_of(category: str) -> str:
+    return L2 if category.split('.')[0] in L2_CATEGORIES else AITISM
+
+
+def database_markers(registry: MarkerRegistry) -> Iterable[Tuple[str, str]]:
+    """(category, marker) of every marker in the database, in database order"""
+    ai_markers = registry.db['ai_markers']
+    voice_markers = registry.db['voice_preservation_markers']
+    for category in PHRASE_CATEGORIES + ('transition_abuse', 'hedging_qualifiers', 'formulaic_structures'):
+        for marker in ai_markers[category]:
+            yield category, marker
+    for rule in voice_markers.get('structure_rules', ()):
+        yield 'structure_rules', rule['id']
+    for group in voice_markers.get('cultural_metaphor_keywords', ()):
+        for keyword in group['keywords']:
+            yield 'cultural_metaphor_keywords', keyword
+    for language, markers in ai_markers['l2_interference_markers'].items():
+        for marker in markers:
+            yield f'l2_interference_markers.{language}', marker
+
+
+def _read(path: str) -> Tuple[Counter, Hits]:
+    """(texts per engine, hits) stored in a counts file; empty when it is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return Counter(), Hits()
+    hits = Hits({(category, marker): n
+                 for category, markers in data.get('hits', {}).items() for marker, n in markers.items()})
+    return Counter(data.get('texts', {})), hits
+
+
+def _write(path: str, texts: Counter, hits: Hits) -> None:
+    nested: Dict[str, Dict[str, int]] = {}
+    for (category, marker), n in hits.items():
+        nested.setdefault(category, {})[marker] = n
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'texts': dict(texts), 'hits': nested}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class HitRecorder:
+    """This worker's hit counts and their periodically rewritten counts file"""
+
+    def __init__(self, directory: str = DEFAULT_DIR, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_process()
+
+    def _start_process(self) -> None:
+        """
+        Start counting for the current process under a new worker id
+
+        Counts inherited from the gunicorn master (e.g. warm-up analyses)
+        are dropped, so forked workers do not each report them.
+        """
+        self.pid = os.getpid()
+        self.worker_id = f'{self.pid}-{uuid.uuid4().hex[:8]}'
+        self.texts = Counter()
+        self.hits = Hits()
+        self._lock_fd: Optional[int] = None
+
+    def record(self, engine: str, hits: Mapping[Tuple[str, str], int]) -> None:
+        """Add one analyzed text and its hits"""
+        with self._lock:
+            self.texts[engine] += 1
+            self.hits.update(hits)
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.directory, self.worker_id + suffix)
+
+    def flush(self) -> None:
+        """Rewrite this worker's counts file (creating and locking it first)"""
+        with self._lock:
+            if self._lock_fd is None:
+                if not self.texts:
+                    return
+                self._lock_fd = os.open(self._path('.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            _write(self._path('.json'), self.texts, self.hits)
+
+    def totals(self) -> Tuple[Counter, Hits, int]:
+        """
+        Merged counts of every worker, past and present
+
+        Returns: (texts per engine, hits, number of live workers)
+        """
+        merge_lock = os.open(os.path.join(self.directory, _MERGE_LOCK), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(merge_lock, fcntl.LOCK_EX)
+            merged_path = os.path.join(self.directory, _MERGED)
+            texts, hits = _read(merged_path)
+            workers = 0
+            for lock_path in glob.glob(os.path.join(self.directory, '*.lock')):
+                if os.path.basename(lock_path) == _MERGE_LOCK:
+                    continue
+                counts_path = lock_path[:-len('.lock')] + '.json'
+                if counts_path == self._path('.json'):
+                    # This worker: counts are added from memory below
+                    continue
+                if not os.path.exists(counts_path):
+                    # Created but not yet flushed (or the worker exited before its first flush)
+                    continue
+                try:
+                    fd = os.open(lock_path, os.O_RDWR)
+                except FileNotFoundError:
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    live = False
+                except BlockingIOError:
+                    live = True
+                finally:
+                    os.close(fd)
+                worker_texts, worker_hits = _read(counts_path)
+                if live:
+                    texts.update(worker_texts)
+                    hits.update(worker_hits)
+                    workers += 1
+                    continue
+                # An exited worker (the kernel released its lock): fold its final counts into merged.json
+                merged_texts, merged_hits = _read(merged_path)
+                merged_texts.update(worker_texts)
+                merged_hits.update(worker_hits)
+                _write(merged_path, merged_texts, merged_hits)
+                texts.update(worker_texts)
+                hits.update(worker_hits)
+                for path in (counts_path, lock_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        finally:
+            os.close(merge_lock)
+
+        with self._lock:
+            texts.update(self.texts)
+            hits.update(self.hits)
+        return texts, hits, workers + 1
+
+    def start(self) -> None:
+        """
+        Start the flush thread in this process (idempotent)
+
+        Threads do not survive fork(), so gunicorn's post_fork hook calls
+        this in each worker (after stop() in the master).
+        """
+        if os.getpid() != self.pid:
+            self._start_process()
+            self._thread = None
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='marker-hits-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self, discard: bool = False) -> None:
+        """
+        Stop this process's flush thread and write the counts a last time
+
+        With discard, the counts and their file are dropped instead, e.g.
+        in the gunicorn master, whose warm-up analyses are not traffic.
+        """
+        if self._thread is not None and os.getpid() == self.pid:
+            self._stop_event.set()
+            self._thread.join()
+        self._thread = None
+        if not discard:
+            self.flush()
+            return
+        with self._lock:
+            if self._lock_fd is not None:
+                for suffix in ('.json', '.lock'):
+                    try:
+                        os.remove(self._path(suffix))
+                    except FileNotFoundError:
+                        pass
+                os.close(self._lock_fd)
+            self._start_process()
+
+    def _run(self) -> None:
+        stop_event = self._stop_event
+        while not stop_event.wait(self.flush_interval):
+            self.flush()
+
+
+_recorder: Optional[HitRecorder] = None
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def record(engine: str, hits: Mapping[Tuple[str, str], int]) -> None:
+    """Count one analyzed text's hits (no-op unless analytics are enabled)"""
+    if _recorder is not None:
+        _recorder.record(engine, hits)
+
+
+def count_labels(category: str, labels: List[str], label_ids: Iterable[int], hits: Hits) -> None:
+    """Add one hit per label id, e.g. the matches of a SpanMatches container"""
+    for label_id, n in Counter(label_ids).items():
+        hits[(category, labels[label_id])] += n
+
+
+def start() -> None:
+    if _recorder is not None:
+        _recorder.start()
+
+
+def stop(discard: bool = False) -> None:
+    if _recorder is not None:
+        _recorder.stop(discard)
+
+
+def report(registry: MarkerRegistry, texts: Counter, hits: Hits) -> List[Dict]:
+    """
+    One row per marker: every database marker (zero hits if it never
+    matched) and any counted marker no longer in the database
+    """
+    rows = []
+    in_database = dict.fromkeys(database_markers(registry), True)
+    removed = sorted(key for key in hits if key not in in_database)
+    for key in list(in_database) + removed:
+        category, marker = key
+        n = hits.get(key, 0)
+        analyzed = texts.get(engine_of(category), 0)
+        rows.append({
+            'category': category,
+            'marker': marker,
+            'hits': n,
+            'hit_rate': round(n / analyzed, 6) if analyzed else 0.0,
+            'in_database': key in in_database,
+        })
+    return rows
+
+
+def init_app(app: Flask, recorder: Optional[HitRecorder],
+             current_registry: Callable[[], MarkerRegistry]) -> None:
+    """Count marker hits and serve them at /api/markers/hits (no-op without a recorder)"""
+    global _recorder
+    if recorder is None:
+        return
+    _recorder = recorder
+    recorder.start()
+
+    @app.route('/api/markers/hits', methods=['GET'])
+    def marker_hits():
+        """
+        Marker hit counts merged across workers
+
+        Query parameters: format (json | csv; default json), category (prefix filter)
+        """
+        fmt = request.args.get('format', 'json')
+        if fmt not in ('json', 'csv'):
+            return jsonify({'error': 'format must be json or csv'}), 400
+        texts, hits, workers = recorder.totals()
+        rows = report(current_registry(), texts, hits)
+        category = request.args.get('category')
+        if category:
+            rows = [row for row in rows if row['category'].startswith(category)]
+
+        if fmt == 'csv':
+            out = io.StringIO()
+            writer = csv.DictWriter(out, fieldnames=['category', 'marker', 'hits', 'hit_rate', 'in_database'])
+            writer.writeheader()
+            writer.writerows(rows)
+            return Response(out.getvalue(), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=marker_hits.csv'})
+        return jsonify({
+            'texts_analyzed': dict(texts),
+            'live_workers': workers,
+            'markers': rows,
+        })
@@ -0,0 +1,184 @@
+"""
+Marker Artifact
+Precompiled regex programs for the genericism database, built once at
+deploy time so workers skip regex compilation at startup
+
+Compiling the registry is dominated by Python's regex parser and compiler
+(about 0.3 s per 5,000 phrases). The artifact stores the compiled SRE
+program of every pattern the registry builds, keyed by (pattern, flags),
+and workers rebuild the pattern objects directly from those programs.
+The artifact is tied to the SHA-256 of the database file it was built
+from and to the interpreter's regex engine. When either differs, the
+artifact is stale and the registry is compiled from JSON instead. A pattern
+missing from the table is also compiled normally, so a stale or partial
+table can slow startup but never change results. The keyword scanner's
+matcher is one of these regexes, so there is no separate automaton to
+store, and the remaining lookup tables (sets and read-only dicts) rebuild
+from the JSON in milliseconds. benchmarks/artifact_benchmark.py
+measures the gain as the database grows.
+
+The file is a pickle: treat it like code and only load artifacts you built.
+
+Usage (from the backend directory, at build time):
+    python marker_artifact.py [--db genericism_database.json] [--output PATH]
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import _sre
+
+try:
+    from re import _compiler as sre_compile, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_compile
+    import sre_parse
+
+
+FORMAT_VERSION = 1
+
+ARTIFACT_SUFFIX = '.compiled'
+
+# One compiled pattern: (flags, code, groups, groupindex, indexgroup)
+Program = Tuple[int, List[int], int, Dict[str, int], tuple]
+
+
+def artifact_path_for(db_path: str) -> str:
+    """Default artifact location: next to the database, e.g. genericism_database.compiled"""
+    return os.path.splitext(db_path)[0] + ARTIFACT_SUFFIX
+
+
+def runtime_tag() -> str:
+    """Identifies the regex engine the stored programs are valid for"""
+    return f'{sys.implementation.cache_tag}:{_sre.MAGIC}:{_sre.CODESIZE}'
+
+
+def source_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PatternRecorder:
+    """re.compile replacement that also records each compiled program"""
+
+    def __init__(self):
+        self.programs: Dict[Tuple[str, int], Program] = {}
+
+    def compile(self, pattern: str, flags: int = 0) -> re.Pattern:
+        tree = sre_parse.parse(pattern, flags)
+        code = sre_compile._code(tree, flags)
+        groupindex = dict(tree.state.groupdict)
+        indexgroup = [None] * tree.state.groups
+        for name, index in groupindex.items():
+            indexgroup[index] = name
+        program = (flags | tree.state.flags, code, tree.state.groups - 1, groupindex, tuple(indexgroup))
+        self.programs[(pattern, flags)] = program
+        return _from_program(pattern, program)
+
+    def pack(self) -> Tuple[list, array]:
+        """
+        Serializable form: one entry per pattern plus all programs' code
+        concatenated in a single array, which pickles far faster than a
+        list per pattern
+        """
+        entries = []
+        code = array(_code_typecode())
+        for (pattern, in_flags), (flags, program_code, groups, groupindex, indexgroup) in self.programs.items():
+            entries.append((pattern, in_flags, flags, len(code), len(code) + len(program_code),
+                            groups, groupindex, indexgroup))
+            code.extend(program_code)
+        return entries, code
+
+
+class PatternTable:
+    """re.compile replacement that rebuilds patterns from stored programs"""
+
+    def __init__(self, entries: list, code: array):
+        self.code = code
+        self.entries = {(entry[0], entry[1]): entry[2:] for entry in entries}
+        self.misses = 0
+
+    def compile(self, pattern: str, flags: int = 0) -> re.Pattern:
+        entry = self.entries.get((pattern, flags))
+        if entry is None:
+            self.misses += 1
+            return re.compile(pattern, flags)
+        final_flags, start, end, groups, groupindex, indexgroup = entry
+        return _sre.compile(pattern, final_flags, self.code[start:end].tolist(), groups, groupindex, indexgroup)
+
+
+def _code_typecode() -> str:
+    return 'I' if _sre.CODESIZE == 4 else 'H'
+
+
+def _from_program(pattern: str, program: Program) -> re.Pattern:
+    flags, code, groups, groupindex, indexgroup = program
+    return _sre.compile(pattern, flags, code, groups, groupindex, indexgroup)
+
+
+def write(artifact_path: str, digest: str, version: str, recorder: PatternRecorder) -> None:
+    """Write an artifact atomically (readers never see a partial file)"""
+    entries, code = recorder.pack()
+    payload = {
+        'format': FORMAT_VERSION,
+        'runtime': runtime_tag(),
+        'source_sha256': digest,
+        'version': version,
+        'entries': entries,
+        'code': code,
+    }
+    tmp_path = f'{artifact_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, artifact_path)
+
+
+def load(artifact_path: str, digest: str) -> Optional[PatternTable]:
+    """
+    Load the pattern table if the artifact matches the database content and runtime
+
+    Returns None when the artifact is missing, unreadable or stale.
+    """
+    try:
+        with open(artifact_path, 'rb') as f:
+            payload = pickle.load(f)
+    except Exception:
+        # Missing, truncated, or written by an incompatible version of this module
+        return None
+    if (not isinstance(payload, dict) or payload.get('format') != FORMAT_VERSION
+            or payload.get('runtime') != runtime_tag() or payload.get('source_sha256') != digest):
+        return None
+    return PatternTable(payload['entries'], payload['code'])
+
+
+def build(db_path: str, artifact_path: Optional[str] = None) -> str:
+    """Compile a database file and write its artifact; returns the artifact path"""
+    from marker_registry import MarkerRegistry
+
+    artifact_path = artifact_path or artifact_path_for(db_path)
+    with open(db_path, 'rb') as f:
+        data = f.read()
+    recorder = PatternRecorder()
+    registry = MarkerRegistry.from_bytes(data, compile_pattern=recorder.compile)
+    write(artifact_path, source_digest(data), registry.version, recorder)
+    return artifact_path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='genericism_database.json', help='marker database JSON file')
+    parser.add_argument('--output', help=f'artifact path (default: the database path with {ARTIFACT_SUFFIX})')
+    args = parser.parse_args()
+
+    artifact_path = build(args.db, args.output)
+    print(f'Wrote {artifact_path} ({os.path.getsize(artifact_path)} bytes)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Marker Registry
+Loads and compiles the genericism database once per process, and swaps in
+a recompiled version when the file changes
+
+Registries are immutable. A reload compiles a complete new registry off the
+request path (in the watcher thread) and then replaces the current one with
+a single reference assignment; subscribers (app.py's engine set) are called
+with it so they can rebuild their views before the swap becomes visible to
+them. A file that fails to load or compile leaves the current version in
+place. Each registry's `version` is a hash of its content.
+
+Regexes are rebuilt from the precompiled artifact next to the file (see
+marker_artifact.py) when it matches the file's content, and compiled from
+the JSON otherwise.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from structure_rule_engine import StructureRuleEngine
+from keyword_scanner import KeywordScanner
+import marker_artifact
+import metrics
+import regex_cost
+
+
+logger = logging.getLogger('marker_registry')
+
+# Phrase categories matched as literal, case-insensitive substrings
+PHRASE_CATEGORIES = ('high_frequency', 'academic_clichés', 'generic_openers')
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only equivalents"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class MarkerRegistry:
+    """Immutable, compiled view of the genericism database shared by all engines"""
+
+    def __init__(self, db: Dict, source_path: str = None, source_stat: Tuple[int, int] = None,
+                 compile_pattern: Callable[[str, int], re.Pattern] = re.compile,
+                 cost_policy: Optional[str] = None):
+        """
+        Compile every matcher derived from the database
+
+        compile_pattern is re.compile, or a replacement serving precompiled
+        patterns (marker_artifact.PatternTable) or recording them for an
+        artifact build (marker_artifact.PatternRecorder). cost_policy
+        overrides REGEX_COST_POLICY for expensive formulaic patterns.
+        """
+        self.source_path = source_path
+        # (mtime_ns, size) of the file this was loaded from, for change detection
+        self.source_stat = source_stat
+        # 'artifact' when regexes came from a precompiled artifact, else 'json'
+        self.compiled_from = 'json'
+
+        # Pre-serialized payload for /api/markers (same encoding as jsonify)
+        self.markers_json = json.dumps(
+            db, ensure_ascii=True, sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')
+        self.etag = hashlib.sha256(self.markers_json).hexdigest()[:32]
+        self.version = self.etag[:16]
+
+        self.db = _freeze(db)
+        ai_markers = self.db['ai_markers']
+        voice_markers = self.db['voice_preservation_markers']
+
+        # AI-ism matchers
+        self.phrase_patterns = MappingProxyType({
+            category: tuple(
+                (phrase, compile_pattern(re.escape(phrase), re.IGNORECASE))
+                for phrase in ai_markers[category]
+            )
+            for category in PHRASE_CATEGORIES
+        })
+        self.transition_patterns = tuple(
+            (transition, compile_pattern(r'\b' + re.escape(transition) + r'\b', re.IGNORECASE))
+            for transition in ai_markers['transition_abuse']
+        )
+        self.formulaic_patterns = tuple(
+            compile_pattern(pattern, re.IGNORECASE)
+            for pattern in ai_markers['formulaic_structures']
+        )
+        # Worst-case cost on adversarial sentences; raises ValueError for dangerous patterns under 'reject'
+        self.formulaic_costs = tuple(regex_cost.validate(self.formulaic_patterns, on_danger=cost_policy))
+        self.formulaic_matcher = regex_cost.ProfiledPatterns(self.formulaic_patterns)
+        self.hedging_qualifiers = frozenset(ai_markers['hedging_qualifiers'])
+
+        # L2 voice matchers
+        self.structure_engine = StructureRuleEngine(voice_markers.get('structure_rules', ()), compile_pattern)
+        self.voice_marker_scanner = self._build_voice_marker_scanner(compile_pattern)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, **kwargs) -> 'MarkerRegistry':
+        """Compile a database from its UTF-8 JSON encoding"""
+        return cls(json.loads(data.decode('utf-8')), **kwargs)
+
+    @classmethod
+    def from_file(cls, db_path: str, artifact_path: Optional[str] = None,
+                  cost_policy: Optional[str] = None) -> 'MarkerRegistry':
+        """
+        Load and compile a database file
+
+        Patterns come from the artifact (default: next to the file) when it
+        was built from this exact content; otherwise they are compiled.
+        """
+        with open(db_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        artifact_path = artifact_path or marker_artifact.artifact_path_for(db_path)
+        table = marker_artifact.load(artifact_path, marker_artifact.source_digest(data))
+        if table is None:
+            if os.path.exists(artifact_path):
+                logger.warning('Ignoring stale marker artifact %s; compiling %s', artifact_path, db_path)
+            return cls.from_bytes(data, source_path=os.path.abspath(db_path), source_stat=_stat_key(stat),
+                                  cost_policy=cost_policy)
+        registry = cls.from_bytes(data, source_path=os.path.abspath(db_path), source_stat=_stat_key(stat),
+                                  compile_pattern=table.compile, cost_policy=cost_policy)
+        registry.compiled_from = 'artifact'
+        return registry
+
+    def _build_voice_marker_scanner(self, compile_pattern: Callable[[str, int], re.Pattern]) -> KeywordScanner:
+        """Build one keyword scanner over cultural metaphors and L1 interference markers"""
+        entries = []
+
+        for group in self.db['voice_preservation_markers'].get('cultural_metaphor_keywords', ()):
+            for keyword in group['keywords']:
+                entries.append((keyword, {
+                    'kind': 'cultural',
+                    'marker': keyword,
+                    'type': group['type'],
+                    'cultural_value': group['cultural_value']
+                }))
+
+        for lang, markers in self.db['ai_markers']['l2_interference_markers'].items():
+            for marker in markers:
+                entries.append((marker, {
+                    'kind': 'l1_interference',
+                    'marker': marker,
+                    'l1_language': lang
+                }))
+
+        return KeywordScanner(entries, compile_pattern=compile_pattern)
+
+
+def _stat_key(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_mtime_ns, stat.st_size
+
+
+_registries: Dict[str, MarkerRegistry] = {}
+_registries_lock = threading.Lock()
+_listeners: Dict[str, List[Callable[[MarkerRegistry], None]]] = {}
+_reload_lock = threading.Lock()
+
+# Watched files (path -> poll interval) and the watcher threads of this process
+_watched: Dict[str, float] = {}
+_watchers: Dict[str, 'RegistryWatcher'] = {}
+
+
+def get_registry(db_path: str = 'genericism_database.json') -> MarkerRegistry:
+    """
+    Return the current registry for a database file, loading it on first use
+
+    Call this (or preload) in the gunicorn master with preload_app enabled so
+    forked workers share the compiled registry copy-on-write. There is no
+    previous version to fall back to, so expensive formulaic patterns are
+    logged and kept whatever REGEX_COST_POLICY says.
+    """
+    key = os.path.abspath(db_path)
+    registry = _registries.get(key)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(key)
+            if registry is None:
+                registry = MarkerRegistry.from_file(db_path, cost_policy=regex_cost.FLAG)
+                _registries[key] = registry
+                metrics.record_marker_db_load('initial')
+                logger.info('Loaded %s: version %s (compiled from %s)',
+                            key, registry.version, registry.compiled_from)
+    return registry
+
+
+def preload(db_path: str = 'genericism_database.json') -> MarkerRegistry:
+    """Load the registry ahead of traffic (alias of get_registry)"""
+    return get_registry(db_path)
+
+
+def subscribe(db_path: str, callback: Callable[[MarkerRegistry], None]) -> None:
+    """Call callback(new_registry) from the reloading thread whenever the file is reloaded"""
+    _listeners.setdefault(os.path.abspath(db_path), []).append(callback)
+
+
+def reload(db_path: str = 'genericism_database.json') -> Optional[MarkerRegistry]:
+    """
+    Recompile the database file and swap it in if its content changed
+
+    Returns the new registry, or None when the content is unchanged.
+    Raises the load or compile error and keeps the current registry when
+    the file is invalid.
+    """
+    key = os.path.abspath(db_path)
+    with _reload_lock:
+        current = get_registry(db_path)
+        registry = MarkerRegistry.from_file(db_path)
+        if registry.version == current.version:
+            # e.g. the file was touched or rewritten unchanged; remember its new stat only
+            current.source_stat = registry.source_stat
+            return None
+        for callback in _listeners.get(key, ()):
+            callback(registry)
+        _registries[key] = registry
+        metrics.record_marker_db_load('reload')
+        logger.info('Reloaded %s: version %s -> %s (compiled from %s)',
+                    key, current.version, registry.version, registry.compiled_from)
+        return registry
+
+
+class RegistryWatcher(threading.Thread):
+    """Polls a database file's mtime and size and reloads it when they change"""
+
+    def __init__(self, db_path: str, interval: float):
+        super().__init__(name=f'marker-db-watcher:{os.path.basename(db_path)}', daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.pid = os.getpid()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        last_failed = None
+        while not self._stop_event.wait(self.interval):
+            try:
+                stat = _stat_key(os.stat(self.db_path))
+            except OSError:
+                # Mid-replace (or deleted): keep serving the current version
+                continue
+            if stat == get_registry(self.db_path).source_stat or stat == last_failed:
+                continue
+            try:
+                reload(self.db_path)
+                last_failed = None
+            except Exception as e:
+                # Partial write or invalid content: retry once the file changes again
+                last_failed = stat
+                logger.warning('Keeping marker database version %s; reloading %s failed: %s',
+                               get_registry(self.db_path).version, self.db_path, e)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def watch(db_path: str = 'genericism_database.json', interval: float = 2.0) -> None:
+    """Reload the database file whenever it changes (polled every `interval` seconds)"""
+    _watched[os.path.abspath(db_path)] = interval
+    start_watchers()
+
+
+def start_watchers() -> None:
+    """
+    Start a watcher for every watched file in this process
+
+    Threads do not survive fork(), so gunicorn's post_fork hook calls this
+    in each worker (after stop_watchers() in the master).
+    """
+    for key, interval in _watched.items():
+        watcher = _watchers.get(key)
+        if watcher is not None and watcher.pid == os.getpid() and watcher.is_alive():
+            continue
+        watcher = _watchers[key] = RegistryWatcher(key, interval)
+        watcher.start()
+
+
+def stop_watchers() -> None:
+    """Stop this process's watcher threads, e.g. in the gunicorn master before forking"""
+    for key, watcher in list(_watchers.items()):
+        if watcher.pid == os.getpid():
+            watcher.stop()
+            watcher.join()
+        del _watchers[key]
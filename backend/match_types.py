@@ -0,0 +1,253 @@
+"""
+Match Types
+Compact containers for marker matches, expanded to JSON only when serialized
+
+Engines keep matches in parallel integer arrays with interned labels, and
+constant fields (rule or keyword payloads) are referenced by index instead
+of being copied into one tuple or dict per hit. A container is a handful
+of objects however many matches it holds. Every type implements
+__json__(), which response_encoding's JSON provider calls to produce the
+public shape.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Mapping, Tuple
+
+
+class _LabelledMatches:
+    """Parallel integer columns plus one interned label column"""
+
+    __slots__ = ('labels', '_label_ids', 'label_ids')
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self._label_ids: Dict[str, int] = {}
+        self.label_ids = array('l')
+
+    def _intern(self, label: str) -> int:
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def __len__(self) -> int:
+        return len(self.label_ids)
+
+    def __bool__(self) -> bool:
+        return len(self.label_ids) > 0
+
+
+class SpanMatches(_LabelledMatches):
+    """(start, end, label) character-span matches"""
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self):
+        super().__init__()
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def add(self, start: int, end: int, label: str) -> None:
+        self.starts.append(start)
+        self.ends.append(end)
+        self.label_ids.append(self._intern(label))
+
+    def add_matches(self, matches, label: str, offset: int = 0) -> int:
+        """Add every re.Match of an iterator under one label; returns the count added"""
+        label_id = self._intern(label)
+        added = 0
+        for m in matches:
+            self.starts.append(offset + m.start())
+            self.ends.append(offset + m.end())
+            self.label_ids.append(label_id)
+            added += 1
+        return added
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        labels = self.labels
+        return ((s, e, labels[i]) for s, e, i in zip(self.starts, self.ends, self.label_ids))
+
+    def spans(self) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, label) of every match, for span_index"""
+        return iter(self)
+
+    def __json__(self) -> List[Tuple[int, int, str]]:
+        return list(self)
+
+
+class PositionMatches(_LabelledMatches):
+    """
+    (position, label) matches, e.g. sentence or word index and its text
+
+    The character span of each match is kept alongside (start -1 when
+    unknown) for span_index; it is not part of the JSON shape.
+    """
+
+    __slots__ = ('positions', 'starts', 'ends')
+
+    def __init__(self):
+        super().__init__()
+        self.positions = array('l')
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def add(self, position: int, label: str, start: int = -1, end: int = -1) -> None:
+        self.positions.append(position)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.label_ids.append(self._intern(label))
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        labels = self.labels
+        return ((p, labels[i]) for p, i in zip(self.positions, self.label_ids))
+
+    def spans(self) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, label) of every match with a known span"""
+        labels = self.labels
+        return ((s, e, labels[i]) for s, e, i in zip(self.starts, self.ends, self.label_ids) if s >= 0)
+
+    def __json__(self) -> List[Tuple[int, str]]:
+        return list(self)
+
+
+class StructureMatches(_LabelledMatches):
+    """
+    Sentences matched by L2 structure rules
+
+    Labels are the matched sentences; each hit stores the index of its rule
+    in the shared rule table, whose constants fill in the JSON shape, and
+    the sentence's character span (start -1 when unknown).
+    """
+
+    __slots__ = ('rules', 'rule_ids', '_rule_index', 'rule_indexes', 'starts', 'ends')
+
+    def __init__(self, rules: Mapping[str, Mapping]):
+        super().__init__()
+        self.rules = rules
+        self.rule_ids = list(rules)
+        self._rule_index = {rule_id: i for i, rule_id in enumerate(self.rule_ids)}
+        self.rule_indexes = array('l')
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def add(self, rule_id: str, sentence: str, start: int = -1, end: int = -1) -> None:
+        self.rule_indexes.append(self._rule_index[rule_id])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.label_ids.append(self._intern(sentence))
+
+    def sentences(self) -> Iterator[str]:
+        labels = self.labels
+        return (labels[i] for i in self.label_ids)
+
+    def spans(self) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, rule_id) of every match with a known span"""
+        rule_ids = self.rule_ids
+        return ((s, e, rule_ids[r]) for s, e, r in zip(self.starts, self.ends, self.rule_indexes) if s >= 0)
+
+    def __iter__(self) -> Iterator[Tuple[Mapping, str]]:
+        rules, rule_ids, labels = self.rules, self.rule_ids, self.labels
+        return ((rules[rule_ids[r]], labels[i]) for r, i in zip(self.rule_indexes, self.label_ids))
+
+    def __json__(self) -> List[Dict]:
+        structures = []
+        for rule, sentence in self:
+            structure = {
+                'type': rule['type'],
+                'rule_id': rule['id'],
+                'sentence': sentence,
+                'preservation_value': rule['preservation_value']
+            }
+            if rule.get('reason'):
+                structure['reason'] = rule['reason']
+            structures.append(structure)
+        return structures
+
+
+class KeywordMatches(_LabelledMatches):
+    """
+    Voice-marker keyword hits (see keyword_scanner)
+
+    Labels are the context snippets; each hit stores its span and the index
+    of its scanner payload, which supplies the constant fields.
+    """
+
+    __slots__ = ('payloads', '_payload_index', 'payload_indexes', 'starts', 'ends')
+
+    def __init__(self):
+        super().__init__()
+        self.payloads: List[Mapping] = []
+        self._payload_index: Dict[int, int] = {}
+        self.payload_indexes = array('l')
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def add(self, payload: Mapping, start: int, end: int, context: str) -> None:
+        index = self._payload_index.get(id(payload))
+        if index is None:
+            index = self._payload_index[id(payload)] = len(self.payloads)
+            self.payloads.append(payload)
+        self.payload_indexes.append(index)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.label_ids.append(self._intern(context))
+
+    def contexts(self) -> Iterator[str]:
+        labels = self.labels
+        return (labels[i] for i in self.label_ids)
+
+    def hit_payloads(self) -> Iterator[Mapping]:
+        payloads = self.payloads
+        return (payloads[p] for p in self.payload_indexes)
+
+    def spans(self) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, marker) of every hit"""
+        payloads = self.payloads
+        return ((s, e, payloads[p]['marker']) for s, e, p in zip(self.starts, self.ends, self.payload_indexes))
+
+    def __iter__(self) -> Iterator[Tuple[Mapping, int, int, str]]:
+        payloads, labels = self.payloads, self.labels
+        return (
+            (payloads[p], s, e, labels[i])
+            for p, s, e, i in zip(self.payload_indexes, self.starts, self.ends, self.label_ids)
+        )
+
+    def __json__(self) -> List[Dict]:
+        return [self._expand(*hit) for hit in self]
+
+    def _expand(self, payload: Mapping, start: int, end: int, context: str) -> Dict:
+        raise NotImplementedError
+
+
+class CulturalReferences(KeywordMatches):
+    """Cultural metaphor occurrences"""
+
+    __slots__ = ()
+
+    def _expand(self, payload: Mapping, start: int, end: int, context: str) -> Dict:
+        return {
+            'type': payload['type'],
+            'marker': payload['marker'],
+            'start': start,
+            'end': end,
+            'context': context,
+            'cultural_value': payload['cultural_value']
+        }
+
+
+class L1TransferMarkers(KeywordMatches):
+    """L1 interference occurrences (authentic voice, not error)"""
+
+    __slots__ = ()
+
+    def _expand(self, payload: Mapping, start: int, end: int, context: str) -> Dict:
+        return {
+            'l1_language': payload['l1_language'],
+            'marker': payload['marker'],
+            'start': start,
+            'end': end,
+            'context': context,
+            'authenticity_indicator': 'Shows genuine L1 influence',
+            'preservation_recommendation': 'PROTECT - This is authentic voice'
+        }
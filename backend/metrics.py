@@ -0,0 +1,209 @@
+"""
+Metrics
+Prometheus request, input-size, cache, marker-database and pattern-cost metrics for /metrics
+
+Uses prometheus_client, which is optional: without it every recording
+function is a no-op and /metrics answers 503. Under gunicorn, set
+PROMETHEUS_MULTIPROC_DIR to an empty, writable directory so each worker
+writes its samples there and /metrics aggregates all workers
+(gunicorn.conf.py empties it at startup and retires exited workers).
+"""
+
+import os
+import time
+from typing import Optional
+
+from flask import Flask, Response, g, jsonify, request
+
+try:
+    import prometheus_client
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+    )
+except ImportError:
+    prometheus_client = None
+
+
+# Latency buckets (seconds): interactive calls are sub-second, long documents take tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Input-size buckets (words across the request's text fields)
+WORD_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+# Coarse size classes labelling the latency histogram, so latency can be read per document size
+SIZE_CLASSES = ((1000, 'lt_1k'), (10000, '1k_10k'), (100000, '10k_100k'))
+LARGEST_SIZE_CLASS = 'ge_100k'
+
+# Seconds spent waiting for an admission slot
+ADMISSION_WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Request fields holding analyzed text
+TEXT_FIELDS = ('text', 'original', 'edited')
+
+
+if prometheus_client is not None:
+    REQUESTS = Counter(
+        'writing_defense_requests_total', 'HTTP requests by endpoint, method and status',
+        ['endpoint', 'method', 'status']
+    )
+    LATENCY = Histogram(
+        'writing_defense_request_duration_seconds', 'Request latency by endpoint and input size class',
+        ['endpoint', 'size_class'], buckets=LATENCY_BUCKETS
+    )
+    INPUT_WORDS = Histogram(
+        'writing_defense_request_input_words', 'Words in the analyzed text fields of a request',
+        ['endpoint'], buckets=WORD_BUCKETS
+    )
+    CACHE_LOOKUPS = Counter(
+        'writing_defense_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)',
+        ['cache', 'result']
+    )
+    MARKER_DB_LOADS = Counter(
+        'writing_defense_marker_db_loads_total', 'Marker database loads (initial or reload)',
+        ['kind']
+    )
+    FORMULAIC_PATTERN_SECONDS = Counter(
+        'writing_defense_formulaic_pattern_seconds_total',
+        'Time spent matching sentences against each formulaic_structures pattern', ['pattern']
+    )
+    FORMULAIC_PATTERN_SENTENCES = Counter(
+        'writing_defense_formulaic_pattern_sentences_total',
+        'Sentences matched against each formulaic_structures pattern', ['pattern']
+    )
+    FORMULAIC_PATTERN_MATCHES = Counter(
+        'writing_defense_formulaic_pattern_matches_total',
+        'Sentences each formulaic_structures pattern matched', ['pattern']
+    )
+    COALESCED = Counter(
+        'writing_defense_coalesced_requests_total',
+        'Duplicate requests answered from a concurrent identical request, by scope (local or shared)',
+        ['scope']
+    )
+    # Each worker adds its own waiting / admitted requests; livesum totals the live workers
+    ADMISSION_QUEUE = Gauge(
+        'writing_defense_admission_queue_depth', 'Requests waiting for an admission slot, by pool',
+        ['pool'], multiprocess_mode='livesum'
+    )
+    ADMISSION_IN_FLIGHT = Gauge(
+        'writing_defense_admission_in_flight', 'Requests holding an admission slot, by pool',
+        ['pool'], multiprocess_mode='livesum'
+    )
+    ADMISSION_REJECTIONS = Counter(
+        'writing_defense_admission_rejections_total', 'Requests rejected by admission control',
+        ['pool', 'reason']
+    )
+    ADMISSION_WAIT = Histogram(
+        'writing_defense_admission_wait_seconds', 'Time queued requests waited for a slot',
+        ['pool'], buckets=ADMISSION_WAIT_BUCKETS
+    )
+
+
+def size_class(words: int) -> str:
+    for limit, name in SIZE_CLASSES:
+        if words < limit:
+            return name
+    return LARGEST_SIZE_CLASS
+
+
+def request_words() -> int:
+    """Words in the text fields of the current JSON request (0 when there are none)"""
+    if request.method != 'POST' or not request.is_json:
+        return 0
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return 0
+    return sum(len(data[f].split()) for f in TEXT_FIELDS if isinstance(data.get(f), str))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count one lookup in a named cache"""
+    if prometheus_client is not None:
+        CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_marker_db_load(kind: str = 'initial') -> None:
+    """Count a marker database load ('initial' or 'reload')"""
+    if prometheus_client is not None:
+        MARKER_DB_LOADS.labels(kind).inc()
+
+
+def record_formulaic_pattern(pattern: str, seconds: float, sentences: int, matches: int) -> None:
+    """Add one text's matching time, sentences and matches for a formulaic_structures pattern"""
+    if prometheus_client is not None:
+        FORMULAIC_PATTERN_SECONDS.labels(pattern).inc(seconds)
+        FORMULAIC_PATTERN_SENTENCES.labels(pattern).inc(sentences)
+        if matches:
+            FORMULAIC_PATTERN_MATCHES.labels(pattern).inc(matches)
+
+
+def record_coalesced(scope: str) -> None:
+    """Count a duplicate request served by a concurrent leader ('local' worker or 'shared' across workers)"""
+    if prometheus_client is not None:
+        COALESCED.labels(scope).inc()
+
+
+def change_admission_queue(pool: str, delta: int) -> None:
+    """Track this worker's requests waiting in an admission pool's queue"""
+    if prometheus_client is not None:
+        ADMISSION_QUEUE.labels(pool).inc(delta)
+
+
+def change_admission_in_flight(pool: str, delta: int) -> None:
+    """Track this worker's requests holding an admission slot"""
+    if prometheus_client is not None:
+        ADMISSION_IN_FLIGHT.labels(pool).inc(delta)
+
+
+def record_admission_rejected(pool: str, reason: str) -> None:
+    """Count a request rejected by admission control ('queue_full' or 'queue_timeout')"""
+    if prometheus_client is not None:
+        ADMISSION_REJECTIONS.labels(pool, reason).inc()
+
+
+def observe_admission_wait(pool: str, seconds: float) -> None:
+    """Record how long an admitted request waited in the queue"""
+    if prometheus_client is not None:
+        ADMISSION_WAIT.labels(pool).observe(seconds)
+
+
+def render() -> Optional[bytes]:
+    """Text exposition of every metric, aggregated across workers in multiprocess mode"""
+    if prometheus_client is None:
+        return None
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def init_app(app: Flask) -> None:
+    """Record request metrics for every endpoint and serve them at /metrics"""
+
+    @app.before_request
+    def _start_clock() -> None:
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response: Response) -> Response:
+        started = g.pop('metrics_started', None)
+        if prometheus_client is None or started is None:
+            return response
+        # The route pattern, not the path, keeps label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if endpoint == '/metrics':
+            return response
+        words = request_words()
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        LATENCY.labels(endpoint, size_class(words)).observe(time.perf_counter() - started)
+        if words:
+            INPUT_WORDS.labels(endpoint).observe(words)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus text exposition format"""
+        body = render()
+        if body is None:
+            return jsonify({'error': 'Metrics require prometheus_client'}), 503
+        return Response(body, content_type=CONTENT_TYPE_LATEST)
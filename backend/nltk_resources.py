@@ -0,0 +1,52 @@
+"""
+NLTK Resource Setup
+Verifies (and, at build time, downloads) the NLTK data the engines need
+"""
+
+import sys
+from typing import List
+
+import nltk
+
+
+# (nltk.data path, downloader id); punkt_tab is required by NLTK >= 3.8.2
+REQUIRED_RESOURCES = [
+    ('tokenizers/punkt', 'punkt'),
+    ('tokenizers/punkt_tab', 'punkt_tab'),
+    ('corpora/stopwords', 'stopwords'),
+]
+
+
+def missing_resources() -> List[str]:
+    """Return downloader ids of required resources that are not installed"""
+    missing = []
+    for path, resource_id in REQUIRED_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(resource_id)
+    return missing
+
+
+def ensure_nltk_data(download: bool = False) -> List[str]:
+    """
+    Check for required NLTK data, optionally downloading what is missing
+
+    Downloading is meant for build steps (Dockerfile, setup.sh), never for the
+    request path. Returns the ids that are still missing afterwards.
+    """
+    missing = missing_resources()
+    if download:
+        for resource_id in missing:
+            nltk.download(resource_id, quiet=True)
+        missing = missing_resources()
+    return missing
+
+
+if __name__ == '__main__':
+    still_missing = ensure_nltk_data(download=True)
+    # punkt_tab only exists for newer NLTK releases; punkt alone is enough for older ones
+    if [r for r in still_missing if r != 'punkt_tab']:
+        print(f"Missing NLTK data: {', '.join(still_missing)}", file=sys.stderr)
+        sys.exit(1)
+    print("NLTK data ready")
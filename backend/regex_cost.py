@@ -0,0 +1,254 @@
+"""
+Regex Cost
+Worst-case validation and runtime profiling of the user-editable
+formulaic_structures patterns
+
+Every pattern is matched against each sentence of every analyzed text, so a
+single pattern with catastrophic backtracking stalls every worker. When a
+registry is compiled, each pattern is fuzzed with adversarial sentences
+(runs of its own literal words, characters and separators, ending in a
+character that forces a failed match) of growing length, up to
+MAX_SENTENCE_CHARS. A pattern is dangerous when one match exceeds the limit,
+or when its match time grows so fast between lengths that the next length
+would exceed it many times over. An input is only judged on the best of
+TIMING_REPEATS timings, so a GC pause or a stalled CPU does not make a safe
+pattern dangerous. Dangerous patterns make a reloaded database invalid
+(REGEX_COST_POLICY=reject, the default), so the hot reload keeps the current
+version, or are only logged (REGEX_COST_POLICY=flag). The initial load has
+no version to keep, so it always logs and keeps the patterns.
+
+At runtime, ProfiledPatterns matches one pattern at a time over all of a
+text's sentences, and records the time, sentences and matches per pattern
+with a single clock read per pattern.
+
+Usage (from the backend directory):
+    python regex_cost.py [--db genericism_database.json] [--limit-ms 25]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import metrics
+
+
+logger = logging.getLogger('regex_cost')
+
+# Longest single match allowed on an adversarial sentence (REGEX_COST_LIMIT_MS; 0 disables checks)
+DEFAULT_LIMIT_MS = 25.0
+
+# Longest adversarial sentence; longer than nearly any real sentence
+MAX_SENTENCE_CHARS = 4000
+
+# Timings per suspicious input; the fastest is the one judged
+TIMING_REPEATS = 3
+
+REJECT = 'reject'
+FLAG = 'flag'
+
+# A match this fraction of the limit that grows faster than this factor is projected to blow up
+_PROJECTION_FLOOR = 0.1
+_PROJECTION_FACTOR = 4
+
+_ESCAPE = re.compile(r'\\.')
+_WORD = re.compile(r'[A-Za-z]{2,}')
+
+
+def limit_seconds() -> float:
+    return float(os.environ.get('REGEX_COST_LIMIT_MS', DEFAULT_LIMIT_MS)) / 1000
+
+
+def policy() -> str:
+    value = os.environ.get('REGEX_COST_POLICY', REJECT)
+    if value not in (REJECT, FLAG):
+        raise ValueError(f'REGEX_COST_POLICY must be {REJECT!r} or {FLAG!r}, not {value!r}')
+    return value
+
+
+class PatternCost:
+    """Worst-case match time of one pattern on adversarial input"""
+
+    __slots__ = ('pattern', 'worst_seconds', 'worst_input_chars', 'reason')
+
+    def __init__(self, pattern: str, worst_seconds: float, worst_input_chars: int,
+                 reason: Optional[str] = None):
+        self.pattern = pattern
+        self.worst_seconds = worst_seconds
+        self.worst_input_chars = worst_input_chars
+        # Why the pattern is dangerous, or None when it is safe
+        self.reason = reason
+
+    @property
+    def dangerous(self) -> bool:
+        return self.reason is not None
+
+    def as_dict(self) -> dict:
+        return {
+            'pattern': self.pattern,
+            'worst_ms': round(self.worst_seconds * 1000, 3),
+            'worst_input_chars': self.worst_input_chars,
+            'dangerous': self.dangerous,
+            'reason': self.reason,
+        }
+
+
+def _literal_words(source: str, limit: int = 6) -> List[str]:
+    """Distinct literal words of a pattern, e.g. 'The', 'context' from '^(The|This) ... (context)'"""
+    words = []
+    for word in _WORD.findall(_ESCAPE.sub(' ', source)):
+        if word not in words:
+            words.append(word)
+    return words[:limit]
+
+
+def adversarial_sentences(words: Sequence[str], length: int, rng: random.Random) -> Iterator[Tuple[str, str]]:
+    """
+    (family, sentence) pairs of about `length` characters
+
+    Each family repeats something the pattern may consume and ends in '!',
+    which no formulaic pattern expects, so backtracking patterns try every
+    split of the run before failing.
+    """
+    yield 'letters', 'a' * length + '!'
+    yield 'spaces', ' ' * length + '!'
+    yield 'letter_space', 'a ' * (length // 2) + '!'
+    yield 'punctuation', ', ' * (length // 2) + '!'
+    for word in words:
+        yield f'word:{word}', (word + ' ') * max(1, length // (len(word) + 1)) + '!'
+    if words:
+        phrase = ' '.join(words) + ' '
+        yield 'phrase', phrase * max(1, length // len(phrase)) + '!'
+        yield 'prefixed', words[0] + ' ' + 'a ' * (length // 2) + '!'
+        vocabulary = list(words) + ['a', 'the', ',', '.']
+        tokens, chars = [], 0
+        while chars < length:
+            tokens.append(rng.choice(vocabulary))
+            chars += len(tokens[-1]) + 1
+        yield 'random', ' '.join(tokens) + '!'
+
+
+def measure(pattern: re.Pattern, limit: float, max_chars: int = MAX_SENTENCE_CHARS) -> PatternCost:
+    """Fuzz pattern.match with adversarial sentences of growing length"""
+    words = _literal_words(pattern.pattern)
+    rng = random.Random(0)
+    worst, worst_chars = 0.0, 0
+    previous = {}
+    length = 8
+
+    while True:
+        for family, sentence in adversarial_sentences(words, length, rng):
+            elapsed = _time_match(pattern, sentence)
+            if elapsed > limit * _PROJECTION_FLOOR:
+                # Suspicious: time it again so a single stall cannot condemn the pattern
+                for _ in range(TIMING_REPEATS - 1):
+                    elapsed = min(elapsed, _time_match(pattern, sentence))
+            if elapsed > worst:
+                worst, worst_chars = elapsed, len(sentence)
+            if elapsed > limit:
+                return PatternCost(pattern.pattern, worst, worst_chars,
+                                   f'{elapsed * 1000:.1f} ms on a {len(sentence)}-character {family} input')
+            prior, prior_chars = previous.get(family, (0.0, 0))
+            if (prior and elapsed > limit * _PROJECTION_FLOOR
+                    and elapsed * (elapsed / prior) > limit * _PROJECTION_FACTOR):
+                # Stop before the next length runs for seconds
+                return PatternCost(pattern.pattern, worst, worst_chars,
+                                   f'match time on {family} input grows {elapsed / prior:.0f}x '
+                                   f'from {prior_chars} to {len(sentence)} characters')
+            previous[family] = (elapsed, len(sentence))
+        if length >= max_chars:
+            return PatternCost(pattern.pattern, worst, worst_chars)
+        length = min(max_chars, max(length + 2, length * 5 // 4))
+
+
+def _time_match(pattern: re.Pattern, sentence: str) -> float:
+    started = time.perf_counter()
+    pattern.match(sentence)
+    return time.perf_counter() - started
+
+
+def validate(patterns: Sequence[re.Pattern], limit: Optional[float] = None,
+             on_danger: Optional[str] = None) -> List[PatternCost]:
+    """
+    Measure every pattern and apply the policy to dangerous ones
+
+    Returns: one PatternCost per pattern (empty when the limit is 0)
+    Raises: ValueError naming the dangerous patterns under the reject policy
+    """
+    limit = limit_seconds() if limit is None else limit
+    if limit <= 0:
+        return []
+    on_danger = on_danger or policy()
+
+    costs = [measure(pattern, limit) for pattern in patterns]
+    dangerous = [cost for cost in costs if cost.dangerous]
+    if dangerous:
+        details = '; '.join(f'{cost.pattern!r}: {cost.reason}' for cost in dangerous)
+        if on_danger == REJECT:
+            raise ValueError(f'formulaic_structures patterns exceed the regex cost limit: {details}')
+        logger.warning('Expensive formulaic_structures patterns kept (policy %s): %s', on_danger, details)
+    return costs
+
+
+class ProfiledPatterns:
+    """Anchored patterns matched against sentences, with per-pattern cost and hit counters"""
+
+    def __init__(self, patterns: Sequence[re.Pattern]):
+        self.patterns = tuple(patterns)
+
+    def count_matches(self, sentences: Sequence[str], pattern_matches: Optional[List[int]] = None) -> List[int]:
+        """
+        Number of patterns whose match() succeeds on each sentence
+
+        pattern_matches, when given, is a list aligned with self.patterns
+        incremented by the sentences each pattern matched.
+        """
+        counts = [0] * len(sentences)
+        if not sentences:
+            return counts
+        for p, pattern in enumerate(self.patterns):
+            match = pattern.match
+            matches = 0
+            started = time.perf_counter()
+            for i, sentence in enumerate(sentences):
+                if match(sentence):
+                    counts[i] += 1
+                    matches += 1
+            metrics.record_formulaic_pattern(pattern.pattern, time.perf_counter() - started,
+                                             len(sentences), matches)
+            if pattern_matches is not None:
+                pattern_matches[p] += matches
+        return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='genericism_database.json', help='marker database JSON file')
+    parser.add_argument('--limit-ms', type=float, default=DEFAULT_LIMIT_MS,
+                        help='longest allowed match on an adversarial sentence')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    with open(args.db, 'r', encoding='utf-8') as f:
+        sources = json.load(f)['ai_markers']['formulaic_structures']
+    costs = validate([re.compile(source, re.IGNORECASE) for source in sources],
+                     limit=args.limit_ms / 1000, on_danger=FLAG)
+
+    if args.json:
+        print(json.dumps([cost.as_dict() for cost in costs], indent=2))
+    else:
+        print(f"{'worst ms':>10}{'chars':>8}  pattern")
+        for cost in sorted(costs, key=lambda c: -c.worst_seconds):
+            print(f'{cost.worst_seconds * 1000:>10.3f}{cost.worst_input_chars:>8}  {cost.pattern}')
+            if cost.dangerous:
+                print(f"{'':>18}  DANGEROUS: {cost.reason}")
+    return 1 if any(cost.dangerous for cost in costs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
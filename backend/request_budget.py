@@ -0,0 +1,99 @@
+"""
+Request Budget
+Input-size and estimated-memory budgets checked before any analysis runs
+
+Each analysis request's peak memory is estimated from the characters in its
+text fields. Requests over MAX_INPUT_CHARS, or whose estimate exceeds the
+memory budget even in chunked mode, are rejected with 413. Requests that fit
+the budget only in chunked mode are downgraded to it, overriding
+"chunked": false. Nothing is started, so an oversized paste costs a JSON
+parse instead of an OOM-killed worker.
+
+The per-character factors are peak tracemalloc bytes per input character
+(original + edited) of a full audit of synthetic essays: about 57-63 in
+whole-text mode and 32-40 in chunked mode, where span lists and diffs still
+grow with the document. Check them against the 'memory' field of the
+stage-timing log (MEMORY_ACCOUNTING=1) on real traffic.
+"""
+
+from typing import Optional
+
+from flask import Flask, g, jsonify, request
+
+
+# Estimated peak bytes per input character in whole-text and chunked mode
+DEFAULT_WHOLE_BYTES_PER_CHAR = 64
+DEFAULT_CHUNKED_BYTES_PER_CHAR = 40
+
+# Request fields holding analyzed text
+TEXT_FIELDS = ('text', 'original', 'edited')
+
+
+class RequestBudget:
+    """Decides whether a request fits, must run chunked, or is rejected"""
+
+    def __init__(self, max_input_chars: int = 0, memory_bytes: int = 0,
+                 whole_bytes_per_char: float = DEFAULT_WHOLE_BYTES_PER_CHAR,
+                 chunked_bytes_per_char: float = DEFAULT_CHUNKED_BYTES_PER_CHAR):
+        """Zero disables the corresponding limit"""
+        self.max_input_chars = max_input_chars
+        self.memory_bytes = memory_bytes
+        self.whole_bytes_per_char = whole_bytes_per_char
+        self.chunked_bytes_per_char = chunked_bytes_per_char
+
+    def estimate(self, chars: int, chunked: bool) -> int:
+        """Estimated peak bytes of analyzing `chars` input characters"""
+        factor = self.chunked_bytes_per_char if chunked else self.whole_bytes_per_char
+        return int(chars * factor)
+
+    def check(self, chars: int) -> Optional[bool]:
+        """
+        Budget decision for a request with `chars` input characters
+
+        Returns: None when the request fits as requested, True when it must
+        run in chunked mode
+        Raises: ValueError when it exceeds the budget in any mode
+        """
+        if self.max_input_chars and chars > self.max_input_chars:
+            raise ValueError(f'Input of {chars} characters exceeds the limit of {self.max_input_chars}')
+        if not self.memory_bytes or self.estimate(chars, chunked=False) <= self.memory_bytes:
+            return None
+        if self.estimate(chars, chunked=True) <= self.memory_bytes:
+            return True
+        raise ValueError(
+            f'Input of {chars} characters exceeds the per-request memory budget '
+            f'({self.memory_bytes // (1024 * 1024)} MiB, estimated '
+            f'{self.estimate(chars, chunked=True) // (1024 * 1024)} MiB in chunked mode)'
+        )
+
+
+def request_chars() -> int:
+    """Characters in the text fields of the current JSON request (0 when there are none)"""
+    if request.method != 'POST' or not request.is_json:
+        return 0
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return 0
+    return sum(len(data[f]) for f in TEXT_FIELDS if isinstance(data.get(f), str))
+
+
+def force_chunked() -> bool:
+    """Whether the budget downgraded the current request to chunked mode"""
+    return g.get('budget_force_chunked', False)
+
+
+def init_app(app: Flask, budget: RequestBudget) -> None:
+    """Check every POST request against the budget before its view runs (no-op without limits)"""
+    if not budget.max_input_chars and not budget.memory_bytes:
+        return
+
+    @app.before_request
+    def _check_budget():
+        chars = request_chars()
+        if not chars:
+            return None
+        try:
+            g.budget_force_chunked = bool(budget.check(chars))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
+        return None
@@ -0,0 +1,266 @@
+"""
+Request Coalescing
+Single-flight execution of identical concurrent analysis requests
+
+Requests are keyed by a hash of the marker database version, the endpoint
+and the canonical JSON body, so texts and options (fields, change_mode, ...)
+must all match, and a request arriving after a hot reload never receives a
+body computed with the previous database. The first
+request with a key computes; identical requests that arrive while it runs
+wait for its response body instead of recomputing. Only successful JSON
+responses are shared. When the leader fails, or a wait times out, waiters
+compute on their own.
+
+Within a worker, waiters block on an Event. With a shared directory
+(ideally on tmpfs, e.g. /dev/shm), the leader also holds an flock on
+`<key>.lock` there, and writes the body to `<key>.body` when it finishes.
+Waiters in other workers poll for that file. A dead leader's lock is
+released by the kernel, and a waiter then takes over as leader.
+"""
+
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+import metrics
+
+
+# Longest a duplicate waits for the leader before computing itself (seconds)
+DEFAULT_WAIT_TIMEOUT = 60.0
+
+# Only JSON analysis endpoints are coalesced
+DEFAULT_PATH_PREFIXES = ('/analyze/',)
+
+# Polling interval bounds while waiting on another worker (seconds)
+_MIN_POLL = 0.002
+_MAX_POLL = 0.05
+
+# Shared-directory files untouched for this long are swept by leaders (seconds)
+_SHARED_FILE_TTL = 300
+_SWEEP_EVERY = 256
+
+
+class Flight:
+    """One in-progress computation in this worker; body is None when it failed"""
+
+    __slots__ = ('event', 'body')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.body: Optional[bytes] = None
+
+
+class Leadership:
+    """Held by the request that computes a key (and, when shared, its flock)"""
+
+    __slots__ = ('key', 'flight', 'fd')
+
+    def __init__(self, key: str, flight: Flight, fd: Optional[int] = None):
+        self.key = key
+        self.flight = flight
+        self.fd = fd
+
+
+class Coalescer:
+    """Single-flight table for one worker, optionally extended across workers"""
+
+    def __init__(self, shared_dir: Optional[str] = None, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.shared_dir = shared_dir
+        self.wait_timeout = wait_timeout
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self._finished = 0
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    @staticmethod
+    def key(path: str, data: Dict, version: str = '') -> str:
+        """Hash of the marker database version, the endpoint and the canonical request body"""
+        canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(f'{version}\n{path}\n{canonical}'.encode('utf-8')).hexdigest()
+
+    def join(self, key: str) -> Tuple[Optional[bytes], Optional[Leadership]]:
+        """
+        Join the flight for a key
+
+        Returns: (body, None) when another request computed it, (None,
+        leadership) when the caller must compute and then finish(), or
+        (None, None) when the caller should compute without sharing
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            if flight.event.wait(self.wait_timeout) and flight.body is not None:
+                metrics.record_coalesced('local')
+                return flight.body, None
+            return None, None
+
+        leadership = Leadership(key, flight)
+        if self.shared_dir:
+            body, leadership.fd = self._join_shared(key)
+            if body is not None:
+                # Another worker computed it; hand the body to this worker's waiters too
+                self._complete(leadership, body)
+                metrics.record_coalesced('shared')
+                return body, None
+        return None, leadership
+
+    def finish(self, leadership: Leadership, body: Optional[bytes]) -> None:
+        """Publish the leader's response body (None when it failed) and wake waiters"""
+        if leadership.fd is not None:
+            try:
+                if body is not None:
+                    path = self._path(leadership.key, '.body')
+                    tmp_path = f'{path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(body)
+                    os.replace(tmp_path, path)
+            finally:
+                os.close(leadership.fd)
+                leadership.fd = None
+        self._complete(leadership, body)
+
+    def _complete(self, leadership: Leadership, body: Optional[bytes]) -> None:
+        with self._lock:
+            self._flights.pop(leadership.key, None)
+            self._finished += 1
+            sweep = self.shared_dir and self._finished % _SWEEP_EVERY == 0
+        leadership.flight.body = body
+        leadership.flight.event.set()
+        if sweep:
+            self._sweep()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.shared_dir, key + suffix)
+
+    def _try_lock(self, key: str) -> Optional[int]:
+        fd = os.open(self._path(key, '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _join_shared(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        """
+        Lead the key across workers, or wait for the worker leading it
+
+        Returns: (body, None) when another worker finished first, (None, fd)
+        when this worker now holds the lock, (None, None) on timeout
+        """
+        body_path = self._path(key, '.body')
+        # Bodies of earlier flights are stale: only accept one written after this point
+        waiting_since = time.time()
+
+        def fresh_body() -> Optional[bytes]:
+            try:
+                if os.stat(body_path).st_mtime >= waiting_since:
+                    with open(body_path, 'rb') as f:
+                        return f.read()
+            except FileNotFoundError:
+                pass
+            return None
+
+        fd = self._try_lock(key)
+        if fd is not None:
+            return None, fd
+
+        deadline = time.monotonic() + self.wait_timeout
+        poll = _MIN_POLL
+        while time.monotonic() < deadline:
+            time.sleep(poll)
+            poll = min(poll * 2, _MAX_POLL)
+            body = fresh_body()
+            if body is not None:
+                return body, None
+            fd = self._try_lock(key)
+            if fd is not None:
+                # The leader may have published between the two checks
+                body = fresh_body()
+                if body is not None:
+                    os.close(fd)
+                    return body, None
+                # Otherwise it released its lock without publishing (it failed or died)
+                return None, fd
+        return None, None
+
+    def _sweep(self) -> None:
+        """Remove shared files of keys not seen for _SHARED_FILE_TTL seconds (never a held lock)"""
+        cutoff = time.time() - _SHARED_FILE_TTL
+        for path in glob.glob(os.path.join(self.shared_dir, '*')):
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                if not path.endswith('.lock'):
+                    os.remove(path)
+                    continue
+                fd = os.open(path, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(path)
+                except BlockingIOError:
+                    pass
+                finally:
+                    os.close(fd)
+            except FileNotFoundError:
+                pass
+
+
+def init_app(app: Flask, coalescer: Optional[Coalescer],
+             current_version: Callable[[], str] = lambda: '',
+             path_prefixes: tuple = DEFAULT_PATH_PREFIXES) -> None:
+    """
+    Coalesce identical concurrent POST requests (no-op without a coalescer)
+
+    current_version returns the marker database version the engines serving
+    the request use; it is part of the key.
+
+    Register before admission control so waiting duplicates do not take
+    execution slots. Shared bodies are captured before compression, so each
+    waiter is still encoded for its own Accept-Encoding.
+    """
+    if coalescer is None:
+        return
+
+    @app.before_request
+    def _join_flight():
+        if request.method != 'POST' or not request.path.startswith(path_prefixes):
+            return None
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return None
+        body, leadership = coalescer.join(Coalescer.key(request.path, data, current_version()))
+        if body is not None:
+            response = Response(body, mimetype='application/json')
+            response.headers['X-Coalesced'] = '1'
+            return response
+        if leadership is not None:
+            g.coalesce_leadership = leadership
+        return None
+
+    @app.after_request
+    def _publish(response: Response) -> Response:
+        leadership = g.pop('coalesce_leadership', None)
+        if leadership is not None:
+            shareable = (response.status_code == 200 and not response.direct_passthrough
+                         and response.mimetype == 'application/json')
+            coalescer.finish(leadership, response.get_data() if shareable else None)
+        return response
+
+    @app.teardown_request
+    def _abandon(exc: Optional[BaseException]) -> None:
+        leadership = g.pop('coalesce_leadership', None)
+        if leadership is not None:
+            coalescer.finish(leadership, None)
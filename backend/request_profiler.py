@@ -0,0 +1,304 @@
+"""
+Request Profiler
+On-demand profiling of live requests, stored as artifacts keyed by request id
+
+A request is profiled when it carries the admin header (X-Profile set to
+PROFILE_TOKEN) or, with PROFILE_SAMPLE_EVERY=N, when it is the N-th
+profiled-path request of the worker. Two profilers are available:
+
+- cprofile: deterministic cProfile of the request thread, saved as pstats
+  (`<id>.prof`, open with `python -m pstats` or snakeviz)
+- sample: a background thread samples the request thread's stack every
+  PROFILE_INTERVAL_MS, saved as collapsed stacks (`<id>.folded`, input
+  for flamegraph.pl or speedscope)
+
+Artifacts go to PROFILE_DIR with a `<id>.json` metadata file; only the
+newest PROFILE_RETENTION profiles are kept. The id is the client's
+X-Request-ID plus a random suffix, so requests that reuse an id never
+overwrite each other's artifacts. At most one request per worker is
+profiled at a time, since cProfile cannot nest; others run unprofiled.
+"""
+
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from flask import Flask, Response, g, jsonify, request, send_file
+
+
+PROFILERS = ('cprofile', 'sample')
+
+# Profiles kept in the profile directory (oldest removed first)
+DEFAULT_RETENTION = 50
+
+# Sampling interval of the stack sampler
+DEFAULT_INTERVAL_MS = 5.0
+
+# Only analysis and report requests are profiled
+DEFAULT_PATH_PREFIXES = ('/analyze/', '/generate-report')
+
+ADMIN_HEADER = 'X-Profile'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+ARTIFACT_SUFFIXES = {'pstats': '.prof', 'collapsed': '.folded'}
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+_PROFILE_ID = re.compile(r'^[A-Za-z0-9_.-]{1,80}$')
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text: one 'frame;frame;... count' line per distinct stack"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Profile artifacts on disk, keyed by request id, with a retention limit"""
+
+    def __init__(self, directory: str, retention: int = DEFAULT_RETENTION):
+        self.directory = directory
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, profile_id: str, suffix: str) -> Optional[str]:
+        """Path of an artifact, or None for invalid ids"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, profile_id: str, meta: Dict, profiler: Optional[cProfile.Profile] = None,
+             collapsed: Optional[str] = None) -> None:
+        """Write the artifacts and metadata of one profile, then apply the retention limit"""
+        if profiler is not None:
+            profiler.dump_stats(self.path(profile_id, ARTIFACT_SUFFIXES['pstats']))
+        if collapsed is not None:
+            with open(self.path(profile_id, ARTIFACT_SUFFIXES['collapsed']), 'w', encoding='utf-8') as f:
+                f.write(collapsed)
+        # Metadata last: a profile is listed only once its artifacts are complete
+        tmp_path = self.path(profile_id, '.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path(profile_id, '.json'))
+        self.prune()
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Pruned by another worker, or still being written
+                continue
+        profiles.sort(key=lambda meta: meta.get('started', 0), reverse=True)
+        return profiles
+
+    def prune(self) -> None:
+        """Remove the oldest profiles beyond the retention limit"""
+        for meta in self.list()[self.retention:]:
+            profile_id = meta['id']
+            for suffix in ('.json', *ARTIFACT_SUFFIXES.values()):
+                try:
+                    os.remove(self.path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class RequestProfiler:
+    """Decides which requests to profile and runs the selected profiler around them"""
+
+    def __init__(self, store: ProfileStore, token: Optional[str] = None, sample_every: int = 0,
+                 profiler: str = 'cprofile', interval_ms: float = DEFAULT_INTERVAL_MS,
+                 path_prefixes: tuple = DEFAULT_PATH_PREFIXES):
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of: {', '.join(PROFILERS)}")
+        self.store = store
+        self.token = token
+        self.sample_every = sample_every
+        self.profiler = profiler
+        self.interval = interval_ms / 1000
+        self.path_prefixes = path_prefixes
+        self._counter = itertools.count(1)
+        # cProfile cannot run two profiles at once; only one request per worker is profiled
+        self._busy = threading.Lock()
+
+    def is_admin(self) -> bool:
+        """Whether the current request carries the admin token"""
+        supplied = request.headers.get(ADMIN_HEADER)
+        return bool(self.token and supplied and hmac.compare_digest(supplied, self.token))
+
+    def trigger(self) -> Optional[str]:
+        """Why the current request should be profiled ('header' or 'sampled'), or None"""
+        if not request.path.startswith(self.path_prefixes):
+            return None
+        if self.is_admin():
+            return 'header'
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return 'sampled'
+        return None
+
+    def begin(self, trigger: str) -> bool:
+        """Start profiling the current request; False when another profile is running"""
+        if not self._busy.acquire(blocking=False):
+            return False
+        supplied_id = request.headers.get(REQUEST_ID_HEADER, '')
+        request_id = supplied_id if _REQUEST_ID.match(supplied_id) else None
+        suffix = uuid.uuid4().hex
+        g.profile = {
+            # Server-generated suffix: a client may send the same request id concurrently
+            'id': f'{request_id}-{suffix[:12]}' if request_id else suffix,
+            'request_id': request_id,
+            'trigger': trigger,
+            'started': time.time(),
+            'clock': time.perf_counter(),
+        }
+        if self.profiler == 'cprofile':
+            g.profile['profiler'] = profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            g.profile['sampler'] = sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+        return True
+
+    def end(self, response: Optional[Response]) -> Optional[str]:
+        """Stop profiling and store the artifacts; returns the profile id"""
+        state = g.pop('profile', None)
+        if state is None:
+            return None
+        try:
+            profiler = state.get('profiler')
+            sampler = state.get('sampler')
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+
+            meta = {
+                'id': state['id'],
+                'request_id': state['request_id'],
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code if response is not None else 500,
+                'trigger': state['trigger'],
+                'profiler': self.profiler,
+                'started': state['started'],
+                'duration_ms': round((time.perf_counter() - state['clock']) * 1000, 3),
+                'request_bytes': request.content_length or 0,
+                'pid': os.getpid(),
+                'artifacts': ['pstats'] if profiler is not None else ['collapsed'],
+            }
+            if sampler is not None:
+                meta['samples'] = sampler.samples
+            self.store.save(state['id'], meta, profiler=profiler,
+                            collapsed=sampler.collapsed() if sampler is not None else None)
+            return state['id']
+        finally:
+            self._busy.release()
+
+
+def init_app(app: Flask, profile_dir: Optional[str] = None, token: Optional[str] = None,
+             sample_every: int = 0, retention: int = DEFAULT_RETENTION, profiler: str = 'cprofile',
+             interval_ms: float = DEFAULT_INTERVAL_MS) -> Optional[RequestProfiler]:
+    """
+    Profile requests selected by the admin header or by sampling, and serve
+    stored profiles at /api/profiles (admin token required)
+
+    Nothing is registered unless a token or a sampling rate is configured.
+    Register after other request hooks so the profile wraps the view only.
+    """
+    if not token and sample_every <= 0:
+        return None
+
+    store = ProfileStore(profile_dir or os.path.join(os.getcwd(), 'profiles'), retention)
+    request_profiler = RequestProfiler(store, token, sample_every, profiler, interval_ms)
+
+    @app.before_request
+    def _start_profile() -> None:
+        trigger = request_profiler.trigger()
+        if trigger is not None:
+            request_profiler.begin(trigger)
+
+    @app.after_request
+    def _store_profile(response: Response) -> Response:
+        profile_id = request_profiler.end(response)
+        if profile_id is not None:
+            response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc: Optional[BaseException]) -> None:
+        # after_request is skipped when the view raises; still stop and store the profile
+        if 'profile' in g:
+            request_profiler.end(None)
+
+    @app.route('/api/profiles', methods=['GET'])
+    def list_profiles():
+        """Metadata of stored profiles, newest first (admin token required)"""
+        if not request_profiler.is_admin():
+            return jsonify({'error': f'{ADMIN_HEADER} admin token required'}), 403
+        return jsonify({'profiles': store.list()})
+
+    @app.route('/api/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        """
+        Download a profile artifact (admin token required)
+
+        Query parameters: format (pstats | collapsed; default: the one stored)
+        """
+        if not request_profiler.is_admin():
+            return jsonify({'error': f'{ADMIN_HEADER} admin token required'}), 403
+        fmt = request.args.get('format')
+        formats = [fmt] if fmt else list(ARTIFACT_SUFFIXES)
+        if any(f not in ARTIFACT_SUFFIXES for f in formats):
+            return jsonify({'error': f"format must be one of: {', '.join(ARTIFACT_SUFFIXES)}"}), 400
+        for f in formats:
+            path = store.path(profile_id, ARTIFACT_SUFFIXES[f])
+            if path is not None and os.path.exists(path):
+                mimetype = 'text/plain' if f == 'collapsed' else 'application/octet-stream'
+                return send_file(path, mimetype=mimetype, as_attachment=True,
+                                 download_name=os.path.basename(path))
+        return jsonify({'error': 'Unknown profile id or format'}), 404
+
+    return request_profiler
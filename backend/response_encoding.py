@@ -0,0 +1,171 @@
+"""
+Response Encoding
+Fast JSON serialization and negotiated compression for API responses
+
+orjson is used for JSON when it is installed (the stdlib encoder otherwise),
+and JSON responses above a size threshold are compressed with brotli or gzip
+according to the client's Accept-Encoding. Both libraries are optional.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Responses smaller than this are sent uncompressed
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+
+# gzip level and brotli quality: fast settings suited to per-request compression
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+# Compressed bodies of responses with a strong ETag (e.g. /api/markers), by (etag, encoding)
+_ETAG_CACHE_SIZE = 16
+_etag_cache: 'OrderedDict[tuple, bytes]' = OrderedDict()
+_etag_cache_lock = threading.Lock()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes with orjson when available
+
+    Output is equivalent to the default provider (sorted keys, compact
+    separators, indentation in debug mode); compact result types are
+    expanded through their __json__() method and other types orjson cannot
+    encode natively go through Flask's default handler. Non-ASCII text is emitted
+    as UTF-8 rather than \\u escapes, and float exponents are written
+    without padding (1e-7 instead of 1e-07).
+    """
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        """Expand compact result types (match_types) before Flask's default handling"""
+        if hasattr(type(o), '__json__'):
+            return o.__json__()
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self, indent: bool) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _dump_bytes(self, obj: Any, indent: bool) -> Optional[bytes]:
+        """orjson-encoded bytes, or None when the stdlib encoder must be used"""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder handles them
+            return None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not kwargs or set(kwargs) <= {'indent', 'separators'}:
+            data = self._dump_bytes(obj, bool(kwargs.get('indent')))
+            if data is not None:
+                return data.decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._dump_bytes(obj, indent)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def available_encodings() -> list:
+    """Content codings this process can produce, in order of preference"""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def compress_body(data: bytes, encoding: str,
+                  gzip_level: int = DEFAULT_GZIP_LEVEL,
+                  brotli_quality: int = DEFAULT_BROTLI_QUALITY) -> bytes:
+    """Compress a response body with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0 keeps the output deterministic for identical bodies
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response: Response, min_size: int = DEFAULT_COMPRESS_MIN_BYTES,
+                      gzip_level: int = DEFAULT_GZIP_LEVEL,
+                      brotli_quality: int = DEFAULT_BROTLI_QUALITY) -> Response:
+    """
+    Compress a JSON response negotiated through Accept-Encoding
+
+    Compressed responses get a weak ETag, since the bytes differ from the
+    identity encoding while the content is the same; conditional requests
+    keep working because If-None-Match uses weak comparison.
+    """
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    encoding = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        key = (etag, encoding)
+        with _etag_cache_lock:
+            body = _etag_cache.get(key)
+            if body is not None:
+                _etag_cache.move_to_end(key)
+        metrics.record_cache('compressed_body', body is not None)
+        if body is None:
+            body = compress_body(data, encoding, gzip_level, brotli_quality)
+            with _etag_cache_lock:
+                _etag_cache[key] = body
+                while len(_etag_cache) > _ETAG_CACHE_SIZE:
+                    _etag_cache.popitem(last=False)
+        response.set_etag(etag, weak=True)
+    else:
+        body = compress_body(data, encoding, gzip_level, brotli_quality)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app: Flask, min_size: int = DEFAULT_COMPRESS_MIN_BYTES,
+             gzip_level: int = DEFAULT_GZIP_LEVEL,
+             brotli_quality: int = DEFAULT_BROTLI_QUALITY) -> None:
+    """Install the fast JSON provider and response compression on a Flask app"""
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(response: Response) -> Response:
+        return compress_response(response, min_size, gzip_level, brotli_quality)
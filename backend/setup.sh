@@ -24,7 +24,11 @@ python3 -m spacy download en_core_web_sm
 
 # Download NLTK data
 echo "Downloading NLTK data..."
-python3 -c "import nltk; nltk.download('punkt'); nltk.download('stopwords')"
+python3 nltk_resources.py
+
+# Precompile the marker database
+echo "Precompiling marker database..."
+python3 marker_artifact.py
 
 echo ""
 echo "✅ Setup complete!"
@@ -0,0 +1,267 @@
+"""
+Span Index
+Merged, sorted index of marker spans across categories with overlap queries
+
+All character spans of a result are merged into arrays sorted by start and
+augmented as an implicit interval tree (each node keeps the largest end in
+its subtree), so "which markers overlap [a, b)" costs O(log n + k).
+Indexes of recently analyzed documents are kept in a per-process LRU cache
+keyed by a content hash, for range queries without re-sending the text.
+With a shared directory, each index is also written there as
+`<document id>.<source>.json`, so a worker that did not analyze a document
+rebuilds its index from the file; files unused for `shared_ttl` seconds are
+swept.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Documents whose span indexes are kept in memory for range queries (per worker)
+DEFAULT_CACHE_DOCUMENTS = 64
+
+# Span index files shared by all workers on the host, and how long unused ones are kept
+DEFAULT_SHARED_DIR = os.path.join(tempfile.gettempdir(), 'writing_defense_spans')
+DEFAULT_SHARED_TTL = 3600.0
+
+# Shared files are swept once every this many puts
+_SWEEP_EVERY = 256
+
+# Subtrees at or below this level are scanned linearly
+_LEAF_LEVEL = 3
+
+
+class SpanIndex:
+    """
+    Sorted spans from several categories
+
+    Built from (category, spans) pairs where spans yields (start, end, label).
+    Serializes as {'categories': [...], 'spans': [[start, end, category_id, label], ...]}
+    with spans sorted by (start, end).
+    """
+
+    __slots__ = ('categories', 'labels', 'starts', 'ends', 'category_ids', 'label_ids',
+                 '_max_ends', '_max_level')
+
+    def __init__(self, categories: Iterable[Tuple[str, Iterable[Tuple[int, int, str]]]]):
+        self.categories: List[str] = []
+        self.labels: List[str] = []
+        label_index: Dict[str, int] = {}
+
+        rows = []
+        for category_id, (category, spans) in enumerate(categories):
+            self.categories.append(category)
+            for start, end, label in spans:
+                label_id = label_index.get(label)
+                if label_id is None:
+                    label_id = label_index[label] = len(self.labels)
+                    self.labels.append(label)
+                rows.append((start, end, category_id, label_id))
+        rows.sort()
+
+        self.starts = array('l', (r[0] for r in rows))
+        self.ends = array('l', (r[1] for r in rows))
+        self.category_ids = array('l', (r[2] for r in rows))
+        self.label_ids = array('l', (r[3] for r in rows))
+        self._max_ends = array('l', self.ends)
+        self._max_level = self._augment()
+
+    def _augment(self) -> int:
+        """
+        Store the largest end of each implicit-tree subtree in _max_ends
+
+        Node i sits at level k when its lowest k bits are 1 and bit k is 0;
+        its subtree covers [i - 2^k + 1, i + 2^k - 1]. Returns the root level.
+        """
+        n = len(self.starts)
+        if n == 0:
+            return -1
+        max_ends = self._max_ends
+
+        last_i = n - 1 if (n - 1) % 2 == 0 else n - 2
+        last = max_ends[last_i]
+        k = 1
+        while (1 << k) <= n:
+            x = 1 << (k - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                left = max_ends[i - x]
+                right = max_ends[i + x] if i + x < n else last
+                max_ends[i] = max(max_ends[i], left, right)
+            # Track the rightmost node at this level for the partial right edge
+            last_i = last_i - x if (last_i >> k) & 1 else last_i + x
+            if last_i < n and max_ends[last_i] > last:
+                last = max_ends[last_i]
+            k += 1
+        return k - 1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, start: int, end: int) -> List[Tuple[int, int, str, str]]:
+        """(start, end, category, label) of every span overlapping [start, end), in index order"""
+        n = len(self.starts)
+        if n == 0 or end <= start:
+            return []
+        starts, ends, max_ends = self.starts, self.ends, self._max_ends
+
+        found = []
+        stack = [(self._max_level, (1 << self._max_level) - 1, False)]
+        while stack:
+            k, x, left_done = stack.pop()
+            if k <= _LEAF_LEVEL:
+                i0 = x >> k << k
+                for i in range(i0, min(n, i0 + (1 << (k + 1)) - 1)):
+                    if starts[i] >= end:
+                        break
+                    if start < ends[i]:
+                        found.append(i)
+            elif not left_done:
+                # Revisit this node after its left subtree
+                stack.append((k, x, True))
+                y = x - (1 << (k - 1))
+                if y >= n or max_ends[y] > start:
+                    stack.append((k - 1, y, False))
+            elif x < n and starts[x] < end:
+                if start < ends[x]:
+                    found.append(x)
+                stack.append((k - 1, x + (1 << (k - 1)), False))
+
+        found.sort()
+        return [self._row(i) for i in found]
+
+    def _row(self, i: int) -> Tuple[int, int, str, str]:
+        return (self.starts[i], self.ends[i],
+                self.categories[self.category_ids[i]], self.labels[self.label_ids[i]])
+
+    def __json__(self) -> Dict:
+        labels = self.labels
+        return {
+            'categories': list(self.categories),
+            'spans': [
+                (s, e, c, labels[l])
+                for s, e, c, l in zip(self.starts, self.ends, self.category_ids, self.label_ids)
+            ]
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'SpanIndex':
+        """Rebuild an index from its __json__ form"""
+        spans: List[List[Tuple[int, int, str]]] = [[] for _ in data['categories']]
+        for start, end, category_id, label in data['spans']:
+            spans[category_id].append((start, end, label))
+        return cls(zip(data['categories'], spans))
+
+
+def document_id(text: str) -> str:
+    """Content hash identifying a document in the span cache"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+class SpanIndexCache:
+    """Thread-safe LRU of {source: SpanIndex} per document id, optionally backed by a shared directory"""
+
+    def __init__(self, max_documents: int = DEFAULT_CACHE_DOCUMENTS, shared_dir: Optional[str] = None,
+                 shared_ttl: float = DEFAULT_SHARED_TTL):
+        self.max_documents = max_documents
+        self.shared_dir = shared_dir
+        self.shared_ttl = shared_ttl
+        self._entries: 'OrderedDict[str, Dict[str, SpanIndex]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def put(self, doc_id: str, source: str, index: SpanIndex) -> None:
+        """Store the index one analysis (e.g. 'aitism') produced for a document"""
+        if self.max_documents <= 0:
+            return
+        self._remember(doc_id, {source: index})
+        if self.shared_dir:
+            path = self._path(doc_id, source)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index.__json__(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._puts += 1
+                sweep = self._puts % _SWEEP_EVERY == 0
+            if sweep:
+                self._sweep()
+
+    def get(self, doc_id: str) -> Optional[Dict[str, SpanIndex]]:
+        """{source: index} of a document, loading it from the shared directory on a local miss"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None:
+                self._entries.move_to_end(doc_id)
+                entry = dict(entry)
+        if not self.shared_dir or not doc_id.isalnum():
+            return entry
+
+        # Another worker may have analyzed the document, or only some of its sources
+        loaded = {}
+        for path in glob.glob(self._path(doc_id, '*')):
+            source = os.path.basename(path)[len(doc_id) + 1:-len('.json')]
+            if entry is not None and source in entry:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    loaded[source] = SpanIndex.from_json(json.load(f))
+                # Keep files in use from being swept
+                os.utime(path)
+            except (OSError, ValueError):
+                # Swept or replaced meanwhile
+                continue
+        if not loaded:
+            return entry
+        self._remember(doc_id, loaded)
+        return {**(entry or {}), **loaded}
+
+    def _remember(self, doc_id: str, indexes: Dict[str, SpanIndex]) -> None:
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                entry = self._entries[doc_id] = {}
+            self._entries.move_to_end(doc_id)
+            entry.update(indexes)
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+    def _path(self, doc_id: str, source: str) -> str:
+        return os.path.join(self.shared_dir, f'{doc_id}.{source}.json')
+
+    def _sweep(self) -> None:
+        """Remove shared index files unused for shared_ttl seconds"""
+        cutoff = time.time() - self.shared_ttl
+        for path in glob.glob(os.path.join(self.shared_dir, '*.json')):
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def query(self, doc_id: str, start: int, end: int) -> Optional[List[Dict]]:
+        """
+        Markers of every cached source overlapping [start, end), sorted by position
+
+        Returns None when the document is not cached in this process or
+        the shared directory.
+        """
+        entry = self.get(doc_id)
+        if entry is None:
+            return None
+        markers = []
+        for source, index in entry.items():
+            for s, e, category, label in index.overlapping(start, end):
+                markers.append({'start': s, 'end': e, 'source': source,
+                                'category': category, 'label': label})
+        markers.sort(key=lambda m: (m['start'], m['end']))
+        return markers
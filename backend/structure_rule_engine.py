@@ -0,0 +1,104 @@
+"""
+Structure Rule Engine
+Compiles declarative L2 sentence-structure rules into a single matcher
+"""
+
+import re
+from typing import Callable, List, Dict
+
+
+# Group references are numbered within one pattern, and the combined matcher renumbers groups
+def _uses_group_references(pattern: str) -> bool:
+    """
+    Whether a pattern contains a numbered backreference (e.g. \\1) or a group
+    conditional (e.g. (?(1)...)) outside character classes
+
+    Octal escapes such as \\101 are read as references too; use \\x41 instead.
+    """
+    i, n = 0, len(pattern)
+    in_class = False
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            if not in_class and i + 1 < n and pattern[i + 1] in '123456789':
+                return True
+            i += 2
+            continue
+        if in_class:
+            if c == ']':
+                in_class = False
+        elif c == '[':
+            in_class = True
+            # A ']' first in the class (after an optional '^') is a literal
+            i += 1
+            if pattern.startswith('^', i):
+                i += 1
+            if pattern.startswith(']', i):
+                i += 1
+            continue
+        elif pattern.startswith('(?(', i):
+            return True
+        i += 1
+    return False
+
+
+class StructureRuleEngine:
+    """Matches every structure rule against a sentence with one regex call"""
+
+    def __init__(self, rules: List[Dict], compile_pattern: Callable[[str, int], re.Pattern] = re.compile):
+        """
+        Compile structure rules from the genericism database
+
+        Each rule is a dict with:
+            id: identifier (letters, digits, underscores)
+            type: human-readable structure name reported in results
+            pattern: regular expression (case-insensitive, without named
+                groups or backreferences, whose group numbers would change
+                in the combined matcher)
+            anchor: 'start' to match at the sentence start, 'anywhere' to search
+            preservation_value: HIGH / MEDIUM / LOW
+            reason: optional explanation
+
+        compile_pattern is re.compile, or a replacement serving precompiled patterns.
+        """
+        self.rules = {}
+        parts = []
+
+        for rule in rules:
+            rule_id = rule['id']
+            if not rule_id.isidentifier() or rule_id in self.rules:
+                raise ValueError(f"Invalid or duplicate structure rule id: {rule_id!r}")
+
+            # Validate each pattern on its own so errors name the offending rule
+            try:
+                compiled = compile_pattern(rule['pattern'], re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Structure rule {rule_id!r} has an invalid pattern: {e}")
+            if compiled.groupindex:
+                raise ValueError(f"Structure rule {rule_id!r} must not use named groups")
+            if compiled.groups and _uses_group_references(rule['pattern']):
+                raise ValueError(f"Structure rule {rule_id!r} must not use backreferences")
+
+            self.rules[rule_id] = rule
+
+            # Each rule becomes an optional lookahead, so one match() call
+            # records every rule that fires without consuming the sentence.
+            # An 'anywhere' lookahead still scans the sentence from its start:
+            # the call saves per-rule Python overhead, not per-rule scanning
+            prefix = '' if rule.get('anchor') == 'start' else r'[\s\S]*?'
+            parts.append(f"(?:(?={prefix}(?P<{rule_id}>(?:{rule['pattern']}))))?")
+
+        self.matcher = compile_pattern(''.join(parts), re.IGNORECASE)
+        self.rule_ids = list(self.rules)
+
+    def match(self, sentence: str) -> List[str]:
+        """Return ids of all rules matching the sentence, in rule order"""
+        if not self.rule_ids:
+            return []
+
+        m = self.matcher.match(sentence)
+        return [rule_id for rule_id in self.rule_ids if m.group(rule_id) is not None]
+
+    def match_sentences(self, sentences: List[str]) -> List[List[str]]:
+        """Return matching rule ids for each sentence"""
+        return [self.match(sent) for sent in sentences]
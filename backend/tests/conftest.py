@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """app.py with the offline regex tokenizer, no database watcher and per-worker span indexes"""
+    os.environ.setdefault('TOKENIZER_BACKEND', 'regex')
+    os.environ.setdefault('MARKER_DB_POLL_SECONDS', '0')
+    os.environ.setdefault('SPAN_CACHE_DIR', '')
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,102 @@
+import fcntl
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+from admission_control import AdmissionPool, Saturated
+
+
+def make_pool(tmp_path, slots=1, queue_size=2, queue_timeout=5.0):
+    return AdmissionPool('test', slots=slots, queue_size=queue_size, queue_timeout=queue_timeout,
+                         lock_dir=str(tmp_path))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.01)
+
+
+def queue_forever(pool):
+    pool.acquire()
+    time.sleep(60)
+
+
+def test_free_slot_is_taken_at_once(tmp_path):
+    pool = make_pool(tmp_path)
+    slot = pool.acquire()
+    pool.release(slot)
+    assert pool.acquire() is not None
+
+
+def test_full_queue_and_timeout_are_rejected(tmp_path):
+    pool = make_pool(tmp_path, queue_size=0, queue_timeout=0.05)
+    slot = pool.acquire()
+    with pytest.raises(Saturated) as full:
+        pool.acquire()
+    assert (full.value.reason, full.value.status) == ('queue_full', 429)
+
+    pool = make_pool(tmp_path, queue_size=1, queue_timeout=0.05)
+    with pytest.raises(Saturated) as timed_out:
+        pool.acquire()
+    assert (timed_out.value.reason, timed_out.value.status) == ('queue_timeout', 503)
+    pool.release(slot)
+
+
+def test_newcomer_queues_behind_existing_waiters(tmp_path):
+    pool = make_pool(tmp_path, queue_size=1)
+    # Another worker's waiter: it holds the only ticket and the gate
+    ticket = os.open(pool.ticket_paths[0], os.O_RDWR | os.O_CREAT, 0o600)
+    gate = os.open(pool.gate_path, os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(ticket, fcntl.LOCK_EX)
+    fcntl.flock(gate, fcntl.LOCK_SH)
+    try:
+        # The slot is free, but taking it would overtake the waiter
+        with pytest.raises(Saturated) as e:
+            pool.acquire()
+        assert e.value.reason == 'queue_full'
+    finally:
+        os.close(gate)
+        os.close(ticket)
+    assert pool.acquire() is not None
+
+
+def test_killed_waiters_free_their_queue_places(tmp_path):
+    pool = make_pool(tmp_path, queue_size=2)
+    slot = pool.acquire()
+    context = multiprocessing.get_context('fork')
+    waiters = [context.Process(target=queue_forever, args=(pool,)) for _ in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    wait_for(lambda: pool.waiting() == 2)
+    with pytest.raises(Saturated, match='queue_full'):
+        pool.acquire()
+
+    for waiter in waiters:
+        os.kill(waiter.pid, signal.SIGKILL)
+        waiter.join()
+    # Their tickets and gate locks died with them; the depth counter is reconciled
+    assert pool.waiting() == 0
+    pool.release(slot)
+    assert pool.acquire() is not None
+
+
+def test_retry_after_grows_with_the_queue(tmp_path):
+    pool = make_pool(tmp_path, queue_size=4)
+    slot = pool.acquire()
+    time.sleep(0.01)
+    pool.release(slot)
+    pool._service_time.value = 2.0
+    assert pool.retry_after() == 2
+    pool._add_waiting(3)
+    gate = os.open(pool.gate_path, os.O_RDWR)
+    fcntl.flock(gate, fcntl.LOCK_SH)
+    try:
+        assert pool.waiting() == 3
+        assert pool.retry_after() == 8
+    finally:
+        os.close(gate)
@@ -0,0 +1,99 @@
+import difflib
+import random
+
+import pytest
+
+from change_estimator import (_banded_lcs_weight, approximate_matching_bounds,
+                              approximate_matching_characters, tokenize)
+
+
+def change_percentage(matching, original, edited):
+    return (1 - 2 * matching / (len(original) + len(edited))) * 100
+
+
+def exact_change_percentage(original, edited):
+    matcher = difflib.SequenceMatcher(None, original, edited, autojunk=False)
+    return change_percentage(sum(block.size for block in matcher.get_matching_blocks()), original, edited)
+
+
+def token_lcs_weight(original, edited):
+    """Unbanded weighted token LCS, the value the estimate is a lower bound of"""
+    ids = {}
+    a = [ids.setdefault(t, len(ids)) for t in tokenize(original)]
+    b_tokens = tokenize(edited)
+    b = [ids.setdefault(t, len(ids)) for t in b_tokens]
+    return _banded_lcs_weight(a, b, [len(t) for t in b_tokens], max(len(a), len(b)))
+
+
+class Corpus:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        letters = 'abcdefghijklmnopqrstuvwxyz'
+        self.vocabulary = [''.join(self.rng.choice(letters) for _ in range(self.rng.randint(2, 9)))
+                           for _ in range(300)]
+
+    def words(self, n):
+        return [self.rng.choice(self.vocabulary) for _ in range(n)]
+
+    def edit(self, words, rate):
+        """Substitute, delete and insert words, each at a fraction of the rate"""
+        edited = []
+        for word in words:
+            r = self.rng.random()
+            if r < rate / 2:
+                edited.append(self.rng.choice(self.vocabulary))
+            elif r < rate * 3 / 4:
+                continue
+            elif r < rate:
+                edited.extend([word, self.rng.choice(self.vocabulary)])
+            else:
+                edited.append(word)
+        return edited
+
+
+def bulk_insertion(corpus, words):
+    """A paragraph inserted mid-document, with light edits on both sides"""
+    base = corpus.words(words)
+    half = words // 2
+    edited = corpus.edit(base[:half], 0.01) + corpus.words(words // 10) + corpus.edit(base[half:], 0.01)
+    return ' '.join(base), ' '.join(edited)
+
+
+def bulk_deletion(corpus, words):
+    """Half of the second half removed, with light edits elsewhere"""
+    base = corpus.words(words)
+    edited = corpus.edit(base[:words // 2], 0.01) + corpus.edit(base[words // 2:3 * words // 4], 0.01)
+    return ' '.join(base), ' '.join(edited)
+
+
+def random_edits(corpus, words):
+    base = corpus.words(words)
+    return ' '.join(base), ' '.join(corpus.edit(base, 0.05))
+
+
+@pytest.mark.parametrize('make_pair', [bulk_insertion, bulk_deletion, random_edits])
+@pytest.mark.parametrize('seed', [0, 1])
+def test_estimate_tracks_exact_change_percentage(make_pair, seed):
+    original, edited = make_pair(Corpus(seed), 1200)
+    estimate = change_percentage(approximate_matching_characters(original, edited), original, edited)
+    # Only word granularity separates the two: an edited word counts as fully changed
+    assert estimate == pytest.approx(exact_change_percentage(original, edited), abs=1.5)
+
+
+@pytest.mark.parametrize('make_pair', [bulk_insertion, bulk_deletion, random_edits])
+def test_bounds_enclose_token_lcs(make_pair):
+    original, edited = make_pair(Corpus(2), 600)
+    low, high = approximate_matching_bounds(original, edited)
+    assert low <= token_lcs_weight(original, edited) <= high
+
+
+def test_narrow_band_still_anchors_bulk_changes():
+    original, edited = bulk_insertion(Corpus(3), 1200)
+    assert approximate_matching_characters(original, edited, band=4) == token_lcs_weight(original, edited)
+
+
+def test_identical_and_disjoint_texts():
+    text = 'The same words, twice over.\n\nAnd a second paragraph.'
+    assert approximate_matching_characters(text, text) == len(text)
+    assert approximate_matching_characters('alpha beta', 'gamma delta') == 0
+    assert approximate_matching_characters('', text) == 0
@@ -0,0 +1,63 @@
+import pytest
+
+from dual_text_comparator import DualTextComparator
+
+
+ORIGINAL = ('My family very very value education.  We study at night by the river.\n\n'
+            'Teachers in my village are elders. They guide us.')
+EDITED = ('My family deeply values education. We study at night near the river.\n\n'
+          'A new paragraph appears here.\n\n'
+          'Teachers in my village are respected elders. They guide us.')
+
+
+@pytest.fixture(scope='module')
+def comparator():
+    return DualTextComparator()
+
+
+def words_by_type(runs, original, edited):
+    """Expand compact runs into the (unchanged, deleted, added) word lists of the verbose format"""
+    unchanged, deleted, added = [], [], []
+    for tag, os_, oe, es, ee in runs:
+        if tag == 'equal':
+            assert original[os_:oe].split() == edited[es:ee].split()
+            unchanged += original[os_:oe].split()
+        else:
+            deleted += original[os_:oe].split()
+            added += edited[es:ee].split()
+    return unchanged, deleted, added
+
+
+def test_compact_runs_carry_the_verbose_diff(comparator):
+    verbose = comparator.compare_texts(ORIGINAL, EDITED)['detailed_diff']
+    compact = comparator.compare_texts(ORIGINAL, EDITED, diff_format='compact')
+    assert compact['diff_format'] == 'compact'
+
+    expected = tuple([d['word'] for d in verbose if d['type'] == kind] for kind in ('unchanged', 'deleted', 'added'))
+    assert words_by_type(compact['detailed_diff'], ORIGINAL, EDITED) == expected
+
+
+def test_compact_runs_tile_both_texts_in_order(comparator):
+    runs = comparator.compare_texts(ORIGINAL, EDITED, diff_format='compact')['detailed_diff']
+    assert {run[0] for run in runs} >= {'equal', 'replace', 'insert'}
+    for previous, run in zip(runs, runs[1:]):
+        assert previous[2] <= run[1] and previous[4] <= run[3]
+    # Whitespace between runs only
+    assert not ORIGINAL[runs[-1][2]:].strip() and not EDITED[runs[-1][4]:].strip()
+
+
+def test_chunked_compact_offsets_are_document_relative(comparator):
+    result = comparator.compare_texts_chunked(ORIGINAL, EDITED, max_chars=60, diff_format='compact')
+    unchanged, deleted, added = words_by_type(result['detailed_diff'], ORIGINAL, EDITED)
+    assert 'respected' in added and 'deeply' in added and 'near' in added
+    assert 'by' in deleted and 'Teachers' in unchanged
+
+
+def test_detailed_diff_is_only_built_when_requested(comparator):
+    result = comparator.compare_texts(ORIGINAL, EDITED, sections=['summary'])
+    assert 'detailed_diff' not in result and 'diff_format' not in result and 'visualization' not in result
+
+
+def test_unknown_diff_format_is_rejected(comparator):
+    with pytest.raises(ValueError, match='diff_format'):
+        comparator.compare_texts(ORIGINAL, EDITED, diff_format='html')
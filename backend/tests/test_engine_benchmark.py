@@ -0,0 +1,68 @@
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+@pytest.fixture(scope='module')
+def engine_benchmark():
+    # Run as a script, the benchmark imports its neighbours and changes into the backend directory
+    cwd = os.getcwd()
+    sys.path.insert(0, BENCHMARKS_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            'engine_benchmark', os.path.join(BENCHMARKS_DIR, 'engine_benchmark.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(BENCHMARKS_DIR)
+        os.chdir(cwd)
+    return module
+
+
+def report(calibration_ms, results):
+    return {'calibration_ms': calibration_ms, 'results': results}
+
+
+def test_compare_scales_by_calibration_and_gates_regressions(engine_benchmark):
+    baseline = report(5.0, {'aitism.detect_ai_markers': {'100': 4.0, '10000': 100.0}})
+    # A machine twice as slow: twice the times are no regression
+    slower_machine = report(10.0, {'aitism.detect_ai_markers': {'100': 8.0, '10000': 200.0}})
+    assert engine_benchmark.compare(slower_machine, baseline, 0.25, 2.0) == ([], [])
+
+    regressed = report(5.0, {'aitism.detect_ai_markers': {'100': 5.9, '10000': 130.0}})
+    regressions, missing = engine_benchmark.compare(regressed, baseline, 0.25, 2.0)
+    # +47% but under 2 ms is noise; +30% over 2 ms is a regression
+    assert len(regressions) == 1 and regressions[0].startswith('aitism.detect_ai_markers at 10000 words')
+    assert missing == []
+    assert engine_benchmark.compare(regressed, baseline, 0.25, 2.0, normalize=False)[0] == regressions
+
+
+def test_compare_reports_cases_without_a_baseline(engine_benchmark):
+    baseline = report(5.0, {'aitism.detect_ai_markers': {'100': 4.0}})
+    current = report(5.0, {'aitism.detect_ai_markers': {'100': 4.0, '1000': 9.0},
+                           'comparator.compare_texts': {'100': 1.0}})
+    regressions, missing = engine_benchmark.compare(current, baseline, 0.25, 2.0)
+    assert regressions == []
+    assert missing == ['aitism.detect_ai_markers at 1000 words', 'comparator.compare_texts at 100 words']
+
+
+def test_baseline_gates_every_engine_at_every_default_size(engine_benchmark):
+    with open(engine_benchmark.DEFAULT_BASELINE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    sizes = {str(words) for words in engine_benchmark.DEFAULT_SIZES}
+    assert set(baseline['results']) == set(engine_benchmark.ENGINES)
+    assert all(set(results) == sizes for results in baseline['results'].values())
+
+
+def test_run_times_every_engine_in_the_baseline_format(engine_benchmark):
+    result = engine_benchmark.run([100], list(engine_benchmark.ENGINES), 0.2, 0.3, seed=0, rounds=1,
+                                  case_seconds=1.0, tokenizer_backend='regex')
+    assert result['calibration_ms'] > 0
+    assert set(result['results']) == set(engine_benchmark.ENGINES)
+    assert all(list(sizes) == ['100'] and sizes['100'] > 0 for sizes in result['results'].values())
@@ -0,0 +1,69 @@
+import pytest
+
+from field_selection import parse_fields, select_fields, subfields, top_level, wants
+
+
+ORIGINAL = 'My family very very value education. We study at night by the river.'
+EDITED = 'Furthermore, my family deeply values education. It is evident that we study at night.'
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields('') is None and parse_fields([' ']) is None
+    assert parse_fields('summary, text_comparison.summary') == ['summary', 'text_comparison.summary']
+    assert parse_fields(['ai_ism_score']) == ['ai_ism_score']
+    with pytest.raises(ValueError):
+        parse_fields({'summary': True})
+    with pytest.raises(ValueError):
+        parse_fields(['summary', 3])
+
+
+def test_wants_matches_ancestors_and_descendants():
+    fields = ['summary.overall_score', 'text_comparison']
+    assert wants(None, 'anything')
+    assert wants(fields, 'summary') and wants(fields, 'summary.overall_score')
+    assert wants(fields, 'text_comparison.detailed_diff')
+    assert not wants(fields, 'summary.risk_level') and not wants(fields, 'aitism_analysis')
+    # A shared prefix is not an ancestor
+    assert not wants(['summary'], 'summary_extra')
+
+
+def test_subfields_and_top_level():
+    assert subfields(['text_comparison.summary.change_percentage', 'summary'], 'text_comparison') == [
+        'summary.change_percentage']
+    assert subfields(['text_comparison'], 'text_comparison') is None
+    assert subfields(['summary'], 'text_comparison') == []
+    assert top_level(['summary.change_percentage', 'statistics']) == {'summary', 'statistics'}
+    assert top_level(None) is None
+
+
+def test_select_fields_prunes_to_the_selected_paths():
+    result = {'summary': {'overall_score': 80, 'risk_level': 'LOW'}, 'statistics': {'words': 5}, 'score': 1}
+    assert select_fields(result, None) is result
+    assert select_fields(result, ['summary.overall_score', 'score', 'missing.path']) == {
+        'summary': {'overall_score': 80}, 'score': 1}
+    # Selecting a path and one of its children keeps the whole path
+    assert select_fields(result, ['summary', 'summary.risk_level']) == {'summary': result['summary']}
+    assert select_fields(result, ['score.deeper']) == {'score': 1}
+
+
+def test_full_audit_runs_only_the_selected_analyses(client, app_module, monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError('computed an unselected analysis')
+
+    monkeypatch.setattr(app_module.text_comparator, 'compare_texts', unexpected)
+    engines = app_module.current_engines()
+    monkeypatch.setattr(engines.identity_scorer, 'calculate_voice_preservation_score', unexpected)
+    monkeypatch.setattr(engines.l2_voice_preserver, 'detect_voice_loss', unexpected)
+
+    response = client.post('/analyze/full-audit', json={
+        'original': ORIGINAL, 'edited': EDITED, 'fields': ['summary.aitism_score']})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body) == {'summary', 'document_id'}
+    assert set(body['summary']) == {'aitism_score'}
+
+
+def test_endpoint_rejects_malformed_fields(client):
+    response = client.post('/analyze/aitism', json={'text': ORIGINAL, 'fields': {'summary': 1}})
+    assert response.status_code == 400
@@ -0,0 +1,55 @@
+import json
+
+from keyword_scanner import KeywordScanner
+from l2_voice_preserver import L2VoicePreserver
+from marker_registry import get_registry
+from tokenization import RegexTokenizer
+
+
+def scanner(*keywords, context_width=50):
+    return KeywordScanner([(k, {'marker': k}) for k in keywords], context_width=context_width)
+
+
+def hits(scanner, text):
+    return [(h['keyword'], h['start'], h['end']) for h in scanner.scan(text)]
+
+
+def test_matches_whole_words_case_insensitively():
+    s = scanner('family', 'can can')
+    text = 'Families and FAMILY; the familyname; my Family. pecan can, we can can.'
+    assert hits(s, text) == [('FAMILY', 13, 19), ('Family', 40, 46),
+                             ('can can', text.index('can can.'), text.index('can can.') + 7)]
+
+
+def test_reports_overlapping_occurrences_and_prefers_longest_keyword():
+    s = scanner('very', 'very very')
+    # Every start position is reported; at each one the longest keyword wins
+    assert hits(s, 'very very very') == [('very very', 0, 9), ('very very', 5, 14), ('very', 10, 14)]
+
+
+def test_every_payload_of_a_keyword_is_reported():
+    s = KeywordScanner([('moon', {'group': 'nature'}), ('Moon', {'group': 'festival'})])
+    assert [h['payload']['group'] for h in s.scan('the moon rose')] == ['nature', 'festival']
+
+
+def test_context_stays_within_the_line():
+    s = scanner('river', context_width=10)
+    [hit] = s.scan('first line\nby the river at dawn\nlast line')
+    assert hit['context'] == 'by the river at dawn'
+
+
+def test_empty_scanner_finds_nothing():
+    assert KeywordScanner([]).scan('family') == []
+
+
+def test_l2_results_include_cultural_and_l1_markers():
+    preserver = L2VoicePreserver(registry=get_registry(), tokenizer=RegexTokenizer())
+    text = 'My family is very very important.\nThe pecan can grow near the river.'
+    results = json.loads(json.dumps(preserver.detect_l2_grammatical_structures(text),
+                                    default=lambda o: o.__json__()))
+
+    assert [(r['marker'], r['start'], r['end']) for r in results['cultural_references']] == [
+        ('family', 3, 9), ('river', 62, 67)]
+    [l1] = results['l1_interference_markers']
+    assert (l1['l1_language'], l1['marker'], l1['start'], l1['end']) == ('chinese', 'very very', 13, 22)
+    assert l1['context'] == 'My family is very very important.'
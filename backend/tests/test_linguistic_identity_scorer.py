@@ -0,0 +1,86 @@
+import pytest
+
+from chunked_analysis import iter_chunks
+from linguistic_identity_scorer import LinguisticIdentityScorer
+from tokenization import RegexTokenizer
+
+
+# Original paragraphs and AI rewrites of them (token-set similarity about 0.4)
+ORIGINAL = [
+    'My grandmother taught me to cook rice the way her mother did, slowly and with patience.',
+    'When I moved to the city for university, I missed the smell of her kitchen every evening.',
+    'Now I cook the same rice for my friends, and they ask me where the recipe comes from.',
+]
+REWRITTEN = [
+    'My grandmother showed me how to prepare rice as her own mother had, with slow care and patience.',
+    'After I moved to the city for university, every evening I missed the smell of her kitchen deeply.',
+    'Today I cook this same rice for my friends, who often ask me where the recipe comes from.',
+]
+UNRELATED = [
+    'The laboratory results indicate that the proposed catalyst improves the reaction yield significantly.',
+    'In conclusion, the economic policy of the government has failed to address rural unemployment.',
+]
+
+
+@pytest.fixture(scope='module')
+def scorer():
+    return LinguisticIdentityScorer()
+
+
+def aligned(scorer, original, edited):
+    """(original index, edited index) of every aligned paragraph pair"""
+    return [(original.index(o), edited.index(e)) for o, e, _ in scorer._align_paragraphs(original, edited)]
+
+
+def test_rewritten_paragraphs_pair_in_order(scorer):
+    assert aligned(scorer, ORIGINAL, REWRITTEN) == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_inserted_paragraph_is_left_unaligned(scorer):
+    edited = [REWRITTEN[0], UNRELATED[0], REWRITTEN[1], REWRITTEN[2]]
+    assert aligned(scorer, ORIGINAL, edited) == [(0, 0), (1, 2), (2, 3)]
+
+
+def test_deleted_paragraph_is_left_unaligned(scorer):
+    original = [ORIGINAL[0], UNRELATED[0], ORIGINAL[1], ORIGINAL[2]]
+    assert aligned(scorer, original, REWRITTEN) == [(0, 0), (2, 1), (3, 2)]
+
+
+def test_merged_paragraphs_pair_once(scorer):
+    edited = [REWRITTEN[0] + ' ' + REWRITTEN[1], REWRITTEN[2]]
+    pairs = aligned(scorer, ORIGINAL, edited)
+    assert pairs[-1] == (2, 1)
+    assert len(pairs) == 2 and pairs[0][1] == 0
+
+
+def test_unrelated_paragraphs_are_not_paired(scorer):
+    assert aligned(scorer, ORIGINAL[:2], UNRELATED) == []
+    # Replacing one paragraph with an unrelated one keeps the others paired
+    edited = [REWRITTEN[0], UNRELATED[1], REWRITTEN[2]]
+    assert aligned(scorer, ORIGINAL, edited) == [(0, 0), (2, 2)]
+
+
+def test_chunked_score_equals_whole_text_on_sentence_boundaries():
+    scorer = LinguisticIdentityScorer(tokenizer=RegexTokenizer())
+    original = '\n\n'.join(ORIGINAL * 20)
+    edited = '\n\n'.join(REWRITTEN * 20)
+    assert len(list(iter_chunks(original, 500))) > 1
+
+    whole = scorer.calculate_voice_preservation_score(original, edited)
+    chunked = scorer.calculate_voice_preservation_score_chunked(original, edited, max_chars=500)
+    assert chunked == whole
+
+
+def test_chunked_score_is_close_when_sentences_are_cut():
+    scorer = LinguisticIdentityScorer(tokenizer=RegexTokenizer())
+    # One paragraph without sentence breaks, so chunks end mid-sentence
+    original = ' '.join(p.rstrip('.') for p in ORIGINAL * 10) + '.'
+    edited = ' '.join(p.rstrip('.') for p in REWRITTEN * 10) + '.'
+    assert len(list(iter_chunks(original, 300))) > 1
+
+    whole = scorer.calculate_voice_preservation_score(original, edited)
+    chunked = scorer.calculate_voice_preservation_score_chunked(original, edited, max_chars=300)
+    assert chunked['detailed_metrics']['original_word_count'] == whole['detailed_metrics']['original_word_count']
+    for name, score in whole['component_scores'].items():
+        assert chunked['component_scores'][name] == pytest.approx(score, abs=2)
+    assert chunked['overall_score'] == pytest.approx(whole['overall_score'], abs=1)
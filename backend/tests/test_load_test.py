@@ -0,0 +1,88 @@
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+MIX = {
+    'marker_density': 0.2,
+    'edit_rate': 0.3,
+    'payloads_per_endpoint': 2,
+    'endpoints': {
+        '/analyze/aitism': {'weight': 3, 'median_words': 60, 'sigma': 0.3, 'max_words': 120},
+        '/generate-report': {'weight': 1, 'median_words': 60, 'sigma': 0.3, 'max_words': 120},
+    },
+}
+
+
+@pytest.fixture(scope='module')
+def load_test():
+    # Run as a script, the benchmark imports its neighbours and changes into the backend directory
+    cwd = os.getcwd()
+    sys.path.insert(0, BENCHMARKS_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location('load_test', os.path.join(BENCHMARKS_DIR, 'load_test.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(BENCHMARKS_DIR)
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def server_url(app_module):
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    thread.join()
+
+
+def test_percentile_is_nearest_rank(load_test):
+    values = [float(v) for v in range(1, 101)]
+    assert load_test.percentile(values, 50) == 50
+    assert load_test.percentile(values, 99) == 99
+    assert load_test.percentile(values, 100) == 100
+    assert load_test.percentile([7.0], 95) == 7
+    assert load_test.percentile([], 50) != load_test.percentile([], 50)
+
+
+def test_sample_words_is_clamped(load_test):
+    rng = random.Random(0)
+    spec = {'median_words': 400, 'sigma': 2.0, 'max_words': 1000}
+    words = [load_test.sample_words(rng, spec) for _ in range(500)]
+    assert min(words) >= 20 and max(words) <= 1000
+    assert min(words) == 20 and max(words) == 1000
+
+
+def test_shipped_mix_weights_every_endpoint(load_test):
+    mix = load_test.load_mix(load_test.DEFAULT_MIX)
+    assert load_test.REPORT_ENDPOINT in mix['endpoints']
+    for spec in mix['endpoints'].values():
+        assert spec['weight'] > 0 and spec['median_words'] <= spec['max_words']
+
+
+def test_payloads_and_a_level_against_a_live_server(load_test, server_url):
+    payloads = load_test.build_payloads(MIX, server_url, seed=1)
+    assert {endpoint: len(bodies) for endpoint, bodies in payloads.items()} == {
+        '/analyze/aitism': 2, '/generate-report': 2}
+    assert set(json.loads(payloads['/analyze/aitism'][0])) == {'text'}
+    # Report bodies carry a full audit of their pair
+    report = json.loads(payloads['/generate-report'][0])
+    assert {'original', 'edited', 'summary'} <= set(report)
+
+    results = load_test.run_level(server_url, MIX, payloads, concurrency=2, duration=1.0, warmup=0.2)
+    assert set(results) == {'/analyze/aitism', '/generate-report', 'all'}
+    total = results['all']
+    assert total['requests'] == sum(results[e]['requests'] for e in MIX['endpoints']) > 0
+    assert total['error_rate'] == 0.0
+    assert total['p50_ms'] <= total['p95_ms'] <= total['p99_ms']
@@ -0,0 +1,107 @@
+import csv
+import io
+import multiprocessing
+import os
+
+import pytest
+from flask import Flask
+
+import marker_analytics
+from aitism_detector import AIismDetector
+from marker_analytics import HitRecorder
+from marker_registry import get_registry
+from tokenization import RegexTokenizer
+
+
+def _worker(directory, ready, release):
+    recorder = HitRecorder(directory, flush_interval=60)
+    recorder.record(marker_analytics.AITISM, {('high_frequency', 'delve'): 2})
+    recorder.record(marker_analytics.L2, {('structure_rules', 'topic_comment'): 1})
+    recorder.flush()
+    ready.set()
+    release.wait(10)
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    """This process's recorder, enabled for the engines"""
+    recorder = HitRecorder(str(tmp_path), flush_interval=60)
+    monkeypatch.setattr(marker_analytics, '_recorder', recorder)
+    yield recorder
+    recorder.stop()
+
+
+def test_totals_merge_live_and_exited_workers(recorder, tmp_path):
+    recorder.record(marker_analytics.AITISM, {('high_frequency', 'delve'): 1})
+
+    context = multiprocessing.get_context('fork')
+    ready, release = context.Event(), context.Event()
+    worker = context.Process(target=_worker, args=(str(tmp_path), ready, release))
+    worker.start()
+    try:
+        assert ready.wait(10)
+        texts, hits, workers = recorder.totals()
+        assert workers == 2
+        assert texts == {marker_analytics.AITISM: 2, marker_analytics.L2: 1}
+        assert hits[('high_frequency', 'delve')] == 3
+    finally:
+        release.set()
+        worker.join(10)
+
+    # The exited worker's counts are folded into merged.json and its files removed
+    texts, hits, workers = recorder.totals()
+    assert workers == 1
+    assert texts == {marker_analytics.AITISM: 2, marker_analytics.L2: 1}
+    assert hits[('high_frequency', 'delve')] == 3 and hits[('structure_rules', 'topic_comment')] == 1
+    assert sorted(os.listdir(tmp_path)) == ['merge.lock', 'merged.json']
+    assert recorder.totals()[:2] == (texts, hits)
+
+
+def test_detector_reports_one_update_per_text(recorder):
+    registry = get_registry()
+    phrase = registry.db['ai_markers']['high_frequency'][0]
+    detector = AIismDetector(registry=registry, tokenizer=RegexTokenizer())
+    detector.detect_ai_markers(f'{phrase} once. And {phrase} twice.')
+    detector.detect_ai_markers('Nothing generic here at all.')
+
+    assert recorder.texts == {marker_analytics.AITISM: 2}
+    assert recorder.hits[('high_frequency', phrase)] == 2
+
+
+def test_report_lists_every_marker_and_removed_ones():
+    registry = get_registry()
+    phrase = registry.db['ai_markers']['high_frequency'][0]
+    hits = marker_analytics.Hits({('high_frequency', phrase): 4, ('high_frequency', 'retired phrase'): 1})
+    rows = marker_analytics.report(registry, marker_analytics.Counter({marker_analytics.AITISM: 8}), hits)
+
+    assert len(rows) == len(list(marker_analytics.database_markers(registry))) + 1
+    by_marker = {(row['category'], row['marker']): row for row in rows}
+    assert by_marker[('high_frequency', phrase)]['hit_rate'] == 0.5
+    assert by_marker[('high_frequency', 'retired phrase')]['in_database'] is False
+    assert rows[-1]['marker'] == 'retired phrase'
+    assert all(row['hits'] == 0 for key, row in by_marker.items() if key not in hits)
+
+
+def test_hits_endpoint_serves_json_and_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(marker_analytics, '_recorder', None)
+    recorder = HitRecorder(str(tmp_path), flush_interval=60)
+    app = Flask(__name__)
+    marker_analytics.init_app(app, recorder, current_registry=get_registry)
+    try:
+        rule_id = get_registry().db['voice_preservation_markers']['structure_rules'][0]['id']
+        marker_analytics.record(marker_analytics.L2, {('structure_rules', rule_id): 1})
+        client = app.test_client()
+
+        body = client.get('/api/markers/hits?category=structure_rules').get_json()
+        assert body['texts_analyzed'] == {marker_analytics.L2: 1} and body['live_workers'] == 1
+        assert {row['category'] for row in body['markers']} == {'structure_rules'}
+        assert [row['hits'] for row in body['markers'] if row['marker'] == rule_id] == [1]
+
+        exported = client.get('/api/markers/hits?format=csv&category=structure_rules')
+        assert exported.mimetype == 'text/csv'
+        rows = list(csv.DictReader(io.StringIO(exported.get_data(as_text=True))))
+        assert [row['marker'] for row in rows] == [row['marker'] for row in body['markers']]
+
+        assert client.get('/api/markers/hits?format=xml').status_code == 400
+    finally:
+        recorder.stop()
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import re
+import shutil
+
+import pytest
+
+import marker_artifact
+from marker_registry import MarkerRegistry
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'genericism_database.json')
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'genericism_database.json'
+    shutil.copy(DB_PATH, path)
+    return str(path)
+
+
+def sample_text(db):
+    """Sentences containing every phrase, transition, keyword and L1 marker of the database"""
+    ai_markers = db['ai_markers']
+    voice_markers = db['voice_preservation_markers']
+    markers = [m for category in ('high_frequency', 'academic_clichés', 'generic_openers', 'transition_abuse')
+               for m in ai_markers[category]]
+    markers += [m for group in voice_markers.get('cultural_metaphor_keywords', ()) for m in group['keywords']]
+    markers += [m for lang_markers in ai_markers['l2_interference_markers'].values() for m in lang_markers]
+    sentences = [f'In my family, {marker} was something we talked about.' for marker in markers]
+    sentences += ['It is important to note that this is not only a task but also a journey.',
+                  'My grandmother she taught me, very very patiently, how to cook.']
+    return ' '.join(sentences)
+
+
+def matches(registry, text):
+    """Everything the registry's matchers find in text"""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return {
+        'phrases': {category: [(phrase, [m.span() for m in pattern.finditer(text)])
+                               for phrase, pattern in patterns]
+                    for category, patterns in registry.phrase_patterns.items()},
+        'transitions': [(t, [m.span() for m in p.finditer(text)]) for t, p in registry.transition_patterns],
+        'formulaic': [[m.span() for m in p.finditer(text)] for p in registry.formulaic_patterns],
+        'structures': registry.structure_engine.match_sentences(sentences),
+        'keywords': registry.voice_marker_scanner.scan(text),
+    }
+
+
+def test_artifact_round_trip_gives_identical_matches(database):
+    compiled = MarkerRegistry.from_file(database)
+    assert compiled.compiled_from == 'json'
+
+    marker_artifact.build(database)
+    with open(database, 'rb') as f:
+        digest = marker_artifact.source_digest(f.read())
+    table = marker_artifact.load(marker_artifact.artifact_path_for(database), digest)
+    assert table is not None and table.entries
+    loaded = MarkerRegistry.from_file(database)
+    assert loaded.compiled_from == 'artifact'
+    assert loaded.version == compiled.version
+
+    with open(database, 'r', encoding='utf-8') as f:
+        text = sample_text(json.load(f))
+    found = matches(compiled, text)
+    assert found['keywords'] and any(spans for _, spans in found['transitions'])
+    assert matches(loaded, text) == found
+
+
+def test_stale_artifact_falls_back_to_json(database, caplog):
+    marker_artifact.build(database)
+    with open(database, 'r', encoding='utf-8') as f:
+        db = json.load(f)
+    db['ai_markers']['high_frequency'].append('freshly added phrase')
+    with open(database, 'w', encoding='utf-8') as f:
+        json.dump(db, f)
+
+    with caplog.at_level(logging.WARNING, logger='marker_registry'):
+        registry = MarkerRegistry.from_file(database)
+    assert registry.compiled_from == 'json'
+    assert 'stale marker artifact' in caplog.text
+    phrase, pattern = registry.phrase_patterns['high_frequency'][-1]
+    assert phrase == 'freshly added phrase' and pattern.search('A Freshly Added Phrase here')
+
+
+def test_unreadable_or_foreign_artifact_falls_back_to_json(database, monkeypatch):
+    artifact_path = marker_artifact.artifact_path_for(database)
+    with open(artifact_path, 'wb') as f:
+        f.write(b'not a pickle')
+    assert MarkerRegistry.from_file(database).compiled_from == 'json'
+
+    # Built by another interpreter's regex engine
+    marker_artifact.build(database)
+    monkeypatch.setattr(marker_artifact, 'runtime_tag', lambda: 'other-runtime')
+    assert MarkerRegistry.from_file(database).compiled_from == 'json'
+
+
+def test_patterns_missing_from_the_table_are_compiled():
+    recorder = marker_artifact.PatternRecorder()
+    recorder.compile(r'\bkept\b', re.IGNORECASE)
+    table = marker_artifact.PatternTable(*recorder.pack())
+    assert table.compile(r'\bkept\b', re.IGNORECASE).search('KEPT here')
+    assert table.misses == 0
+    assert table.compile(r'\bnew\b', re.IGNORECASE).search('a NEW one')
+    assert table.misses == 1
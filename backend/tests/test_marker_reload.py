@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+import marker_registry
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'genericism_database.json')
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A loaded copy of the shipped database, and a function adding a high-frequency phrase to it"""
+    path = tmp_path / 'genericism_database.json'
+    shutil.copy(DB_PATH, path)
+
+    def add_phrase(phrase):
+        db = json.loads(path.read_text(encoding='utf-8'))
+        db['ai_markers']['high_frequency'].append(phrase)
+        path.write_text(json.dumps(db), encoding='utf-8')
+
+    marker_registry.get_registry(str(path))
+    yield path, add_phrase
+    marker_registry._registries.pop(str(path), None)
+    marker_registry._listeners.pop(str(path), None)
+
+
+def test_reload_swaps_in_a_new_version_after_notifying_subscribers(database):
+    path, add_phrase = database
+    current = marker_registry.get_registry(str(path))
+    seen = []
+    # Subscribers rebuild while the previous version is still the current one
+    marker_registry.subscribe(str(path), lambda registry: seen.append(
+        (registry, marker_registry.get_registry(str(path)))))
+
+    add_phrase('synergistic paradigm')
+    registry = marker_registry.reload(str(path))
+
+    assert registry is not None and registry.version != current.version
+    assert seen == [(registry, current)]
+    assert marker_registry.get_registry(str(path)) is registry
+    assert 'synergistic paradigm' in [phrase for phrase, _ in registry.phrase_patterns['high_frequency']]
+    # The previous version is untouched for requests still using it
+    assert 'synergistic paradigm' not in [phrase for phrase, _ in current.phrase_patterns['high_frequency']]
+
+
+def test_unchanged_content_is_not_reloaded(database):
+    path, _ = database
+    current = marker_registry.get_registry(str(path))
+    path.write_text(path.read_text(encoding='utf-8'), encoding='utf-8')
+    assert marker_registry.reload(str(path)) is None
+    assert marker_registry.get_registry(str(path)) is current
+
+
+def test_invalid_file_keeps_the_current_version(database):
+    path, _ = database
+    current = marker_registry.get_registry(str(path))
+    path.write_text('{"ai_markers": ', encoding='utf-8')
+    with pytest.raises(ValueError):
+        marker_registry.reload(str(path))
+    assert marker_registry.get_registry(str(path)) is current
+
+
+def test_watcher_reloads_a_changed_file(database):
+    path, add_phrase = database
+    current = marker_registry.get_registry(str(path))
+    watcher = marker_registry.RegistryWatcher(str(path), 0.01)
+    watcher.start()
+    try:
+        path.write_text('{"ai_markers": ', encoding='utf-8')
+        time.sleep(0.1)
+        assert marker_registry.get_registry(str(path)) is current
+
+        shutil.copy(DB_PATH, path)
+        add_phrase('synergistic paradigm')
+        deadline = time.monotonic() + 5
+        while marker_registry.get_registry(str(path)) is current and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+        watcher.join()
+    assert marker_registry.get_registry(str(path)).version != current.version
+
+
+def test_responses_report_the_version_pinned_by_the_request(app_module, monkeypatch, database):
+    path, add_phrase = database
+    monkeypatch.setattr(app_module, '_engines', app_module._engines)
+    client = app_module.app.test_client()
+    before = client.get('/health')
+    assert before.headers['X-Marker-DB-Version'] == before.get_json()['marker_db_version']
+
+    add_phrase('synergistic paradigm')
+    registry = marker_registry.reload(str(path))
+    with app_module.app.test_request_context('/analyze/aitism', method='POST'):
+        pinned = app_module.current_engines()
+        app_module._swap_engines(registry)
+        assert app_module.current_engines() is pinned
+
+    after = client.get('/health')
+    assert after.headers['X-Marker-DB-Version'] == registry.version != before.headers['X-Marker-DB-Version']
@@ -0,0 +1,90 @@
+import json
+import re
+
+from flask import Flask
+
+import response_encoding
+from aitism_detector import AIismDetector
+from marker_registry import get_registry
+from match_types import CulturalReferences, L1TransferMarkers, PositionMatches, SpanMatches, StructureMatches
+from tokenization import RegexTokenizer
+
+
+def to_json(value):
+    return json.loads(json.dumps(value, default=lambda o: o.__json__()))
+
+
+def test_span_matches_serialize_as_start_end_label_rows():
+    matches = SpanMatches()
+    matches.add(0, 4, 'very')
+    assert matches.add_matches(re.finditer('ab', 'ab ab'), 'ab', offset=10) == 2
+    assert to_json(matches) == [[0, 4, 'very'], [10, 12, 'ab'], [13, 15, 'ab']]
+    assert list(matches.spans()) == [(0, 4, 'very'), (10, 12, 'ab'), (13, 15, 'ab')]
+    # Labels are stored once however often they match
+    assert matches.labels == ['very', 'ab'] and len(matches) == 3
+
+
+def test_position_matches_keep_spans_out_of_the_json():
+    matches = PositionMatches()
+    assert not matches
+    matches.add(2, 'perhaps', 10, 17)
+    matches.add(5, 'It is evident.')
+    assert to_json(matches) == [[2, 'perhaps'], [5, 'It is evident.']]
+    assert list(matches.spans()) == [(10, 17, 'perhaps')]
+
+
+def test_structure_matches_read_constants_from_the_rule_table():
+    rules = {
+        'topic_comment': {'id': 'topic_comment', 'type': 'Topic-comment', 'preservation_value': 'HIGH',
+                          'reason': 'L1 structure'},
+        'double_subject': {'id': 'double_subject', 'type': 'Double subject', 'preservation_value': 'MEDIUM'},
+    }
+    matches = StructureMatches(rules)
+    matches.add('topic_comment', 'As for family, we help.', 0, 23)
+    matches.add('double_subject', 'My mother she cooks.')
+    assert to_json(matches) == [
+        {'type': 'Topic-comment', 'rule_id': 'topic_comment', 'sentence': 'As for family, we help.',
+         'preservation_value': 'HIGH', 'reason': 'L1 structure'},
+        {'type': 'Double subject', 'rule_id': 'double_subject', 'sentence': 'My mother she cooks.',
+         'preservation_value': 'MEDIUM'},
+    ]
+    assert list(matches.spans()) == [(0, 23, 'topic_comment')]
+
+
+def test_keyword_matches_expand_their_payloads():
+    cultural = {'kind': 'cultural', 'marker': 'river', 'type': 'Nature-based imagery', 'cultural_value': 'V'}
+    references = CulturalReferences()
+    references.add(cultural, 4, 9, 'the river')
+    references.add(cultural, 20, 25, 'a river')
+    assert references.payloads == [cultural]
+    assert to_json(references) == [
+        {'type': 'Nature-based imagery', 'marker': 'river', 'start': 4, 'end': 9, 'context': 'the river',
+         'cultural_value': 'V'},
+        {'type': 'Nature-based imagery', 'marker': 'river', 'start': 20, 'end': 25, 'context': 'a river',
+         'cultural_value': 'V'},
+    ]
+
+    l1 = L1TransferMarkers()
+    l1.add({'kind': 'l1_interference', 'marker': 'very very', 'l1_language': 'chinese'}, 0, 9, 'very very good')
+    assert to_json(l1) == [{'l1_language': 'chinese', 'marker': 'very very', 'start': 0, 'end': 9,
+                            'context': 'very very good', 'authenticity_indicator': 'Shows genuine L1 influence',
+                            'preservation_recommendation': 'PROTECT - This is authentic voice'}]
+
+
+def test_detector_results_serialize_to_the_list_shapes():
+    registry = get_registry()
+    detector = AIismDetector(registry=registry, tokenizer=RegexTokenizer())
+    phrase = registry.db['ai_markers']['high_frequency'][0]
+    text = f'{phrase.capitalize()} is here. Furthermore, we perhaps agree. And {phrase} again.'
+    results = detector.detect_ai_markers(text)
+
+    app = Flask(__name__)
+    response_encoding.init_app(app)
+    encoded = json.loads(app.json.dumps(results))
+    assert encoded == to_json(results)
+
+    expected = [[m.start(), m.end(), phrase] for m in re.finditer(re.escape(phrase), text, re.IGNORECASE)]
+    assert len(expected) == 2
+    assert [row for row in encoded['high_frequency_phrases'] if row[2] == phrase] == expected
+    [[position, word]] = encoded['hedging_qualifiers']
+    assert word == 'perhaps' and isinstance(position, int)
@@ -0,0 +1,84 @@
+import re
+
+import pytest
+from flask import Flask
+
+import metrics
+
+
+def sample(body, name, **labels):
+    """Value of one sample in a text exposition, or None when it is absent"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    for line in body.splitlines():
+        if line.startswith('#'):
+            continue
+        match = re.fullmatch(r'(\w+)(?:\{(.*)\})? (\S+)', line)
+        if match and match.group(1) == name:
+            found = ','.join(sorted((match.group(2) or '').split(',')))
+            if found == label_text:
+                return float(match.group(3))
+    return None
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return 'ok'
+
+    return app
+
+
+def test_size_class():
+    assert metrics.size_class(0) == 'lt_1k'
+    assert metrics.size_class(1000) == '1k_10k'
+    assert metrics.size_class(99999) == '10k_100k'
+    assert metrics.size_class(100000) == 'ge_100k'
+
+
+def test_requests_latency_and_input_words_are_recorded(app):
+    client = app.test_client()
+    before = client.get('/metrics').get_data(as_text=True)
+    requests_before = sample(before, 'writing_defense_requests_total', endpoint='/echo', method='POST',
+                             status='200') or 0
+    words_before = sample(before, 'writing_defense_request_input_words_sum', endpoint='/echo') or 0
+
+    response = client.post('/echo', json={'original': 'one two three', 'edited': 'four five', 'other': 'x y'})
+    assert response.status_code == 200
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert sample(body, 'writing_defense_requests_total', endpoint='/echo', method='POST',
+                  status='200') == requests_before + 1
+    # Only the analyzed text fields count as input
+    assert sample(body, 'writing_defense_request_input_words_sum', endpoint='/echo') == words_before + 5
+    assert sample(body, 'writing_defense_request_duration_seconds_count', endpoint='/echo',
+                  size_class='lt_1k') >= 1
+    # Scrapes are not counted as requests
+    assert sample(body, 'writing_defense_requests_total', endpoint='/metrics', method='GET', status='200') is None
+
+
+def test_cache_and_admission_metrics(app):
+    client = app.test_client()
+    before = client.get('/metrics').get_data(as_text=True)
+    hits_before = sample(before, 'writing_defense_cache_lookups_total', cache='test_cache', result='hit') or 0
+
+    metrics.record_cache('test_cache', True)
+    metrics.record_cache('test_cache', False)
+    metrics.change_admission_queue('test_pool', 2)
+    metrics.change_admission_queue('test_pool', -1)
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert sample(body, 'writing_defense_cache_lookups_total', cache='test_cache', result='hit') == hits_before + 1
+    assert sample(body, 'writing_defense_cache_lookups_total', cache='test_cache', result='miss') >= 1
+    assert sample(body, 'writing_defense_admission_queue_depth', pool='test_pool') == 1
+    metrics.change_admission_queue('test_pool', -1)
+
+
+def test_metrics_answer_503_without_prometheus_client(app, monkeypatch):
+    monkeypatch.setattr(metrics, 'prometheus_client', None)
+    metrics.record_cache('test_cache', True)
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 503
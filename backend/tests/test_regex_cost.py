@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import re
+import shutil
+
+import pytest
+
+import marker_registry
+import regex_cost
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'genericism_database.json')
+
+LIMIT = 0.025
+CATASTROPHIC = r'^(a+)+$'
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A copy of the shipped database, and a function rewriting its formulaic patterns"""
+    path = tmp_path / 'genericism_database.json'
+    shutil.copy(DB_PATH, path)
+
+    def set_formulaic(patterns):
+        db = json.loads(path.read_text(encoding='utf-8'))
+        db['ai_markers']['formulaic_structures'] = patterns
+        path.write_text(json.dumps(db), encoding='utf-8')
+
+    yield path, set_formulaic
+    marker_registry._registries.pop(str(path), None)
+
+
+def shipped_patterns():
+    with open(DB_PATH, 'r', encoding='utf-8') as f:
+        sources = json.load(f)['ai_markers']['formulaic_structures']
+    return [re.compile(source, re.IGNORECASE) for source in sources]
+
+
+def test_measure_flags_catastrophic_backtracking():
+    cost = regex_cost.measure(re.compile(CATASTROPHIC), LIMIT)
+    assert cost.dangerous
+    assert cost.reason
+
+
+def test_shipped_patterns_pass():
+    costs = regex_cost.validate(shipped_patterns(), limit=LIMIT, on_danger=regex_cost.REJECT)
+    assert costs and not any(cost.dangerous for cost in costs)
+
+
+def test_reject_policy_raises_naming_the_pattern():
+    with pytest.raises(ValueError, match=re.escape(repr(CATASTROPHIC))):
+        regex_cost.validate([re.compile(CATASTROPHIC)], limit=LIMIT, on_danger=regex_cost.REJECT)
+
+
+def test_flag_policy_logs_and_keeps(caplog):
+    with caplog.at_level(logging.WARNING, logger='regex_cost'):
+        costs = regex_cost.validate([re.compile(CATASTROPHIC)], limit=LIMIT, on_danger=regex_cost.FLAG)
+    assert [cost.dangerous for cost in costs] == [True]
+    assert CATASTROPHIC in caplog.text
+
+
+def test_zero_limit_disables_checks():
+    assert regex_cost.validate([re.compile(CATASTROPHIC)], limit=0, on_danger=regex_cost.REJECT) == []
+
+
+def test_unknown_policy_is_rejected(monkeypatch):
+    monkeypatch.setenv('REGEX_COST_POLICY', 'ignore')
+    with pytest.raises(ValueError):
+        regex_cost.policy()
+
+
+def test_initial_load_keeps_dangerous_patterns_and_reload_rejects_them(database, monkeypatch):
+    monkeypatch.setenv('REGEX_COST_POLICY', regex_cost.REJECT)
+    path, set_formulaic = database
+    set_formulaic([CATASTROPHIC])
+    registry = marker_registry.get_registry(str(path))
+    assert [cost.dangerous for cost in registry.formulaic_costs] == [True]
+
+    set_formulaic([r'^In conclusion\b', CATASTROPHIC])
+    with pytest.raises(ValueError):
+        marker_registry.reload(str(path))
+    assert marker_registry.get_registry(str(path)) is registry
+
+    set_formulaic([r'^In conclusion\b'])
+    reloaded = marker_registry.reload(str(path))
+    assert reloaded is not None and marker_registry.get_registry(str(path)) is reloaded
+
+
+def test_slow_single_timing_is_retimed(monkeypatch):
+    # The first timing of every input stalls; the pattern must still pass on its re-timings
+    stalled = set()
+    real = regex_cost._time_match
+
+    def stalling(pattern, sentence):
+        if sentence not in stalled:
+            stalled.add(sentence)
+            return LIMIT * 10
+        return real(pattern, sentence)
+
+    monkeypatch.setattr(regex_cost, '_time_match', stalling)
+    assert not regex_cost.measure(re.compile(r'^In conclusion\b'), LIMIT, max_chars=200).dangerous
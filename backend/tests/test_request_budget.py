@@ -0,0 +1,66 @@
+import pytest
+from flask import Flask, g, jsonify
+
+import request_budget
+from request_budget import RequestBudget
+
+
+def test_check_fits_downgrades_or_rejects():
+    budget = RequestBudget(max_input_chars=0, memory_bytes=64 * 1000,
+                           whole_bytes_per_char=64, chunked_bytes_per_char=40)
+    assert budget.check(1000) is None
+    # Over the whole-text estimate but within the chunked one
+    assert budget.check(1001) is True
+    assert budget.check(1600) is True
+    with pytest.raises(ValueError, match='memory budget'):
+        budget.check(1601)
+
+    limited = RequestBudget(max_input_chars=500)
+    assert limited.check(500) is None
+    with pytest.raises(ValueError, match='limit of 500'):
+        limited.check(501)
+
+
+def test_no_limits_register_nothing():
+    app = Flask(__name__)
+    request_budget.init_app(app, RequestBudget())
+    assert not app.before_request_funcs
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    request_budget.init_app(app, RequestBudget(max_input_chars=3000, memory_bytes=64 * 1000))
+
+    @app.route('/analyze', methods=['POST'])
+    def analyze():
+        return jsonify({'chars': request_budget.request_chars(), 'chunked': request_budget.force_chunked()})
+
+    return app.test_client()
+
+
+def test_requests_are_measured_across_text_fields(client):
+    response = client.post('/analyze', json={'original': 'a' * 300, 'edited': 'b' * 200, 'fields': 'x' * 900})
+    assert response.get_json() == {'chars': 500, 'chunked': False}
+
+
+def test_over_the_whole_text_estimate_runs_chunked(client):
+    response = client.post('/analyze', json={'original': 'a' * 700, 'edited': 'b' * 700})
+    assert response.status_code == 200
+    assert response.get_json() == {'chars': 1400, 'chunked': True}
+
+
+def test_oversized_requests_get_413_before_the_view_runs(client):
+    over_memory = client.post('/analyze', json={'text': 'a' * 2000})
+    assert over_memory.status_code == 413 and 'memory budget' in over_memory.get_json()['error']
+    over_limit = client.post('/analyze', json={'text': 'a' * 3001})
+    assert over_limit.status_code == 413 and 'limit of 3000' in over_limit.get_json()['error']
+    # Non-JSON bodies are not measured
+    assert client.post('/analyze', data='a' * 5000).status_code == 200
+
+
+def test_a_downgraded_request_overrides_chunked_false(app_module):
+    with app_module.app.test_request_context('/analyze/compare', method='POST'):
+        assert not app_module.use_chunked({'chunked': False}, 'short text')
+        g.budget_force_chunked = True
+        assert app_module.use_chunked({'chunked': False}, 'short text')
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from request_coalescing import Coalescer
+
+
+def start_follower(coalescer, key, results):
+    """Join a key from another thread, giving it time to start waiting"""
+    follower = threading.Thread(target=lambda: results.append(coalescer.join(key)))
+    follower.start()
+    time.sleep(0.2)
+    return follower
+
+
+def test_key_covers_version_path_and_canonical_body():
+    key = Coalescer.key('/analyze/aitism', {'text': 'a', 'fields': ['x']}, 'v1')
+    assert key == Coalescer.key('/analyze/aitism', {'fields': ['x'], 'text': 'a'}, 'v1')
+    assert key != Coalescer.key('/analyze/aitism', {'text': 'a', 'fields': ['x']}, 'v2')
+    assert key != Coalescer.key('/analyze/l2-voice', {'text': 'a', 'fields': ['x']}, 'v1')
+    assert key != Coalescer.key('/analyze/aitism', {'text': 'b', 'fields': ['x']}, 'v1')
+
+
+def test_duplicate_waits_for_the_leaders_body():
+    coalescer = Coalescer(wait_timeout=5)
+    body, leadership = coalescer.join('k')
+    assert body is None and leadership is not None
+
+    results = []
+    follower = start_follower(coalescer, 'k', results)
+    coalescer.finish(leadership, b'{"ok": true}')
+    follower.join()
+    assert results == [(b'{"ok": true}', None)]
+
+    # The flight is over: the next request leads again
+    body, leadership = coalescer.join('k')
+    assert body is None and leadership is not None
+    coalescer.finish(leadership, None)
+
+
+def test_failed_leader_lets_duplicates_compute():
+    coalescer = Coalescer(wait_timeout=5)
+    _, leadership = coalescer.join('k')
+    results = []
+    follower = start_follower(coalescer, 'k', results)
+    coalescer.finish(leadership, None)
+    follower.join()
+    assert results == [(None, None)]
+
+
+def test_shared_directory_coalesces_across_workers(tmp_path):
+    # Two coalescers stand in for two workers: their lock files are separate open files
+    first = Coalescer(shared_dir=str(tmp_path), wait_timeout=5)
+    second = Coalescer(shared_dir=str(tmp_path), wait_timeout=5)
+    _, leadership = first.join('k')
+    assert leadership.fd is not None
+
+    results = []
+    follower = start_follower(second, 'k', results)
+    first.finish(leadership, b'body')
+    follower.join()
+    assert results == [(b'body', None)]
+
+
+def test_shared_waiter_takes_over_when_the_leader_releases_without_a_body(tmp_path):
+    first = Coalescer(shared_dir=str(tmp_path), wait_timeout=5)
+    second = Coalescer(shared_dir=str(tmp_path), wait_timeout=5)
+    _, leadership = first.join('k')
+
+    results = []
+    follower = start_follower(second, 'k', results)
+    first.finish(leadership, None)
+    follower.join()
+    body, taken_over = results[0]
+    assert body is None and taken_over is not None and taken_over.fd is not None
+    second.finish(taken_over, None)
@@ -0,0 +1,97 @@
+import pstats
+import time
+
+from flask import Flask
+
+import request_profiler
+
+
+TOKEN = 'secret-token'
+
+
+def make_app(tmp_path, **options):
+    app = Flask(__name__)
+
+    @app.route('/analyze/work', methods=['POST'])
+    def work():
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        return 'ok'
+
+    @app.route('/health')
+    def health():
+        return 'ok'
+
+    profiler = request_profiler.init_app(app, profile_dir=str(tmp_path), **options)
+    return app, profiler
+
+
+def test_nothing_is_registered_without_a_token_or_sampling(tmp_path):
+    app, profiler = make_app(tmp_path)
+    assert profiler is None
+    assert app.test_client().get('/api/profiles').status_code == 404
+
+
+def test_admin_header_profiles_a_request_with_cprofile(tmp_path):
+    app, _ = make_app(tmp_path, token=TOKEN)
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.post('/analyze/work').headers
+    assert 'X-Profile-Id' not in client.post('/analyze/work', headers={'X-Profile': 'wrong'}).headers
+    assert 'X-Profile-Id' not in client.get('/health', headers={'X-Profile': TOKEN}).headers
+
+    response = client.post('/analyze/work', headers={'X-Profile': TOKEN, 'X-Request-ID': 'req-1'})
+    profile_id = response.headers['X-Profile-Id']
+    assert profile_id.startswith('req-1-')
+
+    assert client.get('/api/profiles').status_code == 403
+    [meta] = client.get('/api/profiles', headers={'X-Profile': TOKEN}).get_json()['profiles']
+    assert meta['id'] == profile_id and meta['request_id'] == 'req-1'
+    assert meta['trigger'] == 'header' and meta['status'] == 200 and meta['artifacts'] == ['pstats']
+
+    download = client.get(f'/api/profiles/{profile_id}', headers={'X-Profile': TOKEN})
+    assert download.status_code == 200
+    path = tmp_path / 'downloaded.prof'
+    path.write_bytes(download.data)
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert 'work' in functions
+
+    assert client.get(f'/api/profiles/{profile_id}?format=collapsed',
+                      headers={'X-Profile': TOKEN}).status_code == 404
+    assert client.get('/api/profiles/..%2Fetc', headers={'X-Profile': TOKEN}).status_code == 404
+
+
+def test_reused_request_ids_get_distinct_profiles(tmp_path):
+    app, _ = make_app(tmp_path, token=TOKEN)
+    client = app.test_client()
+    headers = {'X-Profile': TOKEN, 'X-Request-ID': 'same'}
+    first = client.post('/analyze/work', headers=headers).headers['X-Profile-Id']
+    second = client.post('/analyze/work', headers=headers).headers['X-Profile-Id']
+    assert first != second
+
+
+def test_sampling_profiles_every_nth_request_with_the_stack_sampler(tmp_path):
+    app, _ = make_app(tmp_path, token=TOKEN, sample_every=3, profiler='sample', interval_ms=1)
+    client = app.test_client()
+    profiled = [('X-Profile-Id' in client.post('/analyze/work').headers) for _ in range(6)]
+    assert profiled == [False, False, True, False, False, True]
+
+    profiles = client.get('/api/profiles', headers={'X-Profile': TOKEN}).get_json()['profiles']
+    assert [meta['trigger'] for meta in profiles] == ['sampled', 'sampled']
+    assert profiles[0]['artifacts'] == ['collapsed'] and profiles[0]['samples'] > 0
+
+    folded = client.get(f"/api/profiles/{profiles[0]['id']}", headers={'X-Profile': TOKEN})
+    lines = folded.get_data(as_text=True).splitlines()
+    assert any('work (test_request_profiler.py' in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_retention_keeps_the_newest_profiles(tmp_path):
+    app, profiler = make_app(tmp_path, token=TOKEN, retention=2)
+    client = app.test_client()
+    ids = [client.post('/analyze/work', headers={'X-Profile': TOKEN}).headers['X-Profile-Id'] for _ in range(4)]
+
+    assert [meta['id'] for meta in profiler.store.list()] == ids[:1:-1]
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        f'{profile_id}{suffix}' for profile_id in ids[2:] for suffix in ('.json', '.prof'))
@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+import response_encoding
+from match_types import SpanMatches
+
+
+PAYLOAD = {'zeta': 1, 'alpha': [1.5, 'naïve café', None, True], 'big': 2 ** 70,
+           'nested': {'b': 1e-7, 'a': 'x' * 2000}}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    response_encoding.init_app(app, min_size=1024)
+
+    @app.route('/large')
+    def large():
+        return jsonify(PAYLOAD)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/matches')
+    def matches():
+        spans = SpanMatches()
+        spans.add(3, 9, 'family')
+        return jsonify({'spans': spans})
+
+    @app.route('/tagged')
+    def tagged():
+        response = jsonify(PAYLOAD)
+        response.set_etag('markers-v1')
+        return response
+
+    return app.test_client()
+
+
+def test_json_matches_the_default_provider():
+    pytest.importorskip('orjson')
+    app = Flask(__name__)
+    payload = dict(PAYLOAD, big=2 ** 40)
+    expected = app.json.dumps(payload)
+    response_encoding.init_app(app)
+    data = app.json.dumps(payload)
+    assert json.loads(data) == json.loads(expected)
+    # Sorted keys and compact separators, as in the default provider's responses
+    assert data.startswith('{"alpha":[1.5,"naïve café",null,true],"big":1099511627776,')
+
+
+def test_integers_beyond_64_bits_fall_back_to_the_stdlib(client):
+    assert client.get('/large').get_json()['big'] == 2 ** 70
+
+
+def test_compact_result_types_are_expanded(client):
+    assert client.get('/matches').get_json() == {'spans': [[3, 9, 'family']]}
+
+
+@pytest.mark.parametrize('encoding, decompress', [
+    ('gzip', gzip.decompress),
+    ('br', lambda body: pytest.importorskip('brotli').decompress(body)),
+])
+def test_large_responses_are_compressed_as_negotiated(client, encoding, decompress):
+    identity = client.get('/large')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+
+    response = client.get('/large', headers={'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    assert decompress(response.data) == identity.data
+
+
+def test_small_responses_stay_uncompressed(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compressed_responses_get_a_weak_etag(client):
+    first = client.get('/tagged', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['ETag'] == 'W/"markers-v1"'
+    second = client.get('/tagged', headers={'Accept-Encoding': 'gzip'})
+    # Served from the compressed-body cache
+    assert second.data == first.data and second.headers['ETag'] == 'W/"markers-v1"'
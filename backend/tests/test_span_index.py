@@ -0,0 +1,90 @@
+import os
+import random
+import time
+
+import span_index
+from span_index import SpanIndex, SpanIndexCache, document_id
+
+
+def random_index(rng, count):
+    categories = [(category, []) for category in ('phrases', 'transitions', 'structures')]
+    for _ in range(count):
+        start = rng.randrange(0, 5000)
+        end = start + rng.choice((0, 1, rng.randrange(1, 40), rng.randrange(1, 2000)))
+        categories[rng.randrange(len(categories))][1].append((start, end, f'label{rng.randrange(20)}'))
+    return categories
+
+
+def brute_force(categories, start, end):
+    return sorted(
+        (s, e, category, label)
+        for category, spans in categories
+        for s, e, label in spans
+        if s < end and start < e and start < end
+    )
+
+
+def test_overlapping_matches_brute_force():
+    rng = random.Random(7)
+    for count in (0, 1, 2, 3, 7, 8, 15, 16, 17, 100, 1000):
+        categories = random_index(rng, count)
+        index = SpanIndex(categories)
+        assert len(index) == count
+        for _ in range(200):
+            start = rng.randrange(-10, 5100)
+            end = start + rng.choice((0, 1, rng.randrange(1, 100), rng.randrange(1, 6000)))
+            assert sorted(index.overlapping(start, end)) == brute_force(categories, start, end)
+
+
+def test_overlapping_is_half_open_and_in_index_order():
+    index = SpanIndex([('a', [(10, 20, 'x'), (0, 5, 'y')]), ('b', [(20, 30, 'z'), (12, 12, 'empty')])])
+    assert index.overlapping(5, 10) == []
+    assert index.overlapping(5, 20) == [(10, 20, 'a', 'x'), (12, 12, 'b', 'empty')]
+    assert index.overlapping(0, 100) == [
+        (0, 5, 'a', 'y'), (10, 20, 'a', 'x'), (12, 12, 'b', 'empty'), (20, 30, 'b', 'z')]
+    assert index.overlapping(15, 15) == []
+
+
+def test_json_round_trip():
+    categories = random_index(random.Random(3), 300)
+    index = SpanIndex(categories)
+    rebuilt = SpanIndex.from_json(index.__json__())
+    assert rebuilt.__json__() == index.__json__()
+    assert rebuilt.overlapping(1000, 2000) == index.overlapping(1000, 2000)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SpanIndexCache(max_documents=2)
+    index = SpanIndex([('a', [(0, 3, 'x')])])
+    cache.put('d1', 'aitism', index)
+    cache.put('d2', 'aitism', index)
+    cache.get('d1')
+    cache.put('d3', 'aitism', index)
+    assert cache.get('d2') is None
+    assert cache.query('d1', 0, 10) == [
+        {'start': 0, 'end': 3, 'source': 'aitism', 'category': 'a', 'label': 'x'}]
+
+
+def test_shared_directory_serves_other_workers(tmp_path):
+    doc_id = document_id('Some analyzed text.')
+    analyzing = SpanIndexCache(shared_dir=str(tmp_path))
+    other = SpanIndexCache(shared_dir=str(tmp_path))
+    analyzing.put(doc_id, 'aitism', SpanIndex([('phrases', [(0, 4, 'Some')])]))
+    other.put(doc_id, 'l2_voice', SpanIndex([('structures', [(5, 13, 'rule')])]))
+
+    # Each worker sees the sources the other one analyzed
+    for cache in (analyzing, other):
+        assert [(m['source'], m['label']) for m in cache.query(doc_id, 0, 100)] == [
+            ('aitism', 'Some'), ('l2_voice', 'rule')]
+    assert SpanIndexCache(shared_dir=str(tmp_path)).query('0' * 32, 0, 100) is None
+    assert SpanIndexCache().query(doc_id, 0, 100) is None
+
+
+def test_unused_shared_files_are_swept(tmp_path, monkeypatch):
+    monkeypatch.setattr(span_index, '_SWEEP_EVERY', 1)
+    cache = SpanIndexCache(shared_dir=str(tmp_path), shared_ttl=60)
+    cache.put('old', 'aitism', SpanIndex([]))
+    stale = time.time() - 120
+    os.utime(tmp_path / 'old.aitism.json', (stale, stale))
+    cache.put('new', 'aitism', SpanIndex([]))
+    assert sorted(os.listdir(tmp_path)) == ['new.aitism.json']
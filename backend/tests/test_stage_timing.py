@@ -0,0 +1,89 @@
+import json
+import logging
+import re
+import tracemalloc
+
+import pytest
+from flask import Flask
+
+import stage_timing
+from stage_timing import stage
+
+
+@pytest.fixture
+def timer():
+    timer = stage_timing.start()
+    yield timer
+    stage_timing.stop()
+
+
+def test_stage_is_a_shared_no_op_outside_a_timed_context():
+    assert stage('tokenize') is stage('aitism.phrases')
+
+
+def test_repeated_and_nested_stages_accumulate(timer):
+    for _ in range(3):
+        with stage('aitism.phrases'):
+            with stage('tokenize'):
+                pass
+    with stage('tokenize'):
+        pass
+    assert timer.counts == {'tokenize': 4, 'aitism.phrases': 3}
+    assert timer.durations['aitism.phrases'] >= 0
+
+    header = timer.server_timing()
+    # In order of first completion: the nested stage finishes first
+    assert re.fullmatch(r'tokenize;dur=[\d.]+, aitism\.phrases;dur=[\d.]+, total;dur=[\d.]+', header)
+    assert timer.as_dict()['tokenize']['count'] == 4
+
+
+def test_memory_peaks_per_stage_and_group():
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        timer = stage_timing.start(memory=True)
+        with stage('compare.detailed_diff'):
+            with stage('tokenize'):
+                block = bytearray(2 * 1024 * 1024)
+                del block
+            small = bytearray(64 * 1024)
+            del small
+        stage_timing.stop()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    # The nested stage's peak also counts toward its parent
+    assert timer.peaks['tokenize'] >= 2 * 1024 * 1024
+    assert timer.peaks['compare.detailed_diff'] >= timer.peaks['tokenize']
+    report = timer.memory_report()
+    assert report['groups']['tokenization'] >= 2048 and report['groups']['diff'] >= 2048
+    assert report['request_peak_kib'] >= 2048
+
+
+def test_requests_get_server_timing_and_a_log_line():
+    app = Flask(__name__)
+    stage_timing.init_app(app)
+
+    @app.route('/work')
+    def work():
+        with stage('scorer.lexical_identity'):
+            pass
+        return 'ok'
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(json.loads(record.getMessage()))
+    stage_timing.logger.addHandler(handler)
+    try:
+        response = app.test_client().get('/work')
+    finally:
+        stage_timing.logger.removeHandler(handler)
+
+    assert response.headers['Server-Timing'].startswith('scorer.lexical_identity;dur=')
+    [record] = records
+    assert record['event'] == 'request_timing' and record['path'] == '/work' and record['status'] == 200
+    assert record['stages']['scorer.lexical_identity']['count'] == 1
+    # The request's timer is gone once it finished
+    assert stage('scorer.lexical_identity') is stage('tokenize')
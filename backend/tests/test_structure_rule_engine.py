@@ -0,0 +1,50 @@
+import pytest
+
+from structure_rule_engine import StructureRuleEngine
+
+
+def rule(rule_id, pattern, anchor='anywhere'):
+    return {'id': rule_id, 'type': rule_id, 'pattern': pattern, 'anchor': anchor,
+            'preservation_value': 'LOW'}
+
+
+def test_reports_every_matching_rule_in_order():
+    engine = StructureRuleEngine([
+        rule('topic_first', r'^as for\b', anchor='start'),
+        rule('double_adverb', r'\b(very|really) (very|really)\b'),
+        rule('never_matches', r'\bzzz\b'),
+    ])
+    assert engine.match('As for me, it is really really good.') == ['topic_first', 'double_adverb']
+    assert engine.match('Nothing here.') == []
+
+
+@pytest.mark.parametrize('pattern', [
+    r'\b(\w+) \1\b',
+    r'(a)(?(1)b|c)',
+    r'\b(?:x|(\w+) \1)\b',
+    r'(?:(\w+),? )+\1',
+])
+def test_rejects_backreferences(pattern):
+    # Group numbers shift in the combined matcher, so the reference would silently never match
+    with pytest.raises(ValueError, match='backreferences'):
+        StructureRuleEngine([rule('repeat', pattern)])
+
+
+def test_rejects_named_groups():
+    with pytest.raises(ValueError, match='named groups'):
+        StructureRuleEngine([rule('named', r'(?P<word>\w+)')])
+
+
+def test_rejects_invalid_pattern_naming_the_rule():
+    with pytest.raises(ValueError, match="'broken'"):
+        StructureRuleEngine([rule('broken', r'(unclosed')])
+
+
+def test_numbered_groups_without_references_still_match():
+    engine = StructureRuleEngine([rule('first', r'\b(it) is\b'), rule('second', r'\b(good|bad)\b')])
+    assert engine.match('It is really really good') == ['first', 'second']
+
+
+@pytest.mark.parametrize('pattern', [r'(a)[\1]', r'(\\)1', r'([]\1])x', r'(a)\x31'])
+def test_escapes_that_are_not_references_are_allowed(pattern):
+    StructureRuleEngine([rule('literal', pattern)])
@@ -0,0 +1,59 @@
+import pytest
+
+import tokenization
+from tokenization import RegexTokenizer, Tokenizer, get_tokenizer
+
+
+TEXT = "  I don't know, it's fine... We're well-known here!\n\nShe asked: why? Then she left.  "
+
+
+def test_regex_words_split_clitics_like_treebank():
+    assert RegexTokenizer().words("I don't know, it's fine... We're well-known.") == [
+        'I', 'do', "n't", 'know', ',', 'it', "'s", 'fine', '...', 'We', "'re", 'well-known', '.']
+
+
+def test_regex_sentences_and_spans_map_back_to_the_text():
+    tokenizer = RegexTokenizer()
+    spans = tokenizer.sentence_spans(TEXT)
+    assert [TEXT[s:e] for s, e in spans] == tokenizer.sentences(TEXT) == [
+        "I don't know, it's fine...", "We're well-known here!", 'She asked: why?', 'Then she left.']
+
+    word_spans = tokenizer.word_spans(TEXT)
+    assert [TEXT[s:e] for s, e in word_spans] == tokenizer.words(TEXT)
+
+
+def test_default_word_spans_skip_rewritten_tokens():
+    class Quoting(Tokenizer):
+        def words(self, text):
+            return ['``', 'hi', "''", 'there']
+
+    text = '"hi" there'
+    assert [text[s:e] for s, e in Quoting().word_spans(text)] == ['hi', 'there']
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.setenv('TOKENIZER_BACKEND', 'regex')
+    assert get_tokenizer() is get_tokenizer('regex')
+    assert isinstance(get_tokenizer(), RegexTokenizer)
+    with pytest.raises(ValueError, match='Unknown tokenizer backend'):
+        get_tokenizer('missing')
+
+
+def test_registered_backends_are_shared_instances(monkeypatch):
+    monkeypatch.setattr(tokenization, '_backends', dict(tokenization._backends))
+    monkeypatch.setattr(tokenization, '_instances', {})
+    tokenization.register_backend('custom', RegexTokenizer)
+    assert 'custom' in tokenization.available_backends()
+    assert get_tokenizer('custom') is get_tokenizer('custom')
+
+
+def test_regex_backend_agrees_with_punkt_on_plain_prose():
+    pytest.importorskip('nltk')
+    punkt = get_tokenizer('punkt')
+    text = "The river was wide. We don't swim there, it's cold! Do you?"
+    try:
+        expected = punkt.sentences(text), punkt.words(text)
+    except LookupError:
+        pytest.skip('NLTK punkt data is not installed')
+    regex = RegexTokenizer()
+    assert (regex.sentences(text), regex.words(text)) == expected
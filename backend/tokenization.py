@@ -0,0 +1,194 @@
+"""
+Tokenization
+Pluggable sentence and word tokenizer backends shared by all engines
+
+Backends:
+    punkt  NLTK punkt sentences + Treebank words (default, most accurate)
+    regex  compiled regular expressions (fast path for the live editor)
+
+Every backend also reports character offsets (sentence_spans / word_spans),
+so callers that need to map tokens back to the buffer can use any backend.
+The default backend is chosen with the TOKENIZER_BACKEND environment variable.
+"""
+
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Tuple
+
+
+Span = Tuple[int, int]
+
+
+class Tokenizer:
+    """Interface implemented by every tokenizer backend"""
+
+    name = 'base'
+
+    def sentences(self, text: str) -> List[str]:
+        """Split text into sentences"""
+        return [text[start:end] for start, end in self.sentence_spans(text)]
+
+    def words(self, text: str) -> List[str]:
+        """Split text into word tokens"""
+        raise NotImplementedError
+
+    def sentence_spans(self, text: str) -> List[Span]:
+        """Return (start, end) character offsets of each sentence"""
+        raise NotImplementedError
+
+    def word_spans(self, text: str) -> List[Span]:
+        """
+        Return (start, end) character offsets of each word token
+
+        The default implementation aligns words() back onto the text and
+        skips tokens the backend rewrote (e.g. Treebank quote conversion).
+        """
+        spans = []
+        pos = 0
+        for token in self.words(text):
+            start = text.find(token, pos)
+            if start == -1:
+                continue
+            pos = start + len(token)
+            spans.append((start, pos))
+        return spans
+
+    def warm_up(self) -> None:
+        """Load any models ahead of traffic"""
+        self.words(self.sentences("Warm up the tokenizer. It loads its models.")[0])
+
+
+class PunktTokenizer(Tokenizer):
+    """NLTK punkt sentences and Treebank words; NLTK is imported on first use"""
+
+    name = 'punkt'
+
+    def __init__(self, language: str = 'english'):
+        self.language = language
+        self._tokenize = None
+        self._punkt = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Import NLTK and load the punkt model once"""
+        if self._punkt is None:
+            with self._lock:
+                if self._punkt is None:
+                    from nltk import tokenize
+                    try:
+                        # NLTK >= 3.8.2 (punkt_tab)
+                        punkt = tokenize._get_punkt_tokenizer(self.language)
+                    except AttributeError:
+                        import nltk
+                        punkt = nltk.data.load(f'tokenizers/punkt/{self.language}.pickle')
+                    self._tokenize = tokenize
+                    self._punkt = punkt
+        return self._tokenize
+
+    def sentences(self, text: str) -> List[str]:
+        return self._load().sent_tokenize(text, self.language)
+
+    def words(self, text: str) -> List[str]:
+        return self._load().word_tokenize(text, self.language)
+
+    def sentence_spans(self, text: str) -> List[Span]:
+        self._load()
+        return list(self._punkt.span_tokenize(text))
+
+
+class RegexTokenizer(Tokenizer):
+    """Compiled-regex tokenizer: splits sentences after . ! ? and approximates Treebank words"""
+
+    name = 'regex'
+
+    # Whitespace following sentence-final punctuation
+    SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+    # Treebank-like words: split clitics ("do" "n't", "it" "'s"), keep
+    # ellipses together, punctuation as separate tokens
+    WORD = re.compile(
+        r"\w+(?=n't\b)|n't\b|'(?:s|m|d|ll|re|ve)\b|\w+(?:[-.]\w+)*|\.\.\.|[^\w\s]",
+        re.IGNORECASE
+    )
+
+    def sentence_spans(self, text: str) -> List[Span]:
+        spans = []
+        start = 0
+        for m in self.SENTENCE_BREAK.finditer(text):
+            spans.append((start, m.start()))
+            start = m.end()
+        spans.append((start, len(text)))
+
+        # Trim leading/trailing whitespace of the whole text and drop empties
+        trimmed = []
+        for s, e in spans:
+            while s < e and text[s].isspace():
+                s += 1
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            if s < e:
+                trimmed.append((s, e))
+        return trimmed
+
+    def words(self, text: str) -> List[str]:
+        return self.WORD.findall(text)
+
+    def word_spans(self, text: str) -> List[Span]:
+        return [m.span() for m in self.WORD.finditer(text)]
+
+
+_backends: Dict[str, Callable[[], Tokenizer]] = {
+    'punkt': PunktTokenizer,
+    'regex': RegexTokenizer,
+}
+_instances: Dict[str, Tokenizer] = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[], Tokenizer]) -> None:
+    """Register an additional tokenizer backend"""
+    _backends[name] = factory
+    _instances.pop(name, None)
+
+
+def available_backends() -> List[str]:
+    """Names of all registered backends"""
+    return sorted(_backends)
+
+
+def default_backend() -> str:
+    """Backend used when none is requested (TOKENIZER_BACKEND, default punkt)"""
+    return os.environ.get('TOKENIZER_BACKEND', 'punkt')
+
+
+def get_tokenizer(name: str = None) -> Tokenizer:
+    """Return the shared tokenizer instance for a backend name"""
+    name = name or default_backend()
+    tokenizer = _instances.get(name)
+    if tokenizer is None:
+        if name not in _backends:
+            raise ValueError(
+                f"Unknown tokenizer backend {name!r}; available: {', '.join(available_backends())}"
+            )
+        with _instances_lock:
+            tokenizer = _instances.get(name)
+            if tokenizer is None:
+                tokenizer = _backends[name]()
+                _instances[name] = tokenizer
+    return tokenizer
+
+
+def sent_tokenize(text: str) -> List[str]:
+    """Split text into sentences with the default backend"""
+    return get_tokenizer().sentences(text)
+
+
+def word_tokenize(text: str) -> List[str]:
+    """Split text into word tokens with the default backend"""
+    return get_tokenizer().words(text)
+
+
+def warm_up() -> None:
+    """Load the default backend's models ahead of traffic"""
+    get_tokenizer().warm_up()